@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.APICallLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -97,6 +98,14 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (e.g. filecache:///tmp/devopsdemo-cache or redis://...) so all workers see one cache
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -174,6 +183,63 @@ DEEPSEEK_API_KEY = env('DEEPSEEK_API_KEY', default='')
 DOCKERHUB_USERNAME = env('DOCKERHUB_USERNAME', default='')
 DOCKERHUB_TOKEN = env('DOCKERHUB_TOKEN', default='')
 
+# Docker Hub response cache (seconds)
+DOCKERHUB_CACHE = {
+    'ENABLED': env.bool('DOCKERHUB_CACHE_ENABLED', default=True),
+    'TTL': {
+        'get_repos': env.int('DOCKERHUB_CACHE_REPOS_TTL', default=300),
+        'get_tags_by_repo': env.int('DOCKERHUB_CACHE_TAGS_TTL', default=120),
+    },
+    'STALE_WHILE_REVALIDATE': env.int('DOCKERHUB_CACHE_SWR', default=600),
+}
+# How long a worker waits for another worker's in-flight fetch of the same key (shared CACHE_URL only)
+DOCKERHUB_CACHE_LEASE_TIMEOUT = env.float('DOCKERHUB_CACHE_LEASE_TIMEOUT', default=30.0)
+
+# Serve docker_repos/docker_tags from the local mirror kept by `manage.py sync_dockerhub`
+DOCKERHUB_SERVE_FROM_MIRROR = env.bool('DOCKERHUB_SERVE_FROM_MIRROR', default=False)
+
+# /api/ai/chat/batch/ limits
+DEEPSEEK_BATCH = {
+    'MAX_ITEMS': env.int('DEEPSEEK_BATCH_MAX_ITEMS', default=500),
+    'DEFAULT_CONCURRENCY': env.int('DEEPSEEK_BATCH_CONCURRENCY', default=8),
+    'MAX_CONCURRENCY': env.int('DEEPSEEK_BATCH_MAX_CONCURRENCY', default=32),
+    # Seconds before unfinished items are returned as timed out; keep it below gunicorn's --timeout (120)
+    'DEADLINE': env.float('DEEPSEEK_BATCH_DEADLINE', default=90.0),
+}
+
+# Server-side chat sessions: history is trimmed to TRIM_RATIO of the budget once it exceeds TOKEN_BUDGET
+CHAT_SESSIONS = {
+    'TOKEN_BUDGET': env.int('CHAT_SESSION_TOKEN_BUDGET', default=8000),
+    'TRIM_RATIO': env.float('CHAT_SESSION_TRIM_RATIO', default=0.5),
+}
+
+# APICallLog writes are buffered and bulk-inserted by a background thread per worker
+API_LOG_SINK = {
+    'ASYNC': env.bool('API_LOG_ASYNC', default=True),
+    'BATCH_SIZE': env.int('API_LOG_BATCH_SIZE', default=100),
+    'FLUSH_INTERVAL_MS': env.int('API_LOG_FLUSH_INTERVAL_MS', default=500),
+    'MAX_BUFFER': env.int('API_LOG_MAX_BUFFER', default=10000),
+}
+
+# `python manage.py prune_api_logs`: archive and delete logs older than DAYS, minute rollups older than MINUTE_ROLLUP_DAYS
+API_LOG_RETENTION = {
+    'DAYS': env.int('API_LOG_RETENTION_DAYS', default=30),
+    'MINUTE_ROLLUP_DAYS': env.int('API_LOG_MINUTE_ROLLUP_DAYS', default=7),
+    'CHUNK_SIZE': env.int('API_LOG_PRUNE_CHUNK_SIZE', default=1000),
+    'ARCHIVE_DIR': env('API_LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'api_logs')),
+}
+
+# Record a span tree per request, browsable at /api/traces/ (TRACE_BUFFER_SIZE / TRACE_SPAN_LIMIT bound memory)
+API_TRACING = {
+    'ENABLED': env.bool('API_TRACING', default=False),
+}
+
+# Prometheus metrics at /metrics (set PROMETHEUS_MULTIPROC_DIR to aggregate gunicorn workers)
+API_METRICS = {
+    'ENABLED': env.bool('METRICS_ENABLED', default=True),
+    'REFRESH_SECONDS': env.float('METRICS_REFRESH_SECONDS', default=5.0),
+}
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
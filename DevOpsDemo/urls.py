@@ -17,9 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from api.home_views import home
+from api.metrics import metrics_view
 
 urlpatterns = [
     path('', home, name='home'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import APICallLog
+from .models import (
+    APICallHourRollup,
+    APICallLog,
+    APICallMinuteRollup,
+    ChatSession,
+    ChatTurn,
+    DockerRepo,
+    DockerTag,
+)
 
 
 @admin.register(APICallLog)
@@ -14,3 +22,36 @@ class APICallLogAdmin(admin.ModelAdmin):
         return obj.was_successful
     was_successful.boolean = True
     was_successful.short_description = 'Success'
+
+
+@admin.register(APICallMinuteRollup, APICallHourRollup)
+class APICallRollupAdmin(admin.ModelAdmin):
+    list_display = ['bucket_start', 'endpoint', 'status_class', 'calls', 'latency_count', 'latency_max']
+    list_filter = ['endpoint', 'status_class']
+    date_hierarchy = 'bucket_start'
+
+
+@admin.register(DockerRepo)
+class DockerRepoAdmin(admin.ModelAdmin):
+    list_display = ['namespace', 'name', 'is_private', 'pull_count', 'last_updated', 'synced_at']
+    list_filter = ['namespace', 'is_private']
+    search_fields = ['name', 'description']
+
+
+@admin.register(DockerTag)
+class DockerTagAdmin(admin.ModelAdmin):
+    list_display = ['repo', 'name', 'full_size', 'last_updated', 'synced_at']
+    list_filter = ['repo']
+    search_fields = ['name']
+
+
+class ChatTurnInline(admin.TabularInline):
+    model = ChatTurn
+    extra = 0
+    readonly_fields = ['seq', 'role', 'content', 'tokens', 'created_at']
+
+
+@admin.register(ChatSession)
+class ChatSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'window_start', 'created_at', 'updated_at']
+    inlines = [ChatTurnInline]
@@ -5,3 +5,6 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     verbose_name = 'DevOps API'
+
+    def ready(self):
+        from . import rollups  # noqa: F401  registers the post_save receiver
@@ -0,0 +1,78 @@
+"""
+Prompt assembly for server-side chat sessions.
+
+A session's prompt is its system message followed by every stored turn from
+`window_start` on, each sent exactly as stored. New turns only ever append,
+so consecutive requests share the whole previous prompt as a prefix and hit
+the provider's context cache. When the history outgrows the token budget the
+window jumps forward far enough (down to TRIM_RATIO of the budget) that it
+stays put for many turns, instead of sliding by one turn on every request.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChatSession, ChatTurn
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 ASCII characters per token, one token per other character."""
+    non_ascii = sum(1 for ch in text if not ch.isascii())
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+def build_messages(session, message):
+    """
+    Return the upstream messages for sending `message` in `session`.
+
+    Advances and saves `session.window_start` if the history no longer fits.
+    """
+    config = settings.CHAT_SESSIONS
+    turns = list(
+        session.turns.filter(seq__gte=session.window_start).values_list('seq', 'role', 'content', 'tokens')
+    )
+    fixed = estimate_tokens(session.system_prompt) + estimate_tokens(message)
+    total = fixed + sum(turn[3] for turn in turns)
+
+    if total > config['TOKEN_BUDGET']:
+        target = config['TOKEN_BUDGET'] * config['TRIM_RATIO']
+        drop = 0
+        while drop < len(turns) and (total > target or turns[drop][1] != 'user'):
+            total -= turns[drop][3]
+            drop += 1
+        turns = turns[drop:]
+        session.window_start = turns[0][0] if turns else _next_seq(session)
+        session.save(update_fields=['window_start', 'updated_at'])
+        logger.info("Trimmed chat session %s to turns from %s", session.pk, session.window_start)
+
+    messages = []
+    if session.system_prompt:
+        messages.append({'role': 'system', 'content': session.system_prompt})
+    messages.extend({'role': role, 'content': content} for _, role, content, _ in turns)
+    messages.append({'role': 'user', 'content': message})
+    return messages
+
+
+def record_exchange(session, message, reply):
+    """Append a user message and the assistant's reply to the session."""
+    with transaction.atomic():
+        # Write the session row first: the row lock (the database write lock
+        # on SQLite) makes concurrent appends to a session read the next seq
+        # one after another instead of both taking the same one
+        session.updated_at = timezone.now()
+        ChatSession.objects.filter(pk=session.pk).update(updated_at=session.updated_at)
+        seq = _next_seq(session)
+        ChatTurn.objects.bulk_create([
+            ChatTurn(session=session, seq=seq, role='user', content=message, tokens=estimate_tokens(message)),
+            ChatTurn(session=session, seq=seq + 1, role='assistant', content=reply, tokens=estimate_tokens(reply)),
+        ])
+
+
+def _next_seq(session):
+    last = session.turns.aggregate(Max('seq'))['seq__max']
+    return 0 if last is None else last + 1
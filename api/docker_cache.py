@@ -0,0 +1,180 @@
+"""
+Response cache in front of DockerHubManager, built on Django's cache framework.
+
+Entries are fresh for a per-method TTL. After that they are served stale for
+up to STALE_WHILE_REVALIDATE seconds while a background thread revalidates
+them with a conditional request, so an unchanged upstream costs one 304.
+
+Concurrent misses for the same key share one upstream fetch: in-process via
+SingleFlight, and, when the cache backend is shared across processes, across
+workers via a file lease after which the waiting worker re-reads the cache
+before fetching itself. With a per-process backend (locmem, dummy) a worker
+could never see another's fill, so no lease is taken.
+
+The async views use the same entries through aget_repos/aget_tags_by_repo,
+wrapping an AsyncDockerHubManager. Misses there are not coalesced, and
+stale entries are refreshed by an asyncio task with a full (unconditional)
+fetch, since the async client does not send ETags.
+"""
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from src.LF_dockerhubmanger.docker_tools import NOT_MODIFIED
+from utility.singleflight import SingleFlight, file_lease
+from utility.watch import Span
+
+logger = logging.getLogger(__name__)
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+BYPASS = 'bypass'
+COALESCED = 'coalesced'
+
+_flight = SingleFlight()
+_revalidations = set()  # keeps the async revalidation tasks referenced until they finish
+
+
+def is_shared(cache):
+    """Whether entries written to `cache` by one process are visible to the others."""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+class CachedDockerHubManager:
+    """
+    Wraps a DockerHubManager and caches get_repos/get_tags_by_repo results.
+
+    Each lookup returns a ``(value, cache_status)`` tuple so the caller can
+    record the status alongside its APICallLog entry. The ``aget_*`` methods
+    are for a wrapped AsyncDockerHubManager.
+    """
+
+    def __init__(self, manager, cache=None, config=None, flight=None):
+        self.manager = manager
+        self.cache = cache or default_cache
+        self.config = config or settings.DOCKERHUB_CACHE
+        self.flight = flight or _flight
+
+    def get_repos(self, page_size: int = 100):
+        return self._lookup('get_repos', {'page_size': page_size})
+
+    def get_tags_by_repo(self, repo_name: str):
+        return self._lookup('get_tags_by_repo', {'repo_name': repo_name})
+
+    async def aget_repos(self, page_size: int = 100):
+        return await self._alookup('get_repos', {'page_size': page_size},
+                                   lambda: self.manager.get_repos(page_size=page_size))
+
+    async def aget_tags_by_repo(self, repo_name: str):
+        return await self._alookup('get_tags_by_repo', {'repo_name': repo_name},
+                                   lambda: self.manager.get_tags_by_repo(repo_name))
+
+    # ----------------------------------------
+    # Internals
+    # ----------------------------------------
+    def _key(self, method, kwargs):
+        args = ':'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))
+        return f'dockerhub:{self.manager.username}:{method}:{args}'
+
+    def _ttl(self, method):
+        return self.config['TTL'][method]
+
+    def _fetch(self, method, kwargs, etag=None):
+        return getattr(self.manager, method)(if_none_match=etag, **kwargs)
+
+    def _timeout(self, method):
+        return self._ttl(method) + self.config['STALE_WHILE_REVALIDATE']
+
+    @staticmethod
+    def _entry(value, etag):
+        return {'value': list(value), 'etag': etag, 'stored_at': time.time()}
+
+    def _store(self, key, method, value, etag):
+        entry = self._entry(value, etag)
+        self.cache.set(key, entry, self._timeout(method))
+        return entry
+
+    def _lookup(self, method, kwargs):
+        key = self._key(method, kwargs)
+        if not self.config['ENABLED']:
+            value, shared = self.flight.do(key, self._fetch, method, kwargs)
+            return value, COALESCED if shared else BYPASS
+
+        with Span("cache get", method=method):
+            entry = self.cache.get(key)
+        if entry is None:
+            (value, cache_status), shared = self.flight.do(key, self._fill, method, kwargs, key)
+            return value, COALESCED if shared else cache_status
+
+        if time.time() - entry['stored_at'] < self._ttl(method):
+            return entry['value'], HIT
+
+        # Serve stale; only one revalidation per key runs at a time
+        if self.cache.add(f'{key}:revalidating', True, self._ttl(method)):
+            threading.Thread(target=self.revalidate, args=(method, kwargs, entry), daemon=True).start()
+        return entry['value'], STALE
+
+    def _fill(self, method, kwargs, key):
+        """Fetch a missing entry, unless another worker filled it while we waited for the lease."""
+        lease = (
+            file_lease(key, timeout=settings.DOCKERHUB_CACHE_LEASE_TIMEOUT)
+            if is_shared(self.cache) else contextlib.nullcontext()
+        )
+        with lease:
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry['value'], COALESCED
+            value = self._fetch(method, kwargs)
+            self._store(key, method, value, getattr(value, 'etag', None))
+            return value, MISS
+
+    async def _alookup(self, method, kwargs, fetch):
+        key = self._key(method, kwargs)
+        if not self.config['ENABLED']:
+            return await fetch(), BYPASS
+
+        with Span("cache get", method=method):
+            entry = await self.cache.aget(key)
+        if entry is None:
+            value = await fetch()
+            await self.cache.aset(key, self._entry(value, None), self._timeout(method))
+            return value, MISS
+
+        if time.time() - entry['stored_at'] < self._ttl(method):
+            return entry['value'], HIT
+
+        if await self.cache.aadd(f'{key}:revalidating', True, self._ttl(method)):
+            task = asyncio.create_task(self._arevalidate(method, key, fetch))
+            _revalidations.add(task)
+            task.add_done_callback(_revalidations.discard)
+        return entry['value'], STALE
+
+    async def _arevalidate(self, method, key, fetch):
+        try:
+            await self.cache.aset(key, self._entry(await fetch(), None), self._timeout(method))
+        except Exception:
+            logger.exception("Error revalidating %s", key)
+        finally:
+            await self.cache.adelete(f'{key}:revalidating')
+
+    def revalidate(self, method, kwargs, entry):
+        """Refresh a cache entry, using its ETag so an unchanged upstream answers 304."""
+        key = self._key(method, kwargs)
+        try:
+            value = self._fetch(method, kwargs, etag=entry['etag'])
+            if value is NOT_MODIFIED:
+                self._store(key, method, entry['value'], entry['etag'])
+            else:
+                self._store(key, method, value, getattr(value, 'etag', None))
+        except Exception:
+            logger.exception("Error revalidating %s", key)
+        finally:
+            self.cache.delete(f'{key}:revalidating')
@@ -0,0 +1,119 @@
+"""
+Incremental sync of a Docker Hub namespace into the DockerRepo/DockerTag mirror.
+
+Docker Hub lists repositories and tags most recently updated first, so each
+run pages through the listing only until it reaches a record that is not
+newer than what the mirror already holds.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from .models import DockerRepo, DockerTag
+
+logger = logging.getLogger(__name__)
+
+
+def serve_from_mirror(request):
+    """Whether a request should be answered from the mirror; `?source=` overrides the setting."""
+    source = request.GET.get('source')
+    if source:
+        return source == 'mirror'
+    return settings.DOCKERHUB_SERVE_FROM_MIRROR
+
+
+def _is_known(record, watermark):
+    last_updated = parse_datetime(record.get('last_updated') or '')
+    return watermark is not None and last_updated is not None and last_updated <= watermark
+
+
+def sync_namespace(manager, full=False):
+    """
+    Mirror the manager's namespace and return counts of what was synced.
+
+    Each changed repository is written in its own transaction together with
+    its tags, and its `last_updated` (the incremental watermark) only lands
+    once the tags are in. Changed repositories are applied oldest first, so
+    if one fails the watermark stays below it and the next run retries it.
+
+    With `full`, every page is read and repositories or tags that no longer
+    exist upstream are removed from the mirror.
+    """
+    namespace = manager.username
+    stats = {'repos': 0, 'tags': 0, 'deleted_repos': 0}
+    watermark = None if full else (
+        DockerRepo.objects.filter(namespace=namespace).aggregate(Max('last_updated'))['last_updated__max']
+    )
+
+    changed = []
+    for record in manager.iter_repo_records():
+        if not full and _is_known(record, watermark):
+            break
+        changed.append(record)
+
+    for record in reversed(changed):
+        stats['tags'] += _sync_repo(manager, namespace, record, full)
+        stats['repos'] += 1
+
+    if full:
+        gone = DockerRepo.objects.filter(namespace=namespace).exclude(name__in=[r['name'] for r in changed])
+        stats['deleted_repos'] = gone.count()
+        gone.delete()
+
+    logger.info("Synced %s: %s", namespace, stats)
+    return stats
+
+
+def _sync_repo(manager, namespace, record, full):
+    # Page Docker Hub before opening the transaction, so the write lock is
+    # only held for the writes and not across HTTP round trips
+    tag_records = fetch_tag_records(manager, namespace, record['name'], full=full)
+    with transaction.atomic():
+        repo, _ = DockerRepo.objects.update_or_create(
+            namespace=namespace,
+            name=record['name'],
+            defaults={
+                'description': record.get('description') or '',
+                'is_private': record.get('is_private', False),
+                'star_count': record.get('star_count') or 0,
+                'pull_count': record.get('pull_count') or 0,
+            },
+        )
+        tags = write_repo_tags(repo, tag_records, full=full)
+        repo.last_updated = parse_datetime(record.get('last_updated') or '')
+        repo.save(update_fields=['last_updated'])
+    return tags
+
+
+def fetch_tag_records(manager, namespace, repo_name, full=False):
+    """Read the tags of one repository that are newer than the mirror (all of them with `full`)."""
+    watermark = None if full else DockerTag.objects.filter(
+        repo__namespace=namespace, repo__name=repo_name
+    ).aggregate(Max('last_updated'))['last_updated__max']
+
+    records = []
+    for record in manager.iter_tag_records(repo_name):
+        if not full and _is_known(record, watermark):
+            break
+        records.append(record)
+    return records
+
+
+def write_repo_tags(repo, records, full=False):
+    """Mirror fetched tag records of one repository and return how many were written."""
+    for record in records:
+        DockerTag.objects.update_or_create(
+            repo=repo,
+            name=record['name'],
+            defaults={
+                'full_size': record.get('full_size'),
+                'last_updated': parse_datetime(record.get('last_updated') or ''),
+                'last_updater_username': record.get('last_updater_username'),
+            },
+        )
+    if full:
+        repo.tags.exclude(name__in=[record['name'] for record in records]).delete()
+    return len(records)
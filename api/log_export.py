@@ -0,0 +1,89 @@
+"""
+Streaming export of APICallLog as NDJSON or CSV.
+
+Rows are read as plain `.values()` dicts, never model instances, in
+keyset-paginated chunks ordered by (timestamp, id): each chunk is a short
+index range query starting after the last row sent. Memory stays constant
+however long the window is. A single long-lived cursor would hold SQLite's
+read lock for the whole download and block log writes. Chunk queries
+release the lock between chunks.
+
+Under ASGI the response gets `aexport_chunks`, which runs each step of the
+same generator in the sync thread, so Django streams it instead of reading
+a synchronous iterator into a list first.
+"""
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+
+from .log_retention import ARCHIVE_FIELDS, ndjson_line
+
+CHUNK_SIZE = 2000
+WRITE_SIZE = 64 * 1024  # characters per streamed chunk, instead of one write per row
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yield `queryset` rows as dicts of ARCHIVE_FIELDS, oldest first, `chunk_size` per query."""
+    queryset = queryset.order_by('timestamp', 'id').values(*ARCHIVE_FIELDS)
+    page = queryset
+    while True:
+        rows = list(page[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        page = queryset.filter(timestamp__gte=last['timestamp']).exclude(
+            timestamp=last['timestamp'], id__lte=last['id'],
+        )
+
+
+class _Echo:
+    """File-like object whose write returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ARCHIVE_FIELDS)
+    for row in rows:
+        if row['timestamp'] is not None:
+            row['timestamp'] = row['timestamp'].isoformat()
+        if row['request_params'] is not None:
+            row['request_params'] = json.dumps(row['request_params'], ensure_ascii=False)
+        yield writer.writerow([row[field] for field in ARCHIVE_FIELDS])
+
+
+def export_chunks(queryset, output='ndjson', chunk_size=CHUNK_SIZE):
+    """The export in `output` format ('ndjson' or 'csv') as encoded blocks of whole lines."""
+    rows = iter_rows(queryset, chunk_size)
+    lines = _csv_lines(rows) if output == 'csv' else (ndjson_line(row) for row in rows)
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= WRITE_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+async def aexport_chunks(queryset, output='ndjson', chunk_size=CHUNK_SIZE):
+    """Async iterator over `export_chunks`; the queries run via sync_to_async, one block at a time."""
+    chunks = export_chunks(queryset, output, chunk_size)
+    step = sync_to_async(next)
+    try:
+        while (block := await step(chunks, None)) is not None:
+            yield block
+    finally:
+        chunks.close()
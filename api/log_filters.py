@@ -0,0 +1,37 @@
+"""
+Server-side filters for APICallLog queries.
+
+Each filter maps onto an index so that queries such as "the last 100
+ai_chat errors" read only the rows they return:
+
+- `endpoint`            -> (endpoint, -timestamp)
+- `failed`              -> partial index on -timestamp over non-2xx rows
+- `since` / `until`     -> timestamp index
+- `status_min` / `status_max` ranges entirely outside 2xx also add the
+  failed-rows condition so the partial index applies.
+"""
+from .models import FAILED_CALLS
+
+
+def filter_window(queryset, since=None, until=None):
+    """Restrict `queryset` to `since <= timestamp < until`, either bound optional."""
+    if since is not None:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until is not None:
+        queryset = queryset.filter(timestamp__lt=until)
+    return queryset
+
+
+def filter_logs(queryset, endpoint=None, status_min=None, status_max=None, failed=False, since=None, until=None):
+    """Apply validated LogFilterSerializer data to an APICallLog queryset."""
+    queryset = filter_window(queryset, since, until)
+    if endpoint:
+        queryset = queryset.filter(endpoint__in=endpoint)
+    if status_min is not None:
+        queryset = queryset.filter(status_code__gte=status_min)
+    if status_max is not None:
+        queryset = queryset.filter(status_code__lte=status_max)
+    outside_2xx = (status_min is not None and status_min >= 300) or (status_max is not None and status_max < 200)
+    if failed or outside_2xx:
+        queryset = queryset.filter(FAILED_CALLS)
+    return queryset
@@ -0,0 +1,91 @@
+"""
+Retention for APICallLog: archive expired rows, then delete them in chunks.
+
+Rows older than the cutoff are walked in primary-key order, CHUNK_SIZE at a
+time. Each chunk is first appended to gzip-compressed NDJSON archives, one
+file per day of the rows' timestamps (``<archive_dir>/YYYY/MM/api_logs-YYYY-MM-DD.ndjson.gz``),
+then deleted in its own short transaction, so the SQLite write lock is never
+held for more than one chunk and requests can log in between. Appending a
+chunk adds a new gzip member; ``zcat`` and ``gzip.open`` read the members
+back as one stream. A run interrupted between archiving and deleting a
+chunk archives that chunk again on the next run, so archives are
+at-least-once.
+
+Minute rollups past their own retention are deleted the same way; hour
+rollups are small and kept.
+"""
+import gzip
+import json
+import os
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import APICallLog, APICallMinuteRollup
+
+ARCHIVE_FIELDS = (
+    'id', 'endpoint', 'timestamp', 'response_time_ms', 'status_code',
+    'error_message', 'request_params', 'response_size',
+)
+
+
+def ndjson_line(row):
+    """One archived/exported row as a JSON line."""
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def archive_path(archive_dir, day):
+    return os.path.join(archive_dir, f'{day:%Y}', f'{day:%m}', f'api_logs-{day:%Y-%m-%d}.ndjson.gz')
+
+
+def _archive(rows, archive_dir):
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(row['timestamp'].date(), []).append(row)
+    for day, day_rows in by_day.items():
+        path = archive_path(archive_dir, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'at', encoding='utf-8') as fh:
+            fh.writelines(ndjson_line(row) for row in day_rows)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+
+def prune_logs(cutoff, chunk_size=1000, archive_dir=None, pause=0.0, dry_run=False):
+    """
+    Delete APICallLog rows with `timestamp < cutoff`, archiving them first
+    when `archive_dir` is set. Sleeps `pause` seconds between chunks.
+
+    Returns the number of rows deleted (or that would be, for a dry run).
+    """
+    expired = APICallLog.objects.filter(timestamp__lt=cutoff).order_by('pk')
+    if dry_run:
+        return expired.count()
+    deleted = 0
+    last_pk = 0
+    while True:
+        rows = list(expired.filter(pk__gt=last_pk).values(*ARCHIVE_FIELDS)[:chunk_size])
+        if not rows:
+            return deleted
+        if archive_dir:
+            _archive(rows, archive_dir)
+        first_pk, last_pk = rows[0]['id'], rows[-1]['id']
+        with transaction.atomic():
+            deleted += expired.filter(pk__gte=first_pk, pk__lte=last_pk).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def prune_minute_rollups(cutoff, chunk_size=1000, dry_run=False):
+    """Delete minute rollups of buckets before `cutoff`, `chunk_size` rows per transaction."""
+    expired = APICallMinuteRollup.objects.filter(bucket_start__lt=cutoff)
+    if dry_run:
+        return expired.count()
+    deleted = 0
+    while True:
+        pks = list(expired.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            deleted += expired.filter(pk__gte=pks[0], pk__lte=pks[-1]).delete()[0]
@@ -0,0 +1,144 @@
+"""
+Buffered writer for APICallLog rows.
+
+Views hand their log entry to the sink and return immediately. A background
+thread in each worker writes the buffered entries with one bulk_create every
+BATCH_SIZE entries or FLUSH_INTERVAL_MS milliseconds, whichever comes first,
+so requests no longer queue on the SQLite write lock one INSERT at a time.
+The buffer is bounded: when the database falls behind, new entries are
+dropped and counted rather than growing memory without limit. When the
+worker exits, the thread is stopped and given a few seconds to finish the
+batch it is writing, then whatever is still buffered is flushed.
+
+Each batch updates the api.rollups tables in the same transaction.
+With API_LOG_SINK['ASYNC'] off, entries are saved synchronously as before.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import rollups
+from .models import APICallLog
+
+logger = logging.getLogger(__name__)
+
+
+class LogSink:
+    """Collects APICallLog instances and writes them to the database in batches."""
+
+    def __init__(self, config=None):
+        self._config = config
+        self._cond = threading.Condition()
+        self._buffer = deque()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def config(self):
+        return self._config or settings.API_LOG_SINK
+
+    def write(self, entry):
+        """Queue `entry` for the next batch, or save it right away when buffering is off."""
+        config = self.config
+        if not config['ASYNC']:
+            entry.save()
+            return
+        with self._cond:
+            self._ensure_thread()
+            if len(self._buffer) >= config['MAX_BUFFER']:
+                self.dropped += 1
+                return
+            self._buffer.append(entry)
+            if len(self._buffer) >= config['BATCH_SIZE']:
+                self._cond.notify()
+
+    async def awrite(self, entry):
+        """Async counterpart of write for async views."""
+        if not self.config['ASYNC']:
+            await entry.asave()
+            return
+        self.write(entry)
+
+    def flush(self):
+        """Write everything buffered so far and return the number of rows written."""
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                APICallLog.objects.bulk_create(batch, batch_size=self.config['BATCH_SIZE'])
+                rollups.record(batch)
+        except Exception:
+            logger.exception("Failed to write %s API call logs", len(batch))
+            with self._cond:
+                self.failed += len(batch)
+            return 0
+        with self._cond:
+            self.written += len(batch)
+        return len(batch)
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the flush thread, waiting up to `timeout` seconds for the batch it
+        is writing, then flush what is left and return the number of rows written.
+        """
+        with self._cond:
+            self._stopping = True
+            thread = self._thread if self._pid == os.getpid() else None
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+        return self.flush()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'buffered': len(self._buffer),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    # ----------------------------------------
+    # Background flushing
+    # ----------------------------------------
+    def _ensure_thread(self):
+        # Called with the lock held; a forked worker starts its own thread and buffer
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid != os.getpid():
+            # Forked: the buffer and counters are copies of the parent's. This
+            # worker never writes its copies, so they count as its dropped rows
+            self.written = self.failed = 0
+            self.dropped = len(self._buffer)
+            self._buffer.clear()
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='api-log-sink', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.config['BATCH_SIZE']:
+                    self._cond.wait(self.config['FLUSH_INTERVAL_MS'] / 1000)
+                stopping = self._stopping
+            self.flush()
+            close_old_connections()
+            if stopping:
+                return
+
+
+log_sink = LogSink()
+atexit.register(log_sink.stop)
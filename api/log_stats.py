@@ -0,0 +1,109 @@
+"""
+Aggregated APICallLog statistics for /api/logs/stats/.
+
+Everything comes from one GROUP BY endpoint query with conditional
+aggregates: status-class counts, the latency sum/min/max and a count per
+utility.watch latency bucket. Percentiles are interpolated from those
+buckets, so the database never sorts or returns individual rows, and the
+per-endpoint histograms merge into the overall figures without a second
+query.
+"""
+import itertools
+
+from django.db.models import Count, Max, Min, Q, Sum
+
+from utility.watch import LATENCY_BUCKETS_MS, LatencyStats
+
+from .log_filters import filter_window
+
+STATUS_FILTERS = {
+    'successful': Q(status_code__gte=200, status_code__lt=300),
+    'client_errors': Q(status_code__gte=400, status_code__lt=500),
+    'server_errors': Q(status_code__gte=500),
+}
+
+
+def endpoint_rows(queryset):
+    """
+    Aggregate `queryset` per endpoint in a single query.
+
+    Each row holds `calls`, the STATUS_FILTERS counts, `latency_sum`,
+    `latency_min`, `latency_max` (ms) and `buckets`, the number of timed
+    calls in each LATENCY_BUCKETS_MS bucket.
+    """
+    bounds = LATENCY_BUCKETS_MS[:-1]
+    cumulative = {
+        f'le_{i}': Count('id', filter=Q(response_time_ms__lte=bound))
+        for i, bound in enumerate(bounds)
+    }
+    rows = queryset.order_by('endpoint').values('endpoint').annotate(
+        calls=Count('id'),
+        timed=Count('response_time_ms'),
+        latency_sum=Sum('response_time_ms'),
+        latency_min=Min('response_time_ms'),
+        latency_max=Max('response_time_ms'),
+        **{name: Count('id', filter=condition) for name, condition in STATUS_FILTERS.items()},
+        **cumulative,
+    )
+    result = []
+    for row in rows:
+        counts = [row.pop(f'le_{i}') for i in range(len(bounds))] + [row.pop('timed')]
+        row['buckets'] = [counts[0]] + [high - low for low, high in itertools.pairwise(counts)]
+        result.append(row)
+    return result
+
+
+def latency_of(row):
+    """The LatencyStats of one aggregated row."""
+    return LatencyStats.from_histogram(
+        row['buckets'],
+        total_ns=(row['latency_sum'] or 0) * 1e6,
+        min_ns=None if row['latency_min'] is None else row['latency_min'] * 1e6,
+        max_ns=(row['latency_max'] or 0) * 1e6,
+    )
+
+
+def _summary(calls, successful, client_errors, server_errors, latency):
+    snapshot = latency.snapshot()
+    return {
+        'total_calls': calls,
+        'successful_calls': successful,
+        'failed_calls': calls - successful,
+        'client_errors': client_errors,
+        'server_errors': server_errors,
+        'success_rate': round(successful / calls * 100, 2) if calls else 0,
+        'average_response_time_ms': round(snapshot['mean_ms'], 2),
+        'min_response_time_ms': snapshot['min_ms'],
+        'max_response_time_ms': snapshot['max_ms'],
+        'p50_response_time_ms': snapshot['p50_ms'],
+        'p95_response_time_ms': snapshot['p95_ms'],
+        'p99_response_time_ms': snapshot['p99_ms'],
+    }
+
+
+def summarize(rows, since=None, until=None):
+    """Build the stats response from aggregated rows: overall figures plus one entry per endpoint."""
+    counts = dict.fromkeys(('calls', *STATUS_FILTERS), 0)
+    overall = LatencyStats()
+    endpoints = {}
+    for row in rows:
+        latency = latency_of(row)
+        overall.merge(latency)
+        for key in counts:
+            counts[key] += row[key]
+        endpoints[row['endpoint']] = _summary(
+            row['calls'], row['successful'], row['client_errors'], row['server_errors'], latency,
+        )
+    return {
+        'window': {
+            'since': since.isoformat() if since else None,
+            'until': until.isoformat() if until else None,
+        },
+        **_summary(counts['calls'], counts['successful'], counts['client_errors'], counts['server_errors'], overall),
+        'endpoints': endpoints,
+    }
+
+
+def log_stats(queryset, since=None, until=None):
+    """Statistics of the logs in `queryset` within the window."""
+    return summarize(endpoint_rows(filter_window(queryset, since, until)), since, until)
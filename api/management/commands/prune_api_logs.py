@@ -0,0 +1,79 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.log_retention import prune_logs, prune_minute_rollups
+
+
+class Command(BaseCommand):
+    help = "Archive APICallLog rows past the retention period to gzipped NDJSON, then delete them in chunks"
+
+    def add_arguments(self, parser):
+        retention = settings.API_LOG_RETENTION
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=retention['DAYS'],
+            help="Keep logs from the last DAYS days",
+        )
+        parser.add_argument(
+            '--minute-rollup-days',
+            type=int,
+            default=retention['MINUTE_ROLLUP_DAYS'],
+            help="Keep minute rollups from the last N days (hour rollups are kept)",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=retention['CHUNK_SIZE'],
+            help="Rows archived and deleted per transaction",
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=retention['ARCHIVE_DIR'],
+            help="Directory for the date-partitioned .ndjson.gz archives",
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help="Delete expired rows without archiving them",
+        )
+        parser.add_argument(
+            '--pause-ms',
+            type=int,
+            default=0,
+            help="Sleep between chunks to leave the write lock to the web workers",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report how many rows would be removed",
+        )
+
+    def handle(self, *args, **options):
+        if min(options['days'], options['minute_rollup_days'], options['chunk_size']) < 1:
+            raise CommandError("--days, --minute-rollup-days and --chunk-size must be at least 1")
+
+        now = timezone.now()
+        archive_dir = None if options['no_archive'] else options['archive_dir'] or None
+        logs = prune_logs(
+            now - datetime.timedelta(days=options['days']),
+            chunk_size=options['chunk_size'],
+            archive_dir=archive_dir,
+            pause=options['pause_ms'] / 1000,
+            dry_run=options['dry_run'],
+        )
+        rollups = prune_minute_rollups(
+            now - datetime.timedelta(days=options['minute_rollup_days']),
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        where = f", archived to {archive_dir}" if archive_dir and not options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {logs} API call logs older than {options['days']} days{where} "
+            f"and {rollups} minute rollups"
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the APICallLog minute/hour rollups from the log table (e.g. after the first deploy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help="Log rows read per query",
+        )
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=1,
+            help="Hours of logs rebuilt per transaction",
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['hours'] < 1:
+            raise CommandError("--chunk-size and --hours must be at least 1")
+        total = rebuild(chunk_size=options['chunk_size'], range_seconds=options['hours'] * 3600)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt API call rollups from {total} log rows"))
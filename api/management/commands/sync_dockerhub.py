@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.dockerhub_sync import sync_namespace
+from src.LF_dockerhubmanger.docker_tools import DockerHubManager
+
+
+class Command(BaseCommand):
+    help = "Incrementally mirror the Docker Hub namespace into the DockerRepo/DockerTag tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Read every page and drop repositories/tags that no longer exist upstream",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            manager = DockerHubManager()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        stats = sync_namespace(manager, full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Synced {stats['repos']} repositories and {stats['tags']} tags "
+            f"({stats['deleted_repos']} repositories removed)"
+        ))
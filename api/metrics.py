@@ -0,0 +1,162 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Request latency is observed by APICallLogMiddleware and upstream latency by
+a utility.watch listener, so every ``@watch_time`` Docker Hub call and every
+DeepSeek call (timed until its stream ends) shows up under its qualified name. Gauges that only
+make sense per worker (log buffer, process RSS/CPU, governor queue) are
+refreshed at most once every API_METRICS['REFRESH_SECONDS'] while serving
+requests, and once more by whichever worker answers the scrape.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (entrypoint.sh does) so every
+worker writes its samples there and a scrape of any worker returns the
+totals of all of them; gunicorn.conf.py removes the files of exited workers.
+Without it, /metrics reports the current process only. prometheus_client
+picks its mode when first imported, so the directory is created here before
+that import, and the variable is dropped (single-process mode) if it cannot be.
+"""
+import logging
+import os
+import threading
+import time
+
+import psutil
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+    try:
+        os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    except OSError:
+        logger.warning("Cannot create PROMETHEUS_MULTIPROC_DIR; reporting this process only", exc_info=True)
+        del os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from src.fctn_tools.governor import get_governor
+from utility.watch import LATENCY_BUCKETS_MS, add_listener
+
+from .log_sink import log_sink
+
+# Seconds, from 1 ms up to the DeepSeek read timeout
+BUCKETS = tuple(bound / 1000 for bound in LATENCY_BUCKETS_MS if bound >= 1)
+
+REQUEST_LATENCY = Histogram(
+    'devopsdemo_http_request_duration_seconds',
+    'Time to serve an API request, including streamed bodies.',
+    ['endpoint', 'status'],
+    buckets=BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'devopsdemo_http_requests_in_flight',
+    'Requests currently being served.',
+    multiprocess_mode='livesum',
+)
+UPSTREAM_LATENCY = Histogram(
+    'devopsdemo_upstream_call_duration_seconds',
+    'Duration of upstream calls recorded by utility.watch (Docker Hub, DeepSeek).',
+    ['function', 'outcome'],
+    buckets=BUCKETS,
+)
+DEEPSEEK_IN_FLIGHT = Gauge(
+    'devopsdemo_deepseek_in_flight',
+    'DeepSeek calls holding a governor slot, across all workers.',
+    multiprocess_mode='livemostrecent',
+)
+DEEPSEEK_QUEUE_DEPTH = Gauge(
+    'devopsdemo_deepseek_queue_depth',
+    'Callers waiting for a DeepSeek governor slot.',
+    multiprocess_mode='livesum',
+)
+LOG_BUFFERED = Gauge(
+    'devopsdemo_api_log_buffered',
+    'APICallLog rows waiting in the log sink buffer.',
+    multiprocess_mode='livesum',
+)
+LOG_DROPPED = Gauge(
+    'devopsdemo_api_log_dropped',
+    'APICallLog rows dropped because the log sink buffer was full.',
+    multiprocess_mode='livesum',
+)
+PROCESS_RSS = Gauge(
+    'devopsdemo_process_resident_memory_bytes',
+    'Resident memory of the worker process.',
+    multiprocess_mode='liveall',
+)
+PROCESS_CPU = Gauge(
+    'devopsdemo_process_cpu_percent',
+    'CPU use of the worker process since the previous refresh.',
+    multiprocess_mode='liveall',
+)
+
+_process = None
+_refreshed_at = 0.0
+_refresh_lock = threading.Lock()
+
+
+def metrics_enabled():
+    return settings.API_METRICS['ENABLED']
+
+
+def request_started():
+    REQUESTS_IN_FLIGHT.inc()
+    if time.monotonic() - _refreshed_at >= settings.API_METRICS['REFRESH_SECONDS']:
+        refresh_process_metrics()
+
+
+def request_finished(endpoint=None, status=None, seconds=None):
+    REQUESTS_IN_FLIGHT.dec()
+    if endpoint is not None:
+        REQUEST_LATENCY.labels(endpoint=endpoint, status=str(status)).observe(seconds)
+
+
+def observe_upstream(name, seconds, failed):
+    UPSTREAM_LATENCY.labels(function=name, outcome='error' if failed else 'ok').observe(seconds)
+
+
+add_listener(observe_upstream)
+
+
+def refresh_process_metrics():
+    """Update the per-worker gauges from psutil, the log sink and the governor."""
+    global _process, _refreshed_at
+    with _refresh_lock:
+        _refreshed_at = time.monotonic()
+        if _process is None or _process.pid != os.getpid():
+            _process = psutil.Process()
+        PROCESS_RSS.set(_process.memory_info().rss)
+        PROCESS_CPU.set(_process.cpu_percent())
+    sink = log_sink.stats()
+    LOG_BUFFERED.set(sink['buffered'])
+    LOG_DROPPED.set(sink['dropped'])
+    DEEPSEEK_QUEUE_DEPTH.set(get_governor().waiting)
+
+
+def render_metrics():
+    """Return the exposition text: all workers in multiprocess mode, else this process."""
+    refresh_process_metrics()
+    governor = get_governor()
+    if governor.enabled:
+        DEEPSEEK_IN_FLIGHT.set(governor.stats()['in_flight'])
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    if not metrics_enabled():
+        raise Http404('Metrics are disabled')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
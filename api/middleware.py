@@ -0,0 +1,204 @@
+"""
+Request timing and APICallLog recording for every API route.
+
+The middleware times each request on the monotonic perf_counter_ns clock and
+hands one APICallLog row per request to the log sink. The endpoint is the
+resolved URL name (``docker-tags`` -> ``docker_tags``); the ``-async``
+variants are logged under their sync name with ``async: true``. Streaming
+responses are logged when the stream ends, so their latency and size cover
+the whole body.
+
+Views add details through the helpers below instead of building rows:
+``log_params(request, ...)`` records request parameters and
+``api_log(request)`` gives streams access to the pending entry.
+
+With API_TRACING on, each request is also recorded as a utility.watch
+trace, so spans opened while serving it form one tree (see /api/traces/).
+With API_METRICS on, the same timing feeds the Prometheus histograms in
+api.metrics.
+"""
+import contextlib
+import json
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+from utility.watch import Span, trace
+
+from . import metrics
+from .log_sink import log_sink
+from .models import APICallLog
+
+LOGGED_NAMESPACES = ('api',)
+MAX_ERROR_LENGTH = 1000
+
+
+class PendingLog:
+    """What the middleware will write for the current request."""
+
+    __slots__ = ('error', 'params', 'started_at', 'started_ns', 'status_code')
+
+    def __init__(self):
+        self.started_ns = time.perf_counter_ns()
+        self.started_at = timezone.now()
+        self.params = {}
+        self.error = ''
+        self.status_code = None
+
+    def elapsed_ms(self):
+        return (time.perf_counter_ns() - self.started_ns) / 1e6
+
+
+def api_log(request):
+    """Return the pending log entry of `request` (a Django or DRF request)."""
+    request = getattr(request, '_request', request)
+    pending = getattr(request, 'api_log', None)
+    if pending is None:
+        pending = request.api_log = PendingLog()
+    return pending
+
+
+def log_params(request, **params):
+    """Record request parameters on the request's log entry."""
+    api_log(request).params.update(params)
+
+
+def elapsed_ms(request):
+    """Milliseconds since the request entered the middleware."""
+    return api_log(request).elapsed_ms()
+
+
+def tracing_enabled():
+    return settings.API_TRACING['ENABLED']
+
+
+class APICallLogMiddleware:
+    """Times every API request and writes its APICallLog row through the log sink."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        pending = api_log(request)
+        self._started()
+        with self._trace(request) as current:
+            response = self.get_response(request)
+            endpoint = self._endpoint(request, pending, current, response)
+            if endpoint is None:
+                self._finished()
+                return response
+            if response.streaming:
+                wrap = self._awrap if response.is_async else self._wrap
+                response.streaming_content = wrap(response.streaming_content, endpoint, response, pending)
+            else:
+                with Span('log write'):
+                    log_sink.write(self._entry(endpoint, response, pending, len(response.content)))
+        return response
+
+    async def __acall__(self, request):
+        pending = api_log(request)
+        self._started()
+        with self._trace(request) as current:
+            response = await self.get_response(request)
+            endpoint = self._endpoint(request, pending, current, response)
+            if endpoint is None:
+                self._finished()
+                return response
+            if response.streaming:
+                wrap = self._awrap if response.is_async else self._wrap
+                response.streaming_content = wrap(response.streaming_content, endpoint, response, pending)
+            else:
+                with Span('log write'):
+                    await log_sink.awrite(self._entry(endpoint, response, pending, len(response.content)))
+        return response
+
+    # ----------------------------------------
+    # Helper
+    # ----------------------------------------
+    @staticmethod
+    def _started():
+        if metrics.metrics_enabled():
+            metrics.request_started()
+
+    @staticmethod
+    def _finished(entry=None):
+        if metrics.metrics_enabled():
+            if entry is None:
+                metrics.request_finished()
+            else:
+                metrics.request_finished(entry.endpoint, entry.status_code, entry.response_time_ms / 1000)
+
+    @staticmethod
+    def _trace(request):
+        if not tracing_enabled():
+            return contextlib.nullcontext()
+        return trace(f'{request.method} {request.path}')
+
+    @staticmethod
+    def _endpoint(request, pending, current, response):
+        match = request.resolver_match
+        if match is None or match.namespace not in LOGGED_NAMESPACES or not match.url_name:
+            return None
+        endpoint = match.url_name.replace('-', '_')
+        if endpoint.endswith('_async'):
+            endpoint = endpoint[:-len('_async')]
+            pending.params.setdefault('async', True)
+        if current is not None:
+            current.attrs.update(endpoint=endpoint, status_code=response.status_code)
+        return endpoint
+
+    def _wrap(self, content, endpoint, response, pending):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            log_sink.write(self._entry(endpoint, response, pending, size))
+
+    async def _awrap(self, content, endpoint, response, pending):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            await log_sink.awrite(self._entry(endpoint, response, pending, size))
+
+    def _entry(self, endpoint, response, pending, size):
+        status_code = pending.status_code or response.status_code
+        error = pending.error
+        if not error and status_code >= 400 and not response.streaming:
+            error = self._error_message(response)
+        entry = APICallLog(
+            endpoint=endpoint,
+            timestamp=pending.started_at,
+            response_time_ms=pending.elapsed_ms(),
+            status_code=status_code,
+            response_size=size,
+            error_message=error,
+            request_params=pending.params or None,
+        )
+        self._finished(entry)
+        return entry
+
+    @staticmethod
+    def _error_message(response):
+        """Use the `error` field of a JSON error body, or the body itself."""
+        try:
+            data = json.loads(response.content)
+        except ValueError:
+            return response.content[:MAX_ERROR_LENGTH].decode('utf-8', 'replace')
+        if isinstance(data, dict) and 'error' in data:
+            data = data['error']
+        return str(data)[:MAX_ERROR_LENGTH]
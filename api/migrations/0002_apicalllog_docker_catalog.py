@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="apicalllog",
+            name="endpoint",
+            field=models.CharField(
+                choices=[
+                    ("docker_repos", "Docker Repositories"),
+                    ("docker_tags", "Docker Tags"),
+                    ("docker_catalog", "Docker Catalog"),
+                    ("ai_chat", "AI Chat"),
+                    ("health", "Health Check"),
+                ],
+                help_text="API endpoint that was called",
+                max_length=50,
+            ),
+        ),
+    ]
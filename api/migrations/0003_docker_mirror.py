@@ -0,0 +1,115 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_apicalllog_docker_catalog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DockerRepo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "namespace",
+                    models.CharField(
+                        help_text="Docker Hub user or organisation", max_length=255
+                    ),
+                ),
+                ("name", models.CharField(help_text="Repository name", max_length=255)),
+                ("description", models.TextField(blank=True, default="", null=True)),
+                ("is_private", models.BooleanField(default=False)),
+                ("star_count", models.IntegerField(default=0)),
+                ("pull_count", models.BigIntegerField(default=0)),
+                (
+                    "last_updated",
+                    models.DateTimeField(
+                        blank=True,
+                        db_index=True,
+                        help_text="Last push to the repository according to Docker Hub",
+                        null=True,
+                    ),
+                ),
+                (
+                    "synced_at",
+                    models.DateTimeField(
+                        auto_now=True, help_text="When this row was last synced"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Docker Repository",
+                "verbose_name_plural": "Docker Repositories",
+                "ordering": ["namespace", "name"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("namespace", "name"), name="unique_docker_repo"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DockerTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(help_text="Tag name", max_length=255)),
+                ("full_size", models.BigIntegerField(blank=True, null=True)),
+                ("last_updated", models.DateTimeField(blank=True, null=True)),
+                (
+                    "last_updater_username",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                (
+                    "synced_at",
+                    models.DateTimeField(
+                        auto_now=True, help_text="When this row was last synced"
+                    ),
+                ),
+                (
+                    "repo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tags",
+                        to="api.dockerrepo",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Docker Tag",
+                "verbose_name_plural": "Docker Tags",
+                "ordering": ["repo", "-last_updated"],
+                "indexes": [
+                    models.Index(
+                        fields=["repo", "-last_updated"],
+                        name="api_dockert_repo_id_92e496_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("repo", "name"), name="unique_docker_tag"
+                    )
+                ],
+            },
+        ),
+    ]
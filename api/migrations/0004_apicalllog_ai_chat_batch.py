@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_docker_mirror"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="apicalllog",
+            name="endpoint",
+            field=models.CharField(
+                choices=[
+                    ("docker_repos", "Docker Repositories"),
+                    ("docker_tags", "Docker Tags"),
+                    ("docker_catalog", "Docker Catalog"),
+                    ("ai_chat", "AI Chat"),
+                    ("ai_chat_batch", "AI Chat Batch"),
+                    ("health", "Health Check"),
+                ],
+                help_text="API endpoint that was called",
+                max_length=50,
+            ),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:12
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_apicalllog_ai_chat_batch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "system_prompt",
+                    models.TextField(
+                        blank=True,
+                        default="",
+                        help_text="Optional system message for every turn",
+                    ),
+                ),
+                (
+                    "window_start",
+                    models.PositiveIntegerField(
+                        default=0, help_text="First turn sequence number sent upstream"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Chat Session",
+                "verbose_name_plural": "Chat Sessions",
+                "ordering": ["-updated_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ChatTurn",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "seq",
+                    models.PositiveIntegerField(
+                        help_text="Position of the turn within the session"
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[("user", "User"), ("assistant", "Assistant")],
+                        max_length=16,
+                    ),
+                ),
+                ("content", models.TextField()),
+                (
+                    "tokens",
+                    models.PositiveIntegerField(
+                        help_text="Estimated prompt tokens of the content"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="turns",
+                        to="api.chatsession",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Chat Turn",
+                "verbose_name_plural": "Chat Turns",
+                "ordering": ["session", "seq"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("session", "seq"), name="unique_chat_turn"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,169 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_apicalllog_traces_endpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="APICallHourRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bucket_start",
+                    models.DateTimeField(help_text="Start of the time bucket"),
+                ),
+                ("endpoint", models.CharField(max_length=50)),
+                (
+                    "status_class",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "Unknown"),
+                            (1, "1xx"),
+                            (2, "2xx"),
+                            (3, "3xx"),
+                            (4, "4xx"),
+                            (5, "5xx"),
+                        ]
+                    ),
+                ),
+                ("calls", models.PositiveBigIntegerField(default=0)),
+                (
+                    "latency_count",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="Calls with a recorded response time"
+                    ),
+                ),
+                (
+                    "latency_sum",
+                    models.FloatField(
+                        default=0, help_text="Sum of response times in milliseconds"
+                    ),
+                ),
+                ("latency_min", models.FloatField(blank=True, null=True)),
+                ("latency_max", models.FloatField(blank=True, null=True)),
+                ("le_0", models.PositiveBigIntegerField(default=0)),
+                ("le_1", models.PositiveBigIntegerField(default=0)),
+                ("le_2", models.PositiveBigIntegerField(default=0)),
+                ("le_3", models.PositiveBigIntegerField(default=0)),
+                ("le_4", models.PositiveBigIntegerField(default=0)),
+                ("le_5", models.PositiveBigIntegerField(default=0)),
+                ("le_6", models.PositiveBigIntegerField(default=0)),
+                ("le_7", models.PositiveBigIntegerField(default=0)),
+                ("le_8", models.PositiveBigIntegerField(default=0)),
+                ("le_9", models.PositiveBigIntegerField(default=0)),
+                ("le_10", models.PositiveBigIntegerField(default=0)),
+                ("le_11", models.PositiveBigIntegerField(default=0)),
+                ("le_12", models.PositiveBigIntegerField(default=0)),
+                ("le_13", models.PositiveBigIntegerField(default=0)),
+                ("le_14", models.PositiveBigIntegerField(default=0)),
+                ("le_15", models.PositiveBigIntegerField(default=0)),
+                ("le_16", models.PositiveBigIntegerField(default=0)),
+                ("le_17", models.PositiveBigIntegerField(default=0)),
+                ("le_18", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "API Call Hour Rollup",
+                "verbose_name_plural": "API Call Hour Rollups",
+                "ordering": ["-bucket_start", "endpoint", "status_class"],
+                "abstract": False,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("bucket_start", "endpoint", "status_class"),
+                        name="unique_hour_rollup",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="APICallMinuteRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bucket_start",
+                    models.DateTimeField(help_text="Start of the time bucket"),
+                ),
+                ("endpoint", models.CharField(max_length=50)),
+                (
+                    "status_class",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "Unknown"),
+                            (1, "1xx"),
+                            (2, "2xx"),
+                            (3, "3xx"),
+                            (4, "4xx"),
+                            (5, "5xx"),
+                        ]
+                    ),
+                ),
+                ("calls", models.PositiveBigIntegerField(default=0)),
+                (
+                    "latency_count",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="Calls with a recorded response time"
+                    ),
+                ),
+                (
+                    "latency_sum",
+                    models.FloatField(
+                        default=0, help_text="Sum of response times in milliseconds"
+                    ),
+                ),
+                ("latency_min", models.FloatField(blank=True, null=True)),
+                ("latency_max", models.FloatField(blank=True, null=True)),
+                ("le_0", models.PositiveBigIntegerField(default=0)),
+                ("le_1", models.PositiveBigIntegerField(default=0)),
+                ("le_2", models.PositiveBigIntegerField(default=0)),
+                ("le_3", models.PositiveBigIntegerField(default=0)),
+                ("le_4", models.PositiveBigIntegerField(default=0)),
+                ("le_5", models.PositiveBigIntegerField(default=0)),
+                ("le_6", models.PositiveBigIntegerField(default=0)),
+                ("le_7", models.PositiveBigIntegerField(default=0)),
+                ("le_8", models.PositiveBigIntegerField(default=0)),
+                ("le_9", models.PositiveBigIntegerField(default=0)),
+                ("le_10", models.PositiveBigIntegerField(default=0)),
+                ("le_11", models.PositiveBigIntegerField(default=0)),
+                ("le_12", models.PositiveBigIntegerField(default=0)),
+                ("le_13", models.PositiveBigIntegerField(default=0)),
+                ("le_14", models.PositiveBigIntegerField(default=0)),
+                ("le_15", models.PositiveBigIntegerField(default=0)),
+                ("le_16", models.PositiveBigIntegerField(default=0)),
+                ("le_17", models.PositiveBigIntegerField(default=0)),
+                ("le_18", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "API Call Minute Rollup",
+                "verbose_name_plural": "API Call Minute Rollups",
+                "ordering": ["-bucket_start", "endpoint", "status_class"],
+                "abstract": False,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("bucket_start", "endpoint", "status_class"),
+                        name="unique_minute_rollup",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_api_call_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="apicalllog",
+            index=models.Index(
+                fields=["endpoint", "timestamp"], name="apicalllog_endpoint_recent"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="apicalllog",
+            index=models.Index(
+                condition=models.Q(
+                    ("status_code__lt", 200), ("status_code__gte", 300), _connector="OR"
+                ),
+                fields=["timestamp"],
+                name="apicalllog_failed_recent",
+            ),
+        ),
+    ]
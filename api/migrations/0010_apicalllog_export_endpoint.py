@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_api_call_log_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="apicalllog",
+            name="endpoint",
+            field=models.CharField(
+                choices=[
+                    ("docker_repos", "Docker Repositories"),
+                    ("docker_tags", "Docker Tags"),
+                    ("docker_catalog", "Docker Catalog"),
+                    ("ai_chat", "AI Chat"),
+                    ("ai_chat_batch", "AI Chat Batch"),
+                    ("health", "Health Check"),
+                    ("chat_session_list", "Chat Sessions"),
+                    ("chat_session_detail", "Chat Session"),
+                    ("api_log_list", "API Call Logs"),
+                    ("api_log_detail", "API Call Log"),
+                    ("api_log_stats", "API Call Log Statistics"),
+                    ("api_log_export", "API Call Log Export"),
+                    ("api_root", "API Root"),
+                    ("schema", "OpenAPI Schema"),
+                    ("swagger_ui", "Swagger UI"),
+                    ("redoc", "ReDoc"),
+                    ("traces", "Request Traces"),
+                ],
+                help_text="API endpoint that was called",
+                max_length=50,
+            ),
+        ),
+    ]
@@ -1,18 +1,41 @@
+import uuid
+
 from django.db import models
 from django.utils import timezone
 
+from utility.watch import LATENCY_BUCKETS_MS
+
+# Calls that did not return 2xx; matches the partial index on APICallLog, so keep filters identical to it
+FAILED_CALLS = models.Q(status_code__lt=200) | models.Q(status_code__gte=300)
+
 
 class APICallLog(models.Model):
     """
     Model to track API calls made through the DevOpsDemo API.
     Useful for monitoring, analytics, and demonstrating database operations in CI/CD.
+
+    Rows are written by api.middleware.APICallLogMiddleware; `endpoint` is
+    the URL name of the route that served the request.
     """
 
     ENDPOINT_CHOICES = [
         ('docker_repos', 'Docker Repositories'),
         ('docker_tags', 'Docker Tags'),
+        ('docker_catalog', 'Docker Catalog'),
         ('ai_chat', 'AI Chat'),
+        ('ai_chat_batch', 'AI Chat Batch'),
         ('health', 'Health Check'),
+        ('chat_session_list', 'Chat Sessions'),
+        ('chat_session_detail', 'Chat Session'),
+        ('api_log_list', 'API Call Logs'),
+        ('api_log_detail', 'API Call Log'),
+        ('api_log_stats', 'API Call Log Statistics'),
+        ('api_log_export', 'API Call Log Export'),
+        ('api_root', 'API Root'),
+        ('schema', 'OpenAPI Schema'),
+        ('swagger_ui', 'Swagger UI'),
+        ('redoc', 'ReDoc'),
+        ('traces', 'Request Traces'),
     ]
 
     endpoint = models.CharField(
@@ -45,6 +68,11 @@ class APICallLog(models.Model):
         blank=True,
         help_text="Request parameters (for analysis)"
     )
+    response_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Response body size in bytes"
+    )
 
     class Meta:
         ordering = ['-timestamp']
@@ -52,6 +80,8 @@ class APICallLog(models.Model):
         verbose_name_plural = 'API Call Logs'
         indexes = [
             models.Index(fields=['-timestamp', 'endpoint']),
+            models.Index(fields=['endpoint', 'timestamp'], name='apicalllog_endpoint_recent'),
+            models.Index(fields=['timestamp'], condition=FAILED_CALLS, name='apicalllog_failed_recent'),
         ]
 
     def __str__(self):
@@ -61,3 +91,179 @@ class APICallLog(models.Model):
     def was_successful(self):
         """Check if the API call was successful (2xx status code)"""
         return self.status_code and 200 <= self.status_code < 300
+
+
+class DockerRepo(models.Model):
+    """
+    Local mirror of a Docker Hub repository.
+    Kept up to date by the `sync_dockerhub` management command.
+    """
+
+    namespace = models.CharField(max_length=255, help_text="Docker Hub user or organisation")
+    name = models.CharField(max_length=255, help_text="Repository name")
+    description = models.TextField(blank=True, null=True, default='')
+    is_private = models.BooleanField(default=False)
+    star_count = models.IntegerField(default=0)
+    pull_count = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Last push to the repository according to Docker Hub"
+    )
+    synced_at = models.DateTimeField(auto_now=True, help_text="When this row was last synced")
+
+    class Meta:
+        ordering = ['namespace', 'name']
+        verbose_name = 'Docker Repository'
+        verbose_name_plural = 'Docker Repositories'
+        constraints = [
+            models.UniqueConstraint(fields=['namespace', 'name'], name='unique_docker_repo'),
+        ]
+
+    def __str__(self):
+        return f"{self.namespace}/{self.name}"
+
+
+class DockerTag(models.Model):
+    """Local mirror of a tag of a Docker Hub repository."""
+
+    repo = models.ForeignKey(DockerRepo, on_delete=models.CASCADE, related_name='tags')
+    name = models.CharField(max_length=255, help_text="Tag name")
+    full_size = models.BigIntegerField(null=True, blank=True)
+    last_updated = models.DateTimeField(null=True, blank=True)
+    last_updater_username = models.CharField(max_length=255, null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True, help_text="When this row was last synced")
+
+    class Meta:
+        ordering = ['repo', '-last_updated']
+        verbose_name = 'Docker Tag'
+        verbose_name_plural = 'Docker Tags'
+        constraints = [
+            models.UniqueConstraint(fields=['repo', 'name'], name='unique_docker_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['repo', '-last_updated']),
+        ]
+
+    def __str__(self):
+        return f"{self.repo}:{self.name}"
+
+
+class ChatSession(models.Model):
+    """
+    Server-side AI chat conversation.
+
+    Turns before `window_start` no longer fit the token budget and are left
+    out of the prompt. The window only moves when the history overflows, so
+    between trims every request repeats the previous prompt byte for byte and
+    the provider's prefix cache can reuse it.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    system_prompt = models.TextField(blank=True, default='', help_text="Optional system message for every turn")
+    window_start = models.PositiveIntegerField(default=0, help_text="First turn sequence number sent upstream")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        verbose_name = 'Chat Session'
+        verbose_name_plural = 'Chat Sessions'
+
+    def __str__(self):
+        return str(self.id)
+
+
+class ChatTurn(models.Model):
+    """One message of a ChatSession, stored exactly as it is sent upstream."""
+
+    ROLE_CHOICES = [
+        ('user', 'User'),
+        ('assistant', 'Assistant'),
+    ]
+
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='turns')
+    seq = models.PositiveIntegerField(help_text="Position of the turn within the session")
+    role = models.CharField(max_length=16, choices=ROLE_CHOICES)
+    content = models.TextField()
+    tokens = models.PositiveIntegerField(help_text="Estimated prompt tokens of the content")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['session', 'seq']
+        verbose_name = 'Chat Turn'
+        verbose_name_plural = 'Chat Turns'
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'seq'], name='unique_chat_turn'),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id}#{self.seq} {self.role}"
+
+
+class APICallRollup(models.Model):
+    """
+    APICallLog totals for one time bucket, endpoint and status class.
+
+    Rows are kept up to date by api.rollups as logs are written, so
+    statistics cost depends on the time range asked for rather than on the
+    size of the log table. `le_<i>` counts the timed calls that fell into
+    the i-th utility.watch LATENCY_BUCKETS_MS bucket; plain integer columns
+    let concurrent workers add to them with a single UPDATE.
+    """
+
+    STATUS_CLASS_CHOICES = [
+        (0, 'Unknown'),
+        (1, '1xx'),
+        (2, '2xx'),
+        (3, '3xx'),
+        (4, '4xx'),
+        (5, '5xx'),
+    ]
+
+    bucket_start = models.DateTimeField(help_text="Start of the time bucket")
+    endpoint = models.CharField(max_length=50)
+    status_class = models.PositiveSmallIntegerField(choices=STATUS_CLASS_CHOICES)
+    calls = models.PositiveBigIntegerField(default=0)
+    latency_count = models.PositiveBigIntegerField(default=0, help_text="Calls with a recorded response time")
+    latency_sum = models.FloatField(default=0, help_text="Sum of response times in milliseconds")
+    latency_min = models.FloatField(null=True, blank=True)
+    latency_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-bucket_start', 'endpoint', 'status_class']
+
+    def __str__(self):
+        return f"{self.endpoint} {self.get_status_class_display()} at {self.bucket_start:%Y-%m-%d %H:%M}"
+
+
+for _i in range(len(LATENCY_BUCKETS_MS)):
+    APICallRollup.add_to_class(f'le_{_i}', models.PositiveBigIntegerField(default=0))
+
+
+class APICallMinuteRollup(APICallRollup):
+    """APICallLog totals per minute."""
+
+    BUCKET_SECONDS = 60
+
+    class Meta(APICallRollup.Meta):
+        verbose_name = 'API Call Minute Rollup'
+        verbose_name_plural = 'API Call Minute Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['bucket_start', 'endpoint', 'status_class'], name='unique_minute_rollup'),
+        ]
+
+
+class APICallHourRollup(APICallRollup):
+    """APICallLog totals per hour."""
+
+    BUCKET_SECONDS = 3600
+
+    class Meta(APICallRollup.Meta):
+        verbose_name = 'API Call Hour Rollup'
+        verbose_name_plural = 'API Call Hour Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['bucket_start', 'endpoint', 'status_class'], name='unique_hour_rollup'),
+        ]
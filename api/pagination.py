@@ -0,0 +1,37 @@
+"""
+Pagination for the API call log.
+
+PageNumberPagination runs COUNT(*) over the whole table and an OFFSET scan
+on every page, so its cost grows with the table and with the page depth.
+The cursor mode used by default instead remembers the timestamp of the
+last row and seeks past it with ``timestamp < <position>``. SQLite indexes
+carry the rowid, so the `timestamp` index already orders rows by
+``(-timestamp, -id)`` and every page is one short index range scan,
+however deep it is.
+"""
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+MAX_PAGE_SIZE = 100
+
+
+class APICallLogCursorPagination(CursorPagination):
+    """Newest-first keyset pagination; pages are linked through opaque `next`/`previous` cursors."""
+
+    ordering = ('-timestamp', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class APICallLogPageNumberPagination(PageNumberPagination):
+    """Classic `?page=N` pagination with a total `count`, for clients that need random access."""
+
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+def wants_page_numbers(request):
+    """Page-number mode is opt-in with `?pagination=page` or by asking for a `?page=`."""
+    if request is None:
+        return False
+    params = request.query_params
+    return params.get('pagination') == 'page' or 'page' in params
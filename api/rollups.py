@@ -0,0 +1,213 @@
+"""
+Minute and hour rollups of APICallLog.
+
+Every log row written adds to the APICallMinuteRollup and APICallHourRollup
+rows of its bucket, endpoint and status class. Single saves are picked up
+by the post_save receiver below; the log sink calls `record` for the
+batches it bulk-inserts, in the same transaction. Each rollup row changes
+with one UPDATE of ``column = column + delta`` expressions, so the gunicorn
+workers can add to the same bucket concurrently without losing counts.
+
+`rollup_stats` answers /api/logs/stats/ from the rollups: whole hours from
+the hour table and the partial hours at either end from the minute table,
+both aggregated per endpoint in SQL. Windows are rounded to whole minutes.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from utility.watch import LATENCY_BUCKETS_MS, LatencyStats
+
+from .log_stats import summarize
+from .models import APICallHourRollup, APICallLog, APICallMinuteRollup
+
+ROLLUP_MODELS = (APICallMinuteRollup, APICallHourRollup)
+BUCKET_FIELDS = tuple(f'le_{i}' for i in range(len(LATENCY_BUCKETS_MS)))
+
+
+def status_class(status_code):
+    return status_code // 100 if status_code and 100 <= status_code < 600 else 0
+
+
+def bucket_start(moment, seconds):
+    """Floor `moment` to a multiple of `seconds` since the epoch."""
+    moment = moment.replace(microsecond=0)
+    return moment - datetime.timedelta(seconds=int(moment.timestamp()) % seconds)
+
+
+# ----------------------------------------
+# Writing
+# ----------------------------------------
+def record(entries):
+    """Add `entries` (APICallLog instances) to the rollups."""
+    deltas = {}
+    for entry in entries:
+        single = LatencyStats()
+        if entry.response_time_ms is not None:
+            single.observe(entry.response_time_ms * 1e6)
+        for model in ROLLUP_MODELS:
+            key = (model, bucket_start(entry.timestamp, model.BUCKET_SECONDS), entry.endpoint,
+                   status_class(entry.status_code))
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = [0, LatencyStats()]
+            delta[0] += 1
+            delta[1].merge(single)
+    for (model, start, endpoint, klass), (calls, latency) in deltas.items():
+        _apply(model, {'bucket_start': start, 'endpoint': endpoint, 'status_class': klass}, calls, latency)
+
+
+def _apply(model, key, calls, latency):
+    updates = {'calls': F('calls') + calls}
+    if latency.count:
+        low, high = latency.min_ns / 1e6, latency.max_ns / 1e6
+        updates.update(
+            latency_count=F('latency_count') + latency.count,
+            latency_sum=F('latency_sum') + latency.total_ns / 1e6,
+            latency_min=Least(Coalesce(F('latency_min'), Value(low)), Value(low)),
+            latency_max=Greatest(Coalesce(F('latency_max'), Value(high)), Value(high)),
+        )
+        updates.update({field: F(field) + n for field, n in zip(BUCKET_FIELDS, latency.buckets) if n})
+    if model.objects.filter(**key).update(**updates):
+        return
+    row = model(**key, calls=calls)
+    if latency.count:
+        row.latency_count = latency.count
+        row.latency_sum = latency.total_ns / 1e6
+        row.latency_min = latency.min_ns / 1e6
+        row.latency_max = latency.max_ns / 1e6
+        for field, n in zip(BUCKET_FIELDS, latency.buckets):
+            setattr(row, field, n)
+    try:
+        with transaction.atomic():
+            row.save(force_insert=True)
+    except IntegrityError:
+        # Another worker created the bucket in the meantime
+        model.objects.filter(**key).update(**updates)
+
+
+@receiver(post_save, sender=APICallLog, dispatch_uid='api_call_rollups')
+def _record_saved_log(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record([instance])
+
+
+def rebuild(chunk_size=5000, range_seconds=3600):
+    """
+    Recompute the rollups from APICallLog; returns the number of logs read.
+
+    Works through the hours that have logs, `range_seconds` (a multiple of
+    an hour) at a time, each in its own short transaction that deletes and
+    refills the rollups of that range, so request logging is never held up
+    for longer than one range. Rollups of ranges without logs, such as
+    hours whose logs were pruned, are left alone.
+    """
+    fields = ('endpoint', 'timestamp', 'status_code', 'response_time_ms')
+    logs = APICallLog.objects.order_by('timestamp')
+    step = datetime.timedelta(seconds=range_seconds)
+    total = 0
+    first = logs.values_list('timestamp', flat=True).first()
+    while first is not None:
+        start = bucket_start(first, APICallHourRollup.BUCKET_SECONDS)
+        end = start + step
+        with transaction.atomic():
+            for model in ROLLUP_MODELS:
+                model.objects.filter(bucket_start__gte=start, bucket_start__lt=end).delete()
+            batch = []
+            in_range = logs.filter(timestamp__gte=start, timestamp__lt=end).values(*fields)
+            for values in in_range.iterator(chunk_size=chunk_size):
+                batch.append(APICallLog(**values))
+                if len(batch) >= chunk_size:
+                    record(batch)
+                    total += len(batch)
+                    batch = []
+            record(batch)
+            total += len(batch)
+        first = logs.filter(timestamp__gte=end).values_list('timestamp', flat=True).first()
+    return total
+
+
+# ----------------------------------------
+# Reading
+# ----------------------------------------
+def _ceil(moment, seconds):
+    floor = bucket_start(moment, seconds)
+    return floor if floor == moment else floor + datetime.timedelta(seconds=seconds)
+
+
+def _rows(model, condition):
+    """Aggregate the rollup rows matching `condition` per endpoint, in the log_stats row format."""
+    rows = model.objects.filter(condition).order_by('endpoint').values('endpoint').annotate(
+        total_calls=Sum('calls'),
+        successful=Coalesce(Sum('calls', filter=Q(status_class=2)), 0),
+        client_errors=Coalesce(Sum('calls', filter=Q(status_class=4)), 0),
+        server_errors=Coalesce(Sum('calls', filter=Q(status_class=5)), 0),
+        total_latency=Sum('latency_sum'),
+        lowest=Min('latency_min'),
+        highest=Max('latency_max'),
+        **{f'sum_{field}': Sum(field) for field in BUCKET_FIELDS},
+    )
+    return [{
+        'endpoint': row['endpoint'],
+        'calls': row['total_calls'],
+        'successful': row['successful'],
+        'client_errors': row['client_errors'],
+        'server_errors': row['server_errors'],
+        'latency_sum': row['total_latency'],
+        'latency_min': row['lowest'],
+        'latency_max': row['highest'],
+        'buckets': [row[f'sum_{field}'] for field in BUCKET_FIELDS],
+    } for row in rows]
+
+
+def _between(start, end):
+    condition = Q()
+    if start is not None:
+        condition &= Q(bucket_start__gte=start)
+    if end is not None:
+        condition &= Q(bucket_start__lt=end)
+    return condition
+
+
+def _extreme(pick, *values):
+    values = [v for v in values if v is not None]
+    return pick(values) if values else None
+
+
+def _merge(rows):
+    merged = {}
+    for row in rows:
+        current = merged.get(row['endpoint'])
+        if current is None:
+            merged[row['endpoint']] = row
+            continue
+        for key in ('calls', 'successful', 'client_errors', 'server_errors'):
+            current[key] += row[key]
+        current['latency_sum'] = (current['latency_sum'] or 0) + (row['latency_sum'] or 0)
+        current['latency_min'] = _extreme(min, current['latency_min'], row['latency_min'])
+        current['latency_max'] = _extreme(max, current['latency_max'], row['latency_max'])
+        current['buckets'] = [a + b for a, b in zip(current['buckets'], row['buckets'])]
+    return [merged[endpoint] for endpoint in sorted(merged)]
+
+
+def rollup_stats(since=None, until=None):
+    """The log_stats response computed from the rollup tables."""
+    since = bucket_start(since, 60) if since else None
+    until = _ceil(until, 60) if until else None
+    first_hour = _ceil(since, 3600) if since else None
+    end_hour = bucket_start(until or timezone.now(), 3600)
+
+    if first_hour is not None and first_hour >= end_hour:
+        # Less than a whole hour: minutes only
+        rows = _rows(APICallMinuteRollup, _between(since, until))
+    else:
+        minutes = _between(end_hour, until)
+        if first_hour is not None:
+            minutes |= _between(since, first_hour)
+        rows = _rows(APICallHourRollup, _between(first_hour, end_hour)) + _rows(APICallMinuteRollup, minutes)
+    return summarize(_merge(rows), since, until)
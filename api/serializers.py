@@ -1,5 +1,10 @@
+import datetime
+import re
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import APICallLog
+from .models import APICallLog, ChatSession, ChatTurn
 
 
 class APICallLogSerializer(serializers.ModelSerializer):
@@ -22,6 +27,77 @@ class APICallLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['timestamp']
 
 
+class TimeBoundField(serializers.DateTimeField):
+    """A timestamp, or a duration before now such as `30m`, `24h` or `7d`."""
+
+    RELATIVE = re.compile(r'^(\d+)([smhd])$')
+    UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+    def to_internal_value(self, value):
+        match = self.RELATIVE.match(str(value).strip())
+        if match:
+            return timezone.now() - datetime.timedelta(**{self.UNITS[match.group(2)]: int(match.group(1))})
+        return super().to_internal_value(value)
+
+
+class LogWindowSerializer(serializers.Serializer):
+    """Query parameters selecting a time window of API call logs"""
+
+    since = TimeBoundField(required=False, help_text="Start of the window (inclusive)")
+    until = TimeBoundField(required=False, help_text="End of the window (exclusive)")
+
+    def validate(self, attrs):
+        if 'since' in attrs and 'until' in attrs and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError("'since' must be before 'until'")
+        return attrs
+
+
+class EndpointListField(serializers.CharField):
+    """Comma-separated endpoint names, e.g. `ai_chat,ai_chat_batch`."""
+
+    def to_internal_value(self, data):
+        names = [name.strip() for name in super().to_internal_value(data).split(',') if name.strip()]
+        valid = {choice for choice, _ in APICallLog.ENDPOINT_CHOICES}
+        unknown = [name for name in names if name not in valid]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown endpoint(s): {', '.join(unknown)}")
+        return names
+
+    def to_representation(self, value):
+        return ','.join(value)
+
+
+class LogFilterSerializer(LogWindowSerializer):
+    """Query parameters filtering the API call log"""
+
+    endpoint = EndpointListField(required=False, help_text="Comma-separated endpoint names")
+    status_min = serializers.IntegerField(required=False, min_value=100, max_value=599)
+    status_max = serializers.IntegerField(required=False, min_value=100, max_value=599)
+    failed = serializers.BooleanField(required=False, default=False, help_text="Only calls that did not return 2xx")
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if attrs.get('status_min', 0) > attrs.get('status_max', 599):
+            raise serializers.ValidationError("'status_min' must not exceed 'status_max'")
+        return attrs
+
+
+class LogExportQuerySerializer(LogFilterSerializer):
+    """Query parameters of /api/logs/export/"""
+
+    output = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson', help_text="Export format")
+
+
+class LogStatsQuerySerializer(LogWindowSerializer):
+    """Query parameters of /api/logs/stats/"""
+
+    source = serializers.ChoiceField(
+        choices=['rollups', 'logs'],
+        default='rollups',
+        help_text="'rollups' reads the minute/hour rollups, 'logs' scans APICallLog for exact bounds",
+    )
+
+
 class DockerRepoSerializer(serializers.Serializer):
     """Serializer for Docker Hub repository information"""
 
@@ -42,6 +118,51 @@ class DockerTagSerializer(serializers.Serializer):
     last_updater_username = serializers.CharField(required=False, allow_null=True)
 
 
+class DockerCatalogEntrySerializer(serializers.Serializer):
+    """Serializer for a repository and its tags in the Docker catalog"""
+
+    name = serializers.CharField()
+    tags = serializers.ListField(child=serializers.CharField())
+    error = serializers.CharField(allow_null=True)
+
+
+class DockerReposQuerySerializer(serializers.Serializer):
+    """Query parameters of the Docker repositories endpoints"""
+
+    page_size = serializers.IntegerField(
+        required=False,
+        default=10,
+        min_value=1,
+        max_value=100,
+        help_text="Repositories per upstream page; every repository is returned either way"
+    )
+
+
+class DockerCatalogQuerySerializer(serializers.Serializer):
+    """Query parameters of the Docker catalog endpoint"""
+
+    concurrency = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Maximum number of repositories whose tags are fetched at once (capped server-side)"
+    )
+
+
+class TraceQuerySerializer(serializers.Serializer):
+    """Query parameters of /api/traces/"""
+
+    output = serializers.ChoiceField(
+        choices=['tree', 'chrome'],
+        default='tree',
+        help_text="'tree' for span trees, 'chrome' for Chrome trace-event JSON",
+    )
+    limit = serializers.IntegerField(
+        default=20,
+        min_value=1,
+        help_text="Number of most recent traces to return",
+    )
+
+
 class ChatMessageSerializer(serializers.Serializer):
     """Serializer for chat messages"""
 
@@ -63,6 +184,23 @@ class ChatRequestSerializer(serializers.Serializer):
         required=False,
         help_text="Enable streaming responses"
     )
+    temperature = serializers.FloatField(
+        default=0.7,
+        required=False,
+        min_value=0.0,
+        max_value=2.0,
+        help_text="Sampling temperature"
+    )
+    cache = serializers.BooleanField(
+        default=False,
+        required=False,
+        help_text="Reuse a cached reply for an identical prompt (non-streaming only)"
+    )
+    session_id = serializers.UUIDField(
+        required=False,
+        allow_null=True,
+        help_text="Continue a chat session created via /api/ai/sessions/"
+    )
 
 
 class ChatResponseSerializer(serializers.Serializer):
@@ -71,6 +209,72 @@ class ChatResponseSerializer(serializers.Serializer):
     response = serializers.CharField()
     model = serializers.CharField()
     response_time_ms = serializers.FloatField()
+    cached = serializers.BooleanField(default=False)
+    session_id = serializers.UUIDField(required=False, allow_null=True)
+
+
+class ChatTurnSerializer(serializers.ModelSerializer):
+    """Serializer for one turn of a chat session"""
+
+    class Meta:
+        model = ChatTurn
+        fields = ['seq', 'role', 'content', 'tokens', 'created_at']
+
+
+class ChatSessionSerializer(serializers.ModelSerializer):
+    """Serializer for chat sessions and their history"""
+
+    turns = ChatTurnSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ChatSession
+        fields = ['id', 'system_prompt', 'window_start', 'created_at', 'updated_at', 'turns']
+        read_only_fields = ['window_start']
+
+
+class ChatBatchRequestSerializer(serializers.Serializer):
+    """Serializer for batched AI chat requests"""
+
+    items = ChatRequestSerializer(many=True, help_text="Chat requests; streaming is ignored in a batch")
+    concurrency = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Maximum number of items sent upstream at once"
+    )
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one item is required.")
+        if len(value) > settings.DEEPSEEK_BATCH['MAX_ITEMS']:
+            raise serializers.ValidationError(
+                f"At most {settings.DEEPSEEK_BATCH['MAX_ITEMS']} items are allowed per batch."
+            )
+        if any(item.get('session_id') for item in value):
+            raise serializers.ValidationError("Chat sessions are not supported in a batch.")
+        return value
+
+    def validate_concurrency(self, value):
+        return min(value, settings.DEEPSEEK_BATCH['MAX_CONCURRENCY'])
+
+
+class ChatBatchItemResultSerializer(serializers.Serializer):
+    """Serializer for one result of a batched AI chat request"""
+
+    index = serializers.IntegerField()
+    response = serializers.CharField(allow_null=True)
+    error = serializers.CharField(allow_null=True)
+    model = serializers.CharField()
+    response_time_ms = serializers.FloatField()
+    cached = serializers.BooleanField(default=False)
+
+
+class ChatBatchResponseSerializer(serializers.Serializer):
+    """Serializer for batched AI chat responses"""
+
+    results = ChatBatchItemResultSerializer(many=True)
+    succeeded = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    response_time_ms = serializers.FloatField()
 
 
 class HealthCheckSerializer(serializers.Serializer):
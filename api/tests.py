@@ -1,9 +1,52 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import timedelta
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
 from rest_framework.test import APIClient
 from rest_framework import status
-from unittest.mock import patch, MagicMock
-from .models import APICallLog
+from rest_framework.throttling import AnonRateThrottle
+from unittest.mock import patch, MagicMock, AsyncMock
+from .chat_sessions import build_messages, estimate_tokens, record_exchange
+from .docker_cache import CachedDockerHubManager
+from .log_export import iter_rows
+from .log_sink import LogSink
+from .log_stats import log_stats
+from .rollups import bucket_start, rebuild, rollup_stats
+from .dockerhub_sync import sync_namespace
+from .models import APICallHourRollup, APICallLog, APICallMinuteRollup, ChatSession, DockerRepo, DockerTag
+from src.LF_dockerhubmanger.docker_tools import NOT_MODIFIED, PageList
+from src.fctn_tools.completion_cache import CompletionCache
+from utility.watch import record_latency
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty response cache"""
+    cache.clear()
+    yield
+    cache.clear()
 
 
 @pytest.fixture
@@ -94,6 +137,116 @@ class TestAPICallLogViewSet:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data['results']) >= 1
 
+    def test_cursor_pages_cover_every_row_once(self, api_client):
+        """Test cursor pages walk (-timestamp, -id) without gaps, even across equal timestamps"""
+        base = timezone.now() - timedelta(hours=1)
+        created = [
+            APICallLog.objects.create(endpoint='health', status_code=200, timestamp=base - timedelta(seconds=i // 3))
+            for i in range(25)
+        ]
+        expected = [log.pk for log in sorted(created, key=lambda log: (log.timestamp, log.pk), reverse=True)]
+
+        seen = []
+        url = reverse('api:api-log-list') + '?page_size=4'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                data = api_client.get(url).data
+                assert 'count' not in data
+                seen += [row['id'] for row in data['results'] if row['endpoint'] == 'health']
+                url = data['next']
+
+        assert seen == expected
+        assert not any('COUNT(' in query['sql'] for query in queries.captured_queries)
+
+    def test_filters(self, api_client):
+        """Test endpoint, status range, window and failures-only filters"""
+        now = timezone.now()
+        for endpoint, code, minutes in (('ai_chat', 200, 5), ('ai_chat', 502, 5), ('ai_chat', 429, 120),
+                                        ('health', 500, 5), ('docker_repos', 304, 5)):
+            APICallLog.objects.create(endpoint=endpoint, status_code=code, timestamp=now - timedelta(minutes=minutes))
+        url = reverse('api:api-log-list')
+
+        def codes(**params):
+            return sorted(row['status_code'] for row in api_client.get(url, params).data['results'])
+
+        assert codes(endpoint='ai_chat', failed='true') == [429, 502]
+        assert codes(endpoint='ai_chat,health', status_min=500) == [500, 502]
+        assert codes(failed='true', since='1h') == [304, 500, 502]
+        assert codes(endpoint='ai_chat', until='1h') == [429]
+
+    def test_invalid_filters_are_rejected(self, api_client):
+        """Test unknown endpoints and inverted ranges return 400"""
+        url = reverse('api:api-log-list')
+
+        assert api_client.get(url, {'endpoint': 'nope'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(url, {'status_min': 500, 'status_max': 400}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_streams_ndjson(self, api_client):
+        """Test the export streams filtered rows oldest first, one JSON object per line"""
+        now = timezone.now()
+        for minutes in (30, 10, 20):
+            APICallLog.objects.create(endpoint='ai_chat', status_code=200, response_time_ms=minutes,
+                                      request_params={'model': 'deepseek-chat'},
+                                      timestamp=now - timedelta(minutes=minutes))
+        APICallLog.objects.create(endpoint='ai_chat', status_code=200, timestamp=now - timedelta(days=3))
+
+        response = api_client.get(reverse('api:api-log-export'), {'endpoint': 'ai_chat', 'since': '1h'})
+
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        assert [row['response_time_ms'] for row in rows] == [30, 20, 10]
+        assert rows[0]['request_params'] == {'model': 'deepseek-chat'}
+
+    def test_export_csv(self, api_client):
+        """Test CSV output has a header and one row per log"""
+        APICallLog.objects.create(endpoint='health', status_code=503, error_message='db, down')
+
+        response = api_client.get(reverse('api:api-log-export'), {'output': 'csv', 'failed': 'true'})
+
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        assert rows[0][:3] == ['id', 'endpoint', 'timestamp']
+        assert len(rows) == 2
+        assert rows[1][1] == 'health' and rows[1][5] == 'db, down'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_export_streams_asynchronously_under_asgi(self):
+        """Test ASGI requests get an async iterator instead of a buffered sync one"""
+        for minutes in (2, 1):
+            APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=minutes,
+                                      timestamp=timezone.now() - timedelta(minutes=minutes))
+
+        async def download():
+            response = await AsyncClient().get(reverse('api:api-log-export'), {'endpoint': 'health'})
+            return response, b''.join([part async for part in response.streaming_content])
+
+        response, body = async_to_sync(download)()
+
+        assert response.is_async
+        rows = [json.loads(line) for line in body.splitlines()]
+        assert [row['response_time_ms'] for row in rows] == [2, 1]
+
+    def test_export_chunks_continue_across_equal_timestamps(self):
+        """Test keyset chunks neither skip nor repeat rows that share a timestamp"""
+        moment = timezone.now()
+        created = [APICallLog.objects.create(endpoint='health', status_code=200, timestamp=moment).pk
+                   for _ in range(5)]
+
+        assert [row['id'] for row in iter_rows(APICallLog.objects.all(), chunk_size=2)] == created
+
+    def test_export_rejects_unknown_output(self, api_client):
+        """Test only ndjson and csv are offered"""
+        response = api_client.get(reverse('api:api-log-export'), {'output': 'xml'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_page_numbers_are_opt_in(self, api_client, api_call_log):
+        """Test ?pagination=page and ?page= switch to page-number pagination"""
+        url = reverse('api:api-log-list')
+
+        assert api_client.get(url, {'pagination': 'page'}).data['count'] >= 1
+        assert api_client.get(url, {'page': 1}).data['count'] >= 1
+
     def test_stats_endpoint(self, api_client):
         """Test stats endpoint"""
         # Create some test data
@@ -109,6 +262,57 @@ class TestAPICallLogViewSet:
         assert 'success_rate' in response.data
         assert 'average_response_time_ms' in response.data
 
+    def test_stats_break_down_by_endpoint(self, api_client):
+        """Test per-endpoint counts, error classes and percentiles"""
+        for ms in (10, 20, 30, 40):
+            APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=ms)
+        APICallLog.objects.create(endpoint='ai_chat', status_code=502, response_time_ms=900)
+        APICallLog.objects.create(endpoint='ai_chat', status_code=404, response_time_ms=None)
+
+        data = api_client.get(reverse('api:api-log-stats')).data
+
+        assert data['total_calls'] == 6
+        assert data['failed_calls'] == 2
+        assert data['client_errors'] == 1
+        assert data['server_errors'] == 1
+        assert data['max_response_time_ms'] == 900
+        health = data['endpoints']['health']
+        assert health['success_rate'] == 100
+        assert health['average_response_time_ms'] == 25
+        assert 10 <= health['p50_response_time_ms'] <= health['p99_response_time_ms'] <= 40
+        assert data['endpoints']['ai_chat']['failed_calls'] == 2
+
+    def test_stats_time_window(self, api_client):
+        """Test since/until select a window of logs"""
+        APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=5,
+                                  timestamp=timezone.now() - timedelta(days=2))
+        APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=5)
+
+        for source in ('rollups', 'logs'):
+            recent = api_client.get(reverse('api:api-log-stats'), {'since': '1d', 'source': source}).data
+            earlier = api_client.get(reverse('api:api-log-stats'), {'until': '1d', 'source': source}).data
+
+            assert recent['endpoints']['health']['total_calls'] == 1
+            assert earlier['endpoints']['health']['total_calls'] == 1
+            assert recent['window']['since'] is not None
+
+    def test_stats_rejects_invalid_window(self, api_client):
+        """Test malformed or inverted windows are rejected"""
+        url = reverse('api:api-log-stats')
+
+        assert api_client.get(url, {'since': 'yesterday'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(url, {'since': '1h', 'until': '2h'}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_stats_use_a_single_query(self, django_assert_num_queries):
+        """Test all aggregates come from one query"""
+        APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=5)
+        APICallLog.objects.create(endpoint='ai_chat', status_code=500, response_time_ms=50)
+
+        with django_assert_num_queries(1):
+            stats = log_stats(APICallLog.objects.all())
+
+        assert stats['total_calls'] == 2
+
 
 @pytest.mark.django_db
 class TestDockerEndpoints:
@@ -134,7 +338,7 @@ class TestDockerEndpoints:
                 'last_updated': '2025-01-01T00:00:00Z'
             }
         ]
-        mock_manager_class.return_value = mock_manager
+        mock_manager_class.shared.return_value = mock_manager
 
         url = reverse('api:docker-repos')
         response = api_client.get(url)
@@ -171,7 +375,7 @@ class TestDockerEndpoints:
                 'last_updater_username': 'testuser'
             }
         ]
-        mock_manager_class.return_value = mock_manager
+        mock_manager_class.shared.return_value = mock_manager
 
         url = reverse('api:docker-tags', kwargs={'repo_name': 'test-repo'})
         response = api_client.get(url)
@@ -180,6 +384,367 @@ class TestDockerEndpoints:
         assert len(response.data) == 1
         assert response.data[0]['name'] == 'latest'
 
+        response = api_client.get(url)
+        assert response.data[0]['name'] == 'latest'
+        mock_manager.get_tags_by_repo.assert_called_once()
+        logs = APICallLog.objects.filter(endpoint='docker_tags').order_by('id')
+        assert [log.request_params['cache'] for log in logs] == ['miss', 'hit']
+
+    @patch('api.views.DockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_catalog_success(self, mock_settings, mock_manager_class, api_client):
+        """Test catalog endpoint returns per-repo tags and isolates failures"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+
+        mock_manager = MagicMock()
+        mock_manager.get_catalog.return_value = [
+            {'name': 'repo-a', 'tags': ['latest', 'v1'], 'error': None},
+            {'name': 'repo-b', 'tags': [], 'error': 'boom'},
+        ]
+        mock_manager_class.shared.return_value = mock_manager
+
+        url = reverse('api:docker-catalog')
+        response = api_client.get(url, {'concurrency': 4})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['tags'] == ['latest', 'v1']
+        assert response.data[1]['error'] == 'boom'
+        mock_manager.get_catalog.assert_called_once_with(concurrency=4)
+        log = APICallLog.objects.filter(endpoint='docker_catalog').latest('timestamp')
+        assert log.request_params['failed'] == 1
+
+    @patch('api.views.DockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_catalog_rejects_invalid_concurrency(self, mock_settings, mock_manager_class, api_client):
+        """Test non-numeric or non-positive concurrency is a 400, not a 500"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+        url = reverse('api:docker-catalog')
+
+        assert api_client.get(url, {'concurrency': 'abc'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(url, {'concurrency': 0}).status_code == status.HTTP_400_BAD_REQUEST
+        mock_manager_class.shared.assert_not_called()
+
+class TestDockerHubCache:
+    """Tests for the Docker Hub response cache"""
+
+    def setup_method(self):
+        self.config = {
+            'ENABLED': True,
+            'TTL': {'get_repos': 60, 'get_tags_by_repo': 60},
+            'STALE_WHILE_REVALIDATE': 300,
+        }
+
+    def make_manager(self, tags):
+        manager = MagicMock()
+        manager.username = 'testuser'
+        result = PageList(tags)
+        result.etag = '"v1"'
+        manager.get_tags_by_repo.return_value = result
+        return manager
+
+    def test_miss_then_hit(self):
+        """Second lookup is served from cache without an upstream call"""
+        manager = self.make_manager(['latest'])
+        cached = CachedDockerHubManager(manager, config=self.config)
+
+        assert cached.get_tags_by_repo('repo') == (['latest'], 'miss')
+        assert cached.get_tags_by_repo('repo') == (['latest'], 'hit')
+        manager.get_tags_by_repo.assert_called_once_with(if_none_match=None, repo_name='repo')
+
+    @patch('api.docker_cache.threading.Thread')
+    def test_stale_revalidates_with_etag(self, mock_thread):
+        """Expired entries are served stale and revalidated with If-None-Match"""
+        manager = self.make_manager(['latest'])
+        cached = CachedDockerHubManager(manager, config=self.config)
+        cached.get_tags_by_repo('repo')
+
+        key = cached._key('get_tags_by_repo', {'repo_name': 'repo'})
+        entry = cache.get(key)
+        entry['stored_at'] -= 120
+        cache.set(key, entry)
+
+        manager.get_tags_by_repo.return_value = NOT_MODIFIED
+        assert cached.get_tags_by_repo('repo') == (['latest'], 'stale')
+
+        target = mock_thread.call_args.kwargs['target']
+        target(*mock_thread.call_args.kwargs['args'])
+        manager.get_tags_by_repo.assert_called_with(if_none_match='"v1"', repo_name='repo')
+        assert cached.get_tags_by_repo('repo') == (['latest'], 'hit')
+
+    def test_async_stale_is_revalidated_in_background(self):
+        """Async lookups share the cache entries and refresh stale ones in a task"""
+        manager = MagicMock(username='testuser')
+        manager.get_tags_by_repo = AsyncMock(return_value=['latest'])
+        cached = CachedDockerHubManager(manager, config=self.config)
+
+        async def scenario():
+            first = await cached.aget_tags_by_repo('repo')
+            key = cached._key('get_tags_by_repo', {'repo_name': 'repo'})
+            entry = cache.get(key)
+            entry['stored_at'] -= 120
+            cache.set(key, entry)
+            manager.get_tags_by_repo.return_value = ['latest', 'v2']
+            stale = await cached.aget_tags_by_repo('repo')
+            while manager.get_tags_by_repo.await_count < 2 or cache.get(f'{key}:revalidating'):
+                await asyncio.sleep(0.001)
+            return first, stale, await cached.aget_tags_by_repo('repo')
+
+        assert async_to_sync(scenario)() == (
+            (['latest'], 'miss'), (['latest'], 'stale'), (['latest', 'v2'], 'hit'),
+        )
+
+    def test_concurrent_misses_share_one_fetch(self):
+        """Concurrent misses for the same key wait for one upstream fetch"""
+        manager = self.make_manager(['latest'])
+        release = threading.Event()
+
+        def slow_fetch(**kwargs):
+            release.wait()
+            return ['latest']
+
+        manager.get_tags_by_repo.side_effect = slow_fetch
+        cached = CachedDockerHubManager(manager, config=self.config)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cached.get_tags_by_repo('repo'))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        while cached.flight.in_flight() == 0:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert manager.get_tags_by_repo.call_count == 1
+        assert sorted(status for _, status in results) == ['coalesced', 'coalesced', 'coalesced', 'miss']
+
+    @patch('api.docker_cache.file_lease')
+    def test_miss_takes_lease_only_for_shared_backend(self, mock_lease, tmp_path):
+        """A per-process locmem cache fills without the cross-worker lease; a shared one takes it"""
+        manager = self.make_manager(['latest'])
+        local = CachedDockerHubManager(manager, cache=LocMemCache('docker-test', {}), config=self.config)
+        shared = CachedDockerHubManager(manager, cache=FileBasedCache(str(tmp_path), {}), config=self.config)
+
+        assert local.get_tags_by_repo('repo') == (['latest'], 'miss')
+        mock_lease.assert_not_called()
+        assert shared.get_tags_by_repo('repo') == (['latest'], 'miss')
+        mock_lease.assert_called_once()
+
+    def test_disabled_bypasses_cache(self):
+        """Disabled cache always calls upstream"""
+        manager = self.make_manager(['latest'])
+        cached = CachedDockerHubManager(manager, config=dict(self.config, ENABLED=False))
+
+        cached.get_tags_by_repo('repo')
+        assert cached.get_tags_by_repo('repo')[1] == 'bypass'
+        assert manager.get_tags_by_repo.call_count == 2
+
+@pytest.mark.django_db
+class TestDockerMirror:
+    """Tests for the local Docker Hub mirror"""
+
+    def make_manager(self, repos, tags):
+        manager = MagicMock()
+        manager.username = 'testuser'
+        manager.iter_repo_records.side_effect = lambda: iter(repos)
+        manager.iter_tag_records.side_effect = lambda name: iter(tags.get(name, []))
+        return manager
+
+    def test_incremental_sync_stops_at_known_records(self):
+        """A second sync only reads records newer than the mirror"""
+        repos = [{'name': 'app', 'last_updated': '2025-01-02T00:00:00Z'}]
+        tags = {'app': [{'name': 'v1', 'full_size': 10, 'last_updated': '2025-01-02T00:00:00Z'}]}
+        stats = sync_namespace(self.make_manager(repos, tags))
+        assert stats == {'repos': 1, 'tags': 1, 'deleted_repos': 0}
+
+        repos = [
+            {'name': 'api', 'last_updated': '2025-01-03T00:00:00Z'},
+            {'name': 'app', 'last_updated': '2025-01-02T00:00:00Z'},
+        ]
+        tags['api'] = [{'name': 'latest', 'last_updated': '2025-01-03T00:00:00Z'}]
+        manager = self.make_manager(repos, tags)
+        stats = sync_namespace(manager)
+
+        assert stats['repos'] == 1
+        manager.iter_tag_records.assert_called_once_with('api')
+        assert set(DockerRepo.objects.values_list('name', flat=True)) == {'api', 'app'}
+        assert DockerTag.objects.count() == 2
+
+    def test_failed_tag_fetch_is_retried_by_next_sync(self):
+        """A repo whose tags failed to sync keeps the watermark below it until they succeed"""
+        repos = [
+            {'name': 'api', 'last_updated': '2025-01-03T00:00:00Z'},
+            {'name': 'app', 'last_updated': '2025-01-02T00:00:00Z'},
+        ]
+        tags = {
+            'api': [{'name': 'latest', 'last_updated': '2025-01-03T00:00:00Z'}],
+            'app': [{'name': 'v1', 'last_updated': '2025-01-02T00:00:00Z'}],
+        }
+        manager = self.make_manager(repos, tags)
+        manager.iter_tag_records.side_effect = [iter(tags['app']), RuntimeError('Docker Hub is down')]
+        with pytest.raises(RuntimeError):
+            sync_namespace(manager)
+
+        assert list(DockerRepo.objects.values_list('name', flat=True)) == ['app']
+
+        stats = sync_namespace(self.make_manager(repos, tags))
+        assert stats == {'repos': 1, 'tags': 1, 'deleted_repos': 0}
+        assert set(DockerTag.objects.values_list('name', flat=True)) == {'latest', 'v1'}
+
+    def test_tags_are_fetched_outside_the_write_transaction(self):
+        """Docker Hub is paged before the repo's transaction opens, not while it holds the write lock"""
+        depth = []
+        manager = self.make_manager([{'name': 'app'}], {})
+        manager.iter_tag_records.side_effect = lambda name: (
+            depth.append(len(connection.savepoint_ids)) or iter([{'name': 'v1'}])
+        )
+        outer = len(connection.savepoint_ids)
+
+        stats = sync_namespace(manager)
+
+        assert stats['tags'] == 1
+        assert depth == [outer]
+
+    def test_full_sync_removes_deleted_repos(self):
+        """A full sync drops repositories that no longer exist upstream"""
+        DockerRepo.objects.create(namespace='testuser', name='gone')
+        stats = sync_namespace(self.make_manager([{'name': 'app'}], {}), full=True)
+
+        assert stats['deleted_repos'] == 1
+        assert list(DockerRepo.objects.values_list('name', flat=True)) == ['app']
+
+    @patch('api.views.DockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_tags_from_mirror(self, mock_settings, mock_manager_class, api_client):
+        """Tags are served from the mirror without calling Docker Hub"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+        repo = DockerRepo.objects.create(namespace='testuser', name='app')
+        DockerTag.objects.create(repo=repo, name='v1', full_size=10)
+
+        url = reverse('api:docker-tags', kwargs={'repo_name': 'app'})
+        response = api_client.get(url, {'source': 'mirror'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0]['name'] == 'v1'
+        mock_manager_class.shared.assert_not_called()
+
+    @patch('api.views.DockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_repos_from_mirror_returns_every_repo(self, mock_settings, mock_manager_class, api_client):
+        """Like Docker Hub, the mirror returns every repository, most recently updated first"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+        for day, name in enumerate(['old', 'new', 'newest'], start=1):
+            DockerRepo.objects.create(
+                namespace='testuser', name=name, last_updated=f'2025-01-0{day}T00:00:00Z',
+            )
+
+        response = api_client.get(reverse('api:docker-repos'), {'source': 'mirror', 'page_size': 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [repo['name'] for repo in response.data] == ['newest', 'new', 'old']
+        mock_manager_class.shared.assert_not_called()
+
+    @patch('api.views.settings')
+    def test_docker_repos_rejects_invalid_page_size(self, mock_settings, api_client):
+        """page_size must be a Docker Hub page size, 1 to 100"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+
+        for url in (reverse('api:docker-repos'), reverse('api:docker-repos-async')):
+            for page_size in ('-1', '0', '500', 'ten'):
+                response = api_client.get(url, {'source': 'mirror', 'page_size': page_size})
+                assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncDockerEndpoints:
+    """Tests for the async (ASGI) Docker Hub endpoints"""
+
+    @patch('api.views.AsyncDockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_tags_async_success(self, mock_settings, mock_manager_class, api_client):
+        """Test async tags view awaits the shared async manager"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+
+        mock_manager = MagicMock()
+        mock_manager.get_tags_by_repo = AsyncMock(return_value=[{'name': 'latest'}])
+        mock_manager_class.shared.return_value = mock_manager
+
+        url = reverse('api:docker-tags-async', kwargs={'repo_name': 'test-repo'})
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]['name'] == 'latest'
+        mock_manager.get_tags_by_repo.assert_awaited_once_with('test-repo')
+        assert APICallLog.objects.filter(endpoint='docker_tags', status_code=200).exists()
+
+    @patch('api.views.settings')
+    def test_docker_repos_async_no_credentials(self, mock_settings, api_client):
+        """Test async repos view without credentials"""
+        mock_settings.DOCKERHUB_USERNAME = ''
+        mock_settings.DOCKERHUB_TOKEN = ''
+
+        response = api_client.get(reverse('api:docker-repos-async'))
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert 'error' in response.json()
+
+    def test_docker_repos_async_rejects_post(self, api_client):
+        """Test async repos view only accepts GET"""
+        response = api_client.post(reverse('api:docker-repos-async'))
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+    @patch('api.views.AsyncDockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_repos_async_uses_cache(self, mock_settings, mock_manager_class, api_client):
+        """Test a repeated async repos request is answered from the Docker Hub cache"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+        mock_manager = MagicMock(username='testuser')
+        mock_manager.get_repos = AsyncMock(return_value=[{'name': 'app'}])
+        mock_manager_class.shared.return_value = mock_manager
+
+        url = reverse('api:docker-repos-async')
+        first = api_client.get(url)
+        second = api_client.get(url)
+
+        assert first.json() == second.json()
+        mock_manager.get_repos.assert_awaited_once_with(page_size=10)
+        logs = APICallLog.objects.filter(endpoint='docker_repos').order_by('id')
+        assert [log.request_params['cache'] for log in logs] == ['miss', 'hit']
+
+    @patch('api.views.AsyncDockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_tags_async_from_mirror(self, mock_settings, mock_manager_class, api_client):
+        """Test async tags are served from the mirror without calling Docker Hub"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+        repo = DockerRepo.objects.create(namespace='testuser', name='app')
+        DockerTag.objects.create(repo=repo, name='v1', full_size=10)
+
+        url = reverse('api:docker-tags-async', kwargs={'repo_name': 'app'})
+        response = api_client.get(url, {'source': 'mirror'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]['name'] == 'v1'
+        mock_manager_class.shared.assert_not_called()
+
+    @patch('api.views.AsyncDockerHubManager')
+    @patch('api.views.settings')
+    def test_docker_repos_async_is_throttled(self, mock_settings, mock_manager_class, api_client):
+        """Test the async repos view applies the REST framework throttles"""
+        mock_settings.DOCKERHUB_USERNAME = 'testuser'
+        mock_settings.DOCKERHUB_TOKEN = 'testtoken'
+        mock_manager_class.shared.return_value.get_repos = AsyncMock(return_value=[])
+
+        with patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '1/hour', 'user': '1/hour'}):
+            codes = [api_client.get(reverse('api:docker-repos-async')).status_code for _ in range(2)]
+
+        assert codes == [status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS]
 
 @pytest.mark.django_db
 class TestAIEndpoints:
@@ -205,6 +770,64 @@ class TestAIEndpoints:
         assert response.data['response'] == "Hello! I'm DeepSeek AI."
         assert 'response_time_ms' in response.data
 
+    @patch('api.views.get_completion_cache')
+    @patch('api.views.call_deepseek')
+    @patch('api.views.settings')
+    def test_ai_chat_cache_hit_skips_upstream(self, mock_settings, mock_call_deepseek, mock_get_cache, api_client):
+        """Test an identical cached prompt is answered without calling DeepSeek"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_get_cache.return_value = CompletionCache(disk_path='')
+        mock_call_deepseek.return_value = "Hello! I'm DeepSeek AI."
+
+        url = reverse('api:ai-chat')
+        data = {'message': 'Hello', 'cache': True}
+        first = api_client.post(url, data, format='json')
+        second = api_client.post(url, data, format='json')
+
+        assert first.data['cached'] is False
+        assert second.data['cached'] is True
+        assert second.data['response'] == "Hello! I'm DeepSeek AI."
+        mock_call_deepseek.assert_called_once()
+        logs = APICallLog.objects.filter(endpoint='ai_chat').order_by('id')
+        assert [log.request_params['cache'] for log in logs] == ['miss', 'hit']
+
+    @patch('api.views.call_deepseek')
+    @patch('api.views.settings')
+    def test_ai_chat_stream_sends_sse_chunks(self, mock_settings, mock_call_deepseek, api_client):
+        """Test streaming chat forwards each upstream chunk as a server-sent event"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_call_deepseek.return_value = iter(['Hel', 'lo!'])
+
+        url = reverse('api:ai-chat')
+        response = api_client.post(url, {'message': 'Hello', 'stream': True}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'text/event-stream'
+        body = b''.join(response.streaming_content).decode()
+        events = body.strip().split('\n\n')
+        assert events[0] == 'data: {"delta": "Hel"}'
+        assert events[1] == 'data: {"delta": "lo!"}'
+        assert events[2].startswith('event: done\n')
+
+        log = APICallLog.objects.filter(endpoint='ai_chat').latest('timestamp')
+        assert log.status_code == 200
+        assert log.request_params['chunks'] == 2
+        assert log.request_params['first_token_ms'] is not None
+
+    @patch('api.views.call_deepseek')
+    @patch('api.views.settings')
+    def test_ai_chat_stream_reports_upstream_error(self, mock_settings, mock_call_deepseek, api_client):
+        """Test streaming chat turns an upstream failure into an error event"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_call_deepseek.return_value = "调用 API 出错: boom"
+
+        url = reverse('api:ai-chat')
+        response = api_client.post(url, {'message': 'Hello', 'stream': True}, format='json')
+        body = b''.join(response.streaming_content).decode()
+
+        assert body.startswith('event: error\n')
+        assert APICallLog.objects.filter(endpoint='ai_chat').latest('timestamp').status_code == 500
+
     @patch('api.views.settings')
     def test_ai_chat_no_api_key(self, mock_settings, api_client):
         """Test AI chat without API key"""
@@ -227,3 +850,584 @@ class TestAIEndpoints:
         response = api_client.post(url, data, format='json')
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestAPICallLogMiddleware:
+    """Tests for the request logging middleware"""
+
+    def test_every_api_route_is_logged_by_url_name(self, api_client):
+        """Test routes without their own logging are recorded too"""
+        response = api_client.get(reverse('api:api-log-list'))
+
+        log = APICallLog.objects.get(endpoint='api_log_list')
+        assert log.status_code == 200
+        assert log.response_size == len(response.content)
+        assert log.response_time_ms > 0
+
+    def test_error_message_comes_from_the_response(self, api_client):
+        """Test error responses record their error field"""
+        api_client.get(reverse('api:chat-session-detail', args=[uuid.uuid4()]))
+
+        log = APICallLog.objects.get(endpoint='chat_session_detail')
+        assert log.status_code == 404
+        assert log.error_message
+
+    def test_non_api_routes_are_not_logged(self, client):
+        """Test only the api namespace is recorded"""
+        client.get('/')
+
+        assert APICallLog.objects.count() == 0
+
+    def test_traces_show_spans_of_recent_requests(self, api_client, settings):
+        """Test a traced request exposes its span tree"""
+        settings.API_TRACING = {'ENABLED': True}
+        DockerRepo.objects.create(namespace='testuser', name='app')
+        settings.DOCKERHUB_USERNAME = 'testuser'
+        settings.DOCKERHUB_TOKEN = 'token'
+
+        api_client.get(reverse('api:docker-repos'), {'source': 'mirror'})
+        response = api_client.get(reverse('api:traces'), {'limit': 1})
+
+        latest = response.data[0]
+        assert latest['attrs']['endpoint'] == 'docker_repos'
+        assert [node['name'] for node in latest['spans']] == ['mirror query', 'serialize', 'log write']
+        chrome = api_client.get(reverse('api:traces'), {'output': 'chrome'})
+        assert chrome.data['traceEvents'][0]['ph'] == 'X'
+
+    def test_traces_are_disabled_by_default(self, api_client):
+        """Test the traces endpoint is hidden unless tracing is on"""
+        response = api_client.get(reverse('api:traces'))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_traces_reject_bad_parameters(self, api_client, settings):
+        """Test a non-numeric or non-positive limit and unknown outputs return 400"""
+        settings.API_TRACING = {'ENABLED': True}
+        url = reverse('api:traces')
+
+        assert api_client.get(url, {'limit': 'ten'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(url, {'limit': 0}).status_code == status.HTTP_400_BAD_REQUEST
+        assert api_client.get(url, {'output': 'xml'}).status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+class TestLogSink:
+    """Tests for the buffered APICallLog writer"""
+
+    def make_sink(self, **overrides):
+        config = {'ASYNC': True, 'BATCH_SIZE': 100, 'FLUSH_INTERVAL_MS': 60000, 'MAX_BUFFER': 100}
+        config.update(overrides)
+        return LogSink(config=config)
+
+    def test_entries_are_written_in_one_batch(self):
+        """Test buffered entries reach the database only on flush"""
+        sink = self.make_sink()
+        for _ in range(3):
+            sink.write(APICallLog(endpoint='health', status_code=200))
+
+        assert APICallLog.objects.count() == 0
+        assert sink.flush() == 3
+        assert APICallLog.objects.count() == 3
+        assert sink.stats() == {'buffered': 0, 'written': 3, 'dropped': 0, 'failed': 0}
+
+    def test_full_buffer_drops_and_counts(self):
+        """Test the buffer is bounded"""
+        sink = self.make_sink(MAX_BUFFER=2)
+        for _ in range(3):
+            sink.write(APICallLog(endpoint='health', status_code=200))
+
+        assert sink.stats()['dropped'] == 1
+        assert sink.flush() == 2
+
+    def test_sync_mode_saves_inline(self):
+        """Test buffering can be switched off"""
+        sink = self.make_sink(ASYNC=False)
+        sink.write(APICallLog(endpoint='health', status_code=200))
+
+        assert APICallLog.objects.count() == 1
+        assert sink.stats()['buffered'] == 0
+
+
+    @patch('api.log_sink.close_old_connections')
+    @patch('api.log_sink.transaction')
+    @patch('api.log_sink.rollups.record')
+    @patch('api.log_sink.APICallLog.objects.bulk_create')
+    def test_full_batch_is_flushed_by_the_thread(self, mock_bulk_create, mock_record, mock_transaction, mock_close):
+        """Test reaching BATCH_SIZE wakes the flush thread"""
+        sink = self.make_sink(BATCH_SIZE=2)
+        try:
+            sink.write(APICallLog(endpoint='health', status_code=200))
+            sink.write(APICallLog(endpoint='health', status_code=200))
+
+            deadline = time.monotonic() + 5
+            while sink.stats()['written'] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            sink.stop()
+        mock_bulk_create.assert_called_once()
+        assert len(mock_bulk_create.call_args.args[0]) == 2
+
+    @patch('api.log_sink.close_old_connections')
+    @patch('api.log_sink.transaction')
+    @patch('api.log_sink.rollups.record')
+    @patch('api.log_sink.APICallLog.objects.bulk_create')
+    def test_stop_waits_for_the_batch_being_written(self, mock_bulk_create, mock_record, mock_transaction, mock_close):
+        """Test stopping lets the thread finish its batch and flushes the rest"""
+        writing = threading.Event()
+
+        def slow_write(batch, **kwargs):
+            writing.set()
+            time.sleep(0.2)
+
+        mock_bulk_create.side_effect = slow_write
+        sink = self.make_sink(BATCH_SIZE=2)
+        sink.write(APICallLog(endpoint='health', status_code=200))
+        sink.write(APICallLog(endpoint='health', status_code=200))
+        assert writing.wait(5)
+        sink.write(APICallLog(endpoint='health', status_code=200))
+
+        sink.stop()
+
+        assert sink.stats()['written'] == 3
+        assert not sink._thread.is_alive()
+
+    @patch('api.log_sink.threading.Thread')
+    def test_entries_inherited_by_a_fork_count_as_dropped(self, mock_thread):
+        """Test a forked worker discards the parent's buffered entries and says so"""
+        sink = self.make_sink()
+        sink.write(APICallLog(endpoint='health', status_code=200))
+        sink.write(APICallLog(endpoint='health', status_code=200))
+        sink._pid = -1  # as if this process had been forked from the one that buffered them
+
+        sink.write(APICallLog(endpoint='health', status_code=200))
+
+        assert sink.stats() == {'buffered': 1, 'written': 0, 'dropped': 2, 'failed': 0}
+
+@pytest.mark.django_db
+class TestRollups:
+    """Tests for the APICallLog minute/hour rollups"""
+
+    def test_saved_logs_update_both_rollups(self):
+        """Test each saved log adds to its minute and hour bucket"""
+        APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=3)
+        APICallLog.objects.create(endpoint='health', status_code=204, response_time_ms=40)
+        APICallLog.objects.create(endpoint='health', status_code=503, response_time_ms=None)
+
+        for model in (APICallMinuteRollup, APICallHourRollup):
+            ok = model.objects.get(endpoint='health', status_class=2)
+            assert (ok.calls, ok.latency_count, ok.latency_sum) == (2, 2, 43)
+            assert (ok.latency_min, ok.latency_max) == (3, 40)
+            assert ok.le_5 == 1 and ok.le_8 == 1
+            failed = model.objects.get(endpoint='health', status_class=5)
+            assert (failed.calls, failed.latency_count, failed.latency_min) == (1, 0, None)
+
+    def test_sink_batches_update_rollups(self):
+        """Test bulk-inserted batches are rolled up too"""
+        sink = LogSink(config={'ASYNC': True, 'BATCH_SIZE': 100, 'FLUSH_INTERVAL_MS': 60000, 'MAX_BUFFER': 100})
+        for ms in (1, 2, 3):
+            sink.write(APICallLog(endpoint='ai_chat', status_code=200, response_time_ms=ms))
+        sink.flush()
+
+        assert APICallHourRollup.objects.get(endpoint='ai_chat').calls == 3
+
+    def test_rollup_stats_match_a_log_scan(self):
+        """Test stats from the rollups agree with stats from the raw logs"""
+        now = timezone.now()
+        for minutes, code, ms in ((5, 200, 12), (90, 200, 250), (90, 404, 8), (200, 500, 1200)):
+            APICallLog.objects.create(endpoint='ai_chat', status_code=code, response_time_ms=ms,
+                                      timestamp=now - timedelta(minutes=minutes))
+
+        since = now - timedelta(hours=2)
+        from_rollups = rollup_stats(since=since)
+        from_logs = log_stats(APICallLog.objects.all(), since=since)
+
+        assert from_rollups['total_calls'] == from_logs['total_calls'] == 3
+        assert from_rollups['client_errors'] == 1
+        for key in ('average_response_time_ms', 'max_response_time_ms', 'p95_response_time_ms'):
+            assert from_rollups[key] == from_logs[key]
+        assert rollup_stats()['server_errors'] == 1
+
+    def test_rebuild_command(self):
+        """Test the rollups can be recomputed from the log table"""
+        APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=3)
+        APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=4)
+        APICallMinuteRollup.objects.all().delete()
+
+        call_command('rebuild_api_log_rollups', stdout=io.StringIO())
+
+        assert APICallMinuteRollup.objects.get(endpoint='health').calls == 2
+        assert APICallHourRollup.objects.get(endpoint='health').calls == 2
+
+    def test_rebuild_works_hour_by_hour(self):
+        """Test each hour with logs is refilled on its own and hours without logs are kept"""
+        now = timezone.now()
+        for hours in (0, 5, 5):
+            APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=3,
+                                      timestamp=now - timedelta(hours=hours))
+        APICallHourRollup.objects.filter(endpoint='health').update(calls=F('calls') + 10)
+        pruned = APICallHourRollup.objects.create(
+            bucket_start=bucket_start(now - timedelta(days=40), 3600), endpoint='health', status_class=2, calls=7,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            assert rebuild(chunk_size=1) == 3
+
+        assert sorted(APICallHourRollup.objects.filter(endpoint='health').values_list('calls', flat=True)) == [1, 2, 7]
+        pruned.refresh_from_db()
+        assert pruned.calls == 7
+        assert sum('DELETE FROM "api_apicallhourrollup"' in q['sql'] for q in queries.captured_queries) == 2
+
+    def test_rebuild_rejects_bad_ranges(self):
+        """Test --hours must be positive"""
+        with pytest.raises(CommandError):
+            call_command('rebuild_api_log_rollups', hours=0, stdout=io.StringIO())
+
+@pytest.mark.django_db
+class TestLogRetention:
+    """Tests for the prune_api_logs command"""
+
+    def make_logs(self, days_ago, count):
+        timestamp = timezone.now() - timedelta(days=days_ago)
+        for _ in range(count):
+            APICallLog.objects.create(endpoint='health', status_code=200, response_time_ms=2, timestamp=timestamp)
+        return timestamp
+
+    def test_expired_logs_are_archived_then_deleted(self, tmp_path):
+        """Test old rows move to per-day gzipped NDJSON in chunks"""
+        old = self.make_logs(40, 5)
+        self.make_logs(1, 2)
+
+        call_command('prune_api_logs', days=30, chunk_size=2, archive_dir=str(tmp_path), stdout=io.StringIO())
+
+        assert APICallLog.objects.count() == 2
+        path = tmp_path / f'{old:%Y}' / f'{old:%m}' / f'api_logs-{old:%Y-%m-%d}.ndjson.gz'
+        with gzip.open(path, 'rt') as fh:
+            rows = [json.loads(line) for line in fh]
+        assert len(rows) == 5
+        assert rows[0]['endpoint'] == 'health'
+        assert rows[0]['timestamp'].startswith(f'{old:%Y-%m-%d}')
+
+    def test_dry_run_keeps_everything(self, tmp_path):
+        """Test --dry-run only counts"""
+        self.make_logs(40, 3)
+        out = io.StringIO()
+
+        call_command('prune_api_logs', dry_run=True, archive_dir=str(tmp_path), stdout=out)
+
+        assert APICallLog.objects.count() == 3
+        assert 'Would remove 3' in out.getvalue()
+        assert not any(tmp_path.iterdir())
+
+    def test_minute_rollups_expire_before_hour_rollups(self):
+        """Test old minute rollups are pruned while hour rollups stay"""
+        self.make_logs(10, 1)
+
+        call_command('prune_api_logs', days=30, minute_rollup_days=7, no_archive=True, stdout=io.StringIO())
+
+        assert APICallLog.objects.count() == 1
+        assert not APICallMinuteRollup.objects.exists()
+        assert APICallHourRollup.objects.get(endpoint='health').calls == 1
+
+    def test_minute_rollup_days_must_be_positive(self):
+        """Test a zero retention for minute rollups is rejected instead of deleting them all"""
+        with pytest.raises(CommandError):
+            call_command('prune_api_logs', minute_rollup_days=0, stdout=io.StringIO())
+
+@pytest.mark.django_db
+class TestMetrics:
+    """Tests for the Prometheus /metrics endpoint"""
+
+    def test_request_latency_is_exported_per_route(self, api_client, client):
+        """Test API requests show up in the latency histogram"""
+        api_client.get(reverse('api:health'))
+        response = client.get(reverse('metrics'))
+
+        assert response.status_code == 200
+        body = response.content.decode()
+        assert 'devopsdemo_http_request_duration_seconds_count{endpoint="health",status="200"}' in body
+        assert 'devopsdemo_process_resident_memory_bytes' in body
+        assert 'devopsdemo_api_log_buffered' in body
+
+    def test_upstream_calls_are_exported(self, client):
+        """Test watch_time samples feed the upstream histogram"""
+        record_latency('tests.upstream', 5_000_000, failed=True)
+        body = client.get(reverse('metrics')).content.decode()
+
+        assert 'devopsdemo_upstream_call_duration_seconds_count{function="tests.upstream",outcome="error"}' in body
+
+    def test_metrics_can_be_disabled(self, client, settings):
+        """Test the endpoint is hidden when metrics are off"""
+        settings.API_METRICS = {'ENABLED': False, 'REFRESH_SECONDS': 5.0}
+
+        assert client.get(reverse('metrics')).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_workers_are_summed_in_multiprocess_mode(self, tmp_path):
+        """Test samples written by separate processes are aggregated"""
+        worker = (
+            "import django; django.setup()\n"
+            "from api import metrics\n"
+            "metrics.request_started()\n"
+            "metrics.request_finished('health', 200, 0.01)\n"
+        )
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), DJANGO_SETTINGS_MODULE='DevOpsDemo.settings')
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', worker], env=env, check=True)
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+        body = generate_latest(registry).decode()
+        assert 'devopsdemo_http_request_duration_seconds_count{endpoint="health",status="200"} 2.0' in body
+
+    def test_multiprocess_dir_is_created_or_ignored(self, tmp_path):
+        """Test a missing directory is created and an unusable one falls back to this process only"""
+        worker = (
+            "import django; django.setup()\n"
+            "from api import metrics\n"
+            "metrics.request_finished('health', 200, 0.01)\n"
+            "print(metrics.render_metrics().decode())\n"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='DevOpsDemo.settings')
+
+        missing = tmp_path / 'metrics' / 'nested'
+        subprocess.run([sys.executable, '-c', worker], env=dict(env, PROMETHEUS_MULTIPROC_DIR=str(missing)), check=True)
+        assert list(missing.glob('*.db'))
+
+        blocker = tmp_path / 'file'
+        blocker.write_text('')
+        result = subprocess.run(
+            [sys.executable, '-c', worker], env=dict(env, PROMETHEUS_MULTIPROC_DIR=str(blocker / 'metrics')),
+            check=True, capture_output=True, text=True,
+        )
+        assert 'devopsdemo_http_request_duration_seconds_count{endpoint="health",status="200"} 1.0' in result.stdout
+
+@pytest.mark.django_db
+class TestChatSessions:
+    """Tests for server-side chat sessions"""
+
+    @patch('api.views.call_deepseek')
+    @patch('api.views.settings')
+    def test_session_history_is_sent_and_appended(self, mock_settings, mock_call_deepseek, api_client):
+        """Test later turns resend the stored history as an unchanged prefix"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_call_deepseek.side_effect = ['first reply', 'second reply']
+
+        created = api_client.post(reverse('api:chat-session-list'), {'system_prompt': 'Be brief.'}, format='json')
+        assert created.status_code == status.HTTP_201_CREATED
+        session_id = created.data['id']
+
+        url = reverse('api:ai-chat')
+        api_client.post(url, {'message': 'one', 'session_id': session_id}, format='json')
+        response = api_client.post(url, {'message': 'two', 'session_id': session_id}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert str(response.data['session_id']) == session_id
+        first_messages = mock_call_deepseek.call_args_list[0].args[0]
+        second_messages = mock_call_deepseek.call_args_list[1].args[0]
+        assert second_messages[:len(first_messages)] == first_messages
+        assert second_messages[1:] == [
+            {'role': 'user', 'content': 'one'},
+            {'role': 'assistant', 'content': 'first reply'},
+            {'role': 'user', 'content': 'two'},
+        ]
+
+        detail = api_client.get(reverse('api:chat-session-detail', args=[session_id]))
+        assert [turn['content'] for turn in detail.data['turns']] == ['one', 'first reply', 'two', 'second reply']
+
+    @patch('api.views.settings')
+    def test_unknown_session_returns_404(self, mock_settings, api_client):
+        """Test chatting in a missing session is rejected"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+
+        url = reverse('api:ai-chat')
+        response = api_client.post(url, {'message': 'hi', 'session_id': str(uuid.uuid4())}, format='json')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_history_trims_in_one_jump_at_a_user_turn(self, settings):
+        """Test the window moves only on overflow and then stays put"""
+        settings.CHAT_SESSIONS = {'TOKEN_BUDGET': 100, 'TRIM_RATIO': 0.5}
+        session = ChatSession.objects.create()
+        for i in range(4):
+            record_exchange(session, f'question {i} ' + 'x' * 40, f'answer {i} ' + 'y' * 40)
+
+        messages = build_messages(session, 'next')
+        session.refresh_from_db()
+
+        assert session.window_start > 0
+        assert session.turns.get(seq=session.window_start).role == 'user'
+        assert messages[0]['role'] == 'user'
+        assert sum(estimate_tokens(m['content']) for m in messages) <= 50
+
+        record_exchange(session, 'next', 'ok')
+        window_start = session.window_start
+        build_messages(session, 'again')
+        assert session.window_start == window_start
+
+    def test_concurrent_exchanges_get_distinct_turns(self, tmp_path):
+        """Test exchanges appended from several threads at once neither collide nor interleave"""
+        script = (
+            "import json, sys, threading\n"
+            "from django.conf import settings\n"
+            "settings.DATABASES['default']['NAME'] = sys.argv[1]\n"
+            "import django; django.setup()\n"
+            "from django.core.management import call_command\n"
+            "from django.db import connection\n"
+            "from api.chat_sessions import record_exchange\n"
+            "from api.models import ChatSession\n"
+            "call_command('migrate', verbosity=0)\n"
+            "session = ChatSession.objects.create()\n"
+            "start = threading.Barrier(4)\n"
+            "def append(worker):\n"
+            "    start.wait()\n"
+            "    for i in range(5):\n"
+            "        record_exchange(ChatSession.objects.get(pk=session.pk), f'q{worker}.{i}', f'a{worker}.{i}')\n"
+            "    connection.close()\n"
+            "threads = [threading.Thread(target=append, args=(w,)) for w in range(4)]\n"
+            "[t.start() for t in threads]; [t.join() for t in threads]\n"
+            "print(json.dumps(list(session.turns.values_list('seq', 'role', 'content'))))\n"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='DevOpsDemo.settings')
+        result = subprocess.run([sys.executable, '-c', script, str(tmp_path / 'db.sqlite3')],
+                                env=env, check=True, capture_output=True, text=True)
+
+        turns = json.loads(result.stdout.splitlines()[-1])
+        assert [seq for seq, _, _ in turns] == list(range(40))
+        for (_, _, question), (_, role, answer) in zip(turns[::2], turns[1::2]):
+            assert role == 'assistant' and answer == 'a' + question[1:]
+
+@pytest.mark.django_db
+class TestAIBatchEndpoint:
+    """Tests for the batched AI chat endpoint"""
+
+    @patch('api.views.call_deepseek')
+    def test_batch_keeps_order_and_isolates_errors(self, mock_call_deepseek, api_client, settings):
+        """Test batch results come back in input order with per-item errors"""
+        settings.DEEPSEEK_API_KEY = 'test-api-key'
+
+        def fake_call(messages, **kwargs):
+            content = messages[0]['content']
+            if content == 'bad':
+                return "调用 API 出错: boom"
+            return content.upper()
+
+        mock_call_deepseek.side_effect = fake_call
+        url = reverse('api:ai-chat-batch')
+        data = {'items': [{'message': 'one'}, {'message': 'bad'}, {'message': 'three'}], 'concurrency': 2}
+        response = api_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert [r['index'] for r in results] == [0, 1, 2]
+        assert results[0]['response'] == 'ONE'
+        assert results[1]['response'] is None
+        assert results[1]['error'].endswith('boom')
+        assert results[2]['response'] == 'THREE'
+        assert response.data['failed'] == 1
+        for call in mock_call_deepseek.call_args_list:
+            assert call.kwargs['stream'] is False
+        log = APICallLog.objects.get(endpoint='ai_chat_batch')
+        assert log.request_params == {'items': 3, 'concurrency': 2, 'failed': 1}
+
+    @patch('api.views.call_deepseek')
+    def test_batch_returns_partial_results_at_deadline(self, mock_call_deepseek, api_client, settings):
+        """Test items unfinished at the batch deadline time out while finished ones are returned"""
+        settings.DEEPSEEK_API_KEY = 'test-api-key'
+        settings.DEEPSEEK_BATCH = dict(settings.DEEPSEEK_BATCH, DEADLINE=0.2)
+        release = threading.Event()
+
+        def fake_call(messages, **kwargs):
+            content = messages[0]['content']
+            if content == 'slow':
+                release.wait(5)
+            return content.upper()
+
+        mock_call_deepseek.side_effect = fake_call
+        data = {'items': [{'message': 'one'}, {'message': 'slow'}, {'message': 'three'}], 'concurrency': 2}
+        started = time.monotonic()
+        try:
+            response = api_client.post(reverse('api:ai-chat-batch'), data, format='json')
+        finally:
+            release.set()
+
+        assert time.monotonic() - started < 2
+        results = response.data['results']
+        assert [r['response'] for r in results] == ['ONE', None, 'THREE']
+        assert results[1]['error'].startswith('Timed out')
+        assert response.data['failed'] == 1
+
+    def test_batch_rejects_too_many_items(self, api_client, settings):
+        """Test batch size is capped"""
+        settings.DEEPSEEK_API_KEY = 'test-api-key'
+        settings.DEEPSEEK_BATCH = dict(settings.DEEPSEEK_BATCH, MAX_ITEMS=1)
+
+        url = reverse('api:ai-chat-batch')
+        response = api_client.post(url, {'items': [{'message': 'a'}, {'message': 'b'}]}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'items' in response.data
+
+async def _fake_stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncAIEndpoints:
+    """Tests for the async (ASGI) AI chat endpoint"""
+
+    @patch('api.views.call_deepseek_async', new_callable=AsyncMock)
+    @patch('api.views.settings')
+    def test_ai_chat_async_success(self, mock_settings, mock_call, api_client):
+        """Test async chat awaits the AsyncOpenAI-backed call"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_call.return_value = "Hello! I'm DeepSeek AI."
+
+        url = reverse('api:ai-chat-async')
+        response = api_client.post(url, {'message': 'Hello'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['response'] == "Hello! I'm DeepSeek AI."
+        mock_call.assert_awaited_once()
+        log = APICallLog.objects.get(endpoint='ai_chat')
+        assert log.request_params['async'] is True
+
+    @patch('api.views.call_deepseek_async', new_callable=AsyncMock)
+    @patch('api.views.settings')
+    def test_ai_chat_async_stream(self, mock_settings, mock_call, api_client):
+        """Test async chat streams upstream chunks as server-sent events"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_call.return_value = _fake_stream('Hel', 'lo!')
+
+        url = reverse('api:ai-chat-async')
+        response = api_client.post(url, {'message': 'Hello', 'stream': True}, format='json')
+        body = b''.join(response).decode()
+
+        assert body.startswith('data: {"delta": "Hel"}')
+        assert 'event: done' in body
+        assert APICallLog.objects.get(endpoint='ai_chat').request_params['chunks'] == 2
+
+    @patch('api.views.settings')
+    def test_ai_chat_async_invalid_json(self, mock_settings, api_client):
+        """Test async chat rejects a malformed body"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+
+        url = reverse('api:ai-chat-async')
+        response = api_client.post(url, 'not json', content_type='application/json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @patch('api.views.call_deepseek_async', new_callable=AsyncMock)
+    @patch('api.views.settings')
+    def test_ai_chat_async_is_throttled(self, mock_settings, mock_call, api_client):
+        """Test the async chat applies the REST framework throttles like /api/ai/chat/"""
+        mock_settings.DEEPSEEK_API_KEY = 'test-api-key'
+        mock_call.return_value = 'ok'
+        url = reverse('api:ai-chat-async')
+
+        with patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '2/hour', 'user': '2/hour'}):
+            codes = [api_client.post(url, {'message': 'Hello'}, format='json').status_code for _ in range(3)]
+            refused = api_client.post(url, {'message': 'Hello'}, format='json')
+
+        assert codes == [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS]
+        assert int(refused['Retry-After']) > 0
+        assert mock_call.await_count == 2
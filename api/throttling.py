@@ -0,0 +1,67 @@
+"""
+REST framework request policies for the plain async views.
+
+The ASGI views (`*_async` in views.py) are plain Django coroutines, because
+DRF's APIView cannot be awaited, so REST_FRAMEWORK's DEFAULT_THROTTLE_CLASSES
+and SessionAuthentication's CSRF check never run for them. `drf_policies`
+applies both, the same way APIView would, before the view runs. The checks
+touch the session and the cache, so they run via sync_to_async.
+"""
+import functools
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.authentication import CSRFCheck
+from rest_framework.settings import api_settings
+
+
+def _csrf_failure(request):
+    # SessionAuthentication only enforces CSRF for session-authenticated users
+    user = getattr(request, 'user', None)
+    if not user or not user.is_active:
+        return None
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def _throttle_wait(request):
+    """None if every throttle allows the request, else the seconds to wait (0 if unknown)."""
+    waits = []
+    for throttle in (throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES):
+        if not throttle.allow_request(request, None):
+            waits.append(throttle.wait())
+    if not waits:
+        return None
+    known = [wait for wait in waits if wait is not None]
+    return max(known) if known else 0
+
+
+def _check(request):
+    reason = _csrf_failure(request)
+    if reason:
+        return JsonResponse({'detail': f'CSRF Failed: {reason}'}, status=status.HTTP_403_FORBIDDEN)
+    wait = _throttle_wait(request)
+    if wait is None:
+        return None
+    response = JsonResponse(
+        {'detail': exceptions.Throttled(wait or None).detail},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    if wait:
+        response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def drf_policies(view):
+    """Apply the REST framework throttles and session CSRF check to an async Django view."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        refused = await sync_to_async(_check)(request)
+        if refused is not None:
+            return refused
+        return await view(request, *args, **kwargs)
+
+    return wrapper
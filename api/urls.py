@@ -7,6 +7,7 @@ from . import views
 # Create router for viewsets
 router = DefaultRouter()
 router.register(r'logs', views.APICallLogViewSet, basename='api-log')
+router.register(r'ai/sessions', views.ChatSessionViewSet, basename='chat-session')
 
 app_name = 'api'
 
@@ -18,13 +19,19 @@ urlpatterns = [
 
     # Health check
     path('health/', views.health_check, name='health'),
+    path('traces/', views.traces, name='traces'),
 
     # Docker endpoints
     path('docker/repos/', views.docker_repos, name='docker-repos'),
     path('docker/tags/<str:repo_name>/', views.docker_tags, name='docker-tags'),
+    path('docker/catalog/', views.docker_catalog, name='docker-catalog'),
+    path('docker/async/repos/', views.docker_repos_async, name='docker-repos-async'),
+    path('docker/async/tags/<str:repo_name>/', views.docker_tags_async, name='docker-tags-async'),
 
     # AI endpoints
     path('ai/chat/', views.ai_chat, name='ai-chat'),
+    path('ai/chat/batch/', views.ai_chat_batch, name='ai-chat-batch'),
+    path('ai/chat/async/', views.ai_chat_async, name='ai-chat-async'),
 
     # Include router URLs
     path('', include(router.urls)),
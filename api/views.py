@@ -1,27 +1,67 @@
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db import models
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 
-from .models import APICallLog
+from .chat_sessions import build_messages, record_exchange
+from .docker_cache import CachedDockerHubManager
+from .log_export import CONTENT_TYPES, aexport_chunks, export_chunks
+from .log_filters import filter_logs
+from .log_stats import log_stats
+from .rollups import rollup_stats
+from .dockerhub_sync import serve_from_mirror
+from .middleware import api_log, elapsed_ms, log_params, tracing_enabled
+from .models import APICallLog, ChatSession, DockerRepo, DockerTag
+from .pagination import APICallLogCursorPagination, APICallLogPageNumberPagination, wants_page_numbers
 from .serializers import (
     APICallLogSerializer,
     DockerRepoSerializer,
     DockerTagSerializer,
+    DockerCatalogEntrySerializer,
+    DockerCatalogQuerySerializer,
+    DockerReposQuerySerializer,
     ChatRequestSerializer,
     ChatResponseSerializer,
+    ChatBatchRequestSerializer,
+    ChatBatchResponseSerializer,
+    ChatSessionSerializer,
     HealthCheckSerializer,
+    LogExportQuerySerializer,
+    LogFilterSerializer,
+    LogStatsQuerySerializer,
+    TraceQuerySerializer,
 )
-from utility.watch import Watch
+from .throttling import drf_policies
+from utility.watch import Span, recent_traces
 from src.LF_dockerhubmanger.docker_tools import DockerHubManager
-from src.fctn_tools.deepseek_tools import call_deepseek
+from src.LF_dockerhubmanger.async_docker_tools import AsyncDockerHubManager
+from src.fctn_tools.completion_cache import get_completion_cache, make_key
+from src.fctn_tools.deepseek_tools import (
+    call_deepseek,
+    call_deepseek_async,
+    get_async_client,
+    get_client,
+    is_error,
+)
 
 logger = logging.getLogger(__name__)
 
+MIRROR_REPO_FIELDS = ('name', 'description', 'is_private', 'star_count', 'pull_count', 'last_updated')
+MIRROR_TAG_FIELDS = ('name', 'full_size', 'last_updated', 'last_updater_username')
+
 
 class APICallLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -31,26 +71,122 @@ class APICallLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = APICallLog.objects.all()
     serializer_class = APICallLogSerializer
+    pagination_class = APICallLogCursorPagination
+
+    @property
+    def paginator(self):
+        """Cursor pagination unless the client opts into page numbers."""
+        if not hasattr(self, '_paginator'):
+            if wants_page_numbers(getattr(self, 'request', None)):
+                self._paginator = APICallLogPageNumberPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            query = LogFilterSerializer(data=self.request.query_params)
+            query.is_valid(raise_exception=True)
+            queryset = filter_logs(queryset, **query.validated_data)
+        return queryset
+
+    @extend_schema(
+        parameters=[
+            LogFilterSerializer,
+            OpenApiParameter(
+                name='pagination',
+                description="'page' for page-number pagination with a total count; cursor pagination otherwise",
+                required=False,
+                type=str,
+                enum=['cursor', 'page'],
+            ),
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        """List API call logs, newest first, optionally filtered"""
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        summary="Export API call logs",
+        description=(
+            "Streams every matching log, oldest first, as NDJSON (one JSON object per line) or CSV. "
+            "Accepts the same filters as the list endpoint; memory use does not grow with the window."
+        ),
+        parameters=[LogExportQuerySerializer],
+        responses={(200, 'application/x-ndjson'): OpenApiResponse(description="One log per line")},
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream API call logs as NDJSON or CSV"""
+        query = LogExportQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = dict(query.validated_data)
+        output = params.pop('output')
+        # ASGI needs an async iterator, or Django buffers the whole export before sending it
+        chunks = aexport_chunks if isinstance(request._request, ASGIRequest) else export_chunks
+        response = StreamingHttpResponse(
+            chunks(filter_logs(APICallLog.objects.all(), **params), output),
+            content_type=CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="api_logs.{output}"'
+        return response
 
     @extend_schema(
         summary="Get API call statistics",
-        description="Returns aggregated statistics about API calls"
+        description=(
+            "Returns aggregated statistics about API calls: totals, error counts and latency "
+            "percentiles, overall and per endpoint. Read from the minute/hour rollups by default, "
+            "so the cost follows the window rather than the size of the log table."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name='since',
+                description="Start of the window: an ISO 8601 timestamp or a duration before now such as '24h'",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name='until',
+                description="End of the window (exclusive), in the same formats as 'since'",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name='source',
+                description="'rollups' (default, windows rounded to whole minutes) or 'logs' for an exact scan",
+                required=False,
+                type=str,
+                enum=['rollups', 'logs'],
+            ),
+        ],
     )
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get statistics about API calls"""
-        total_calls = APICallLog.objects.count()
-        successful_calls = APICallLog.objects.filter(status_code__gte=200, status_code__lt=300).count()
-        avg_response_time = APICallLog.objects.filter(
-            response_time_ms__isnull=False
-        ).aggregate(avg=models.Avg('response_time_ms'))['avg'] or 0
-
-        return Response({
-            'total_calls': total_calls,
-            'successful_calls': successful_calls,
-            'success_rate': (successful_calls / total_calls * 100) if total_calls > 0 else 0,
-            'average_response_time_ms': round(avg_response_time, 2),
-        })
+        query = LogStatsQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        window = dict(query.validated_data)
+        if window.pop('source') == 'logs':
+            return Response(log_stats(APICallLog.objects.all(), **window))
+        return Response(rollup_stats(**window))
+
+
+@extend_schema(tags=['AI'])
+class ChatSessionViewSet(mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Server-side chat sessions.
+
+    Create a session, then pass its id as `session_id` to /api/ai/chat/ to
+    continue the conversation without resending the transcript.
+    """
+    queryset = ChatSession.objects.prefetch_related('turns')
+    serializer_class = ChatSessionSerializer
 
 
 @extend_schema(
@@ -59,10 +195,17 @@ class APICallLogViewSet(viewsets.ReadOnlyModelViewSet):
     parameters=[
         OpenApiParameter(
             name='page_size',
-            description='Number of repositories to return per page',
+            description='Repositories per Docker Hub page (1-100); every repository is returned',
             required=False,
             type=int,
             default=10
+        ),
+        OpenApiParameter(
+            name='source',
+            description="'mirror' to read the local Docker Hub mirror, 'upstream' to call Docker Hub",
+            required=False,
+            type=str,
+            enum=['mirror', 'upstream']
         )
     ],
     responses={
@@ -70,6 +213,7 @@ class APICallLogViewSet(viewsets.ReadOnlyModelViewSet):
             response=DockerRepoSerializer(many=True),
             description="List of Docker repositories"
         ),
+        400: OpenApiResponse(description="Invalid page_size"),
         500: OpenApiResponse(description="Docker Hub API error")
     },
     tags=['Docker']
@@ -81,37 +225,38 @@ def docker_repos(request):
 
     Requires DOCKERHUB_USERNAME and DOCKERHUB_TOKEN to be configured.
     """
-    watch = Watch()
-    log_entry = APICallLog(endpoint='docker_repos')
-
     try:
         if not settings.DOCKERHUB_USERNAME or not settings.DOCKERHUB_TOKEN:
-            log_entry.status_code = 500
-            log_entry.error_message = "Docker Hub credentials not configured"
-            log_entry.save()
             return Response(
                 {'error': 'Docker Hub credentials not configured'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        page_size = int(request.GET.get('page_size', 10))
-        manager = DockerHubManager()
-        repos = manager.get_repos(page_size=page_size)
-
-        log_entry.response_time_ms = watch.see_seconds() * 1000
-        log_entry.status_code = 200
-        log_entry.request_params = {'page_size': page_size}
-        log_entry.save()
-
-        serializer = DockerRepoSerializer(repos, many=True)
-        return Response(serializer.data)
+        query = DockerReposQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        page_size = query.validated_data['page_size']
+        if serve_from_mirror(request):
+            with Span('mirror query'):
+                repos = list(
+                    DockerRepo.objects.filter(namespace=settings.DOCKERHUB_USERNAME)
+                    .order_by(F('last_updated').desc(nulls_last=True), 'name')
+                    .values(*MIRROR_REPO_FIELDS)
+                )
+            params = {'page_size': page_size, 'source': 'mirror'}
+        else:
+            manager = CachedDockerHubManager(DockerHubManager.shared())
+            repos, cache_status = manager.get_repos(page_size=page_size)
+            params = {'page_size': page_size, 'cache': cache_status}
+
+        log_params(request, **params)
+
+        with Span('serialize'):
+            data = DockerRepoSerializer(repos, many=True).data
+        return Response(data)
 
     except Exception as e:
         logger.exception("Error fetching Docker repos")
-        log_entry.response_time_ms = watch.see_seconds() * 1000
-        log_entry.status_code = 500
-        log_entry.error_message = str(e)
-        log_entry.save()
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -128,6 +273,13 @@ def docker_repos(request):
             required=True,
             type=str,
             location=OpenApiParameter.PATH
+        ),
+        OpenApiParameter(
+            name='source',
+            description="'mirror' to read the local Docker Hub mirror, 'upstream' to call Docker Hub",
+            required=False,
+            type=str,
+            enum=['mirror', 'upstream']
         )
     ],
     responses={
@@ -147,45 +299,319 @@ def docker_tags(request, repo_name):
     Args:
         repo_name: Name of the Docker repository
     """
-    watch = Watch()
-    log_entry = APICallLog(endpoint='docker_tags')
+    try:
+        if not settings.DOCKERHUB_USERNAME or not settings.DOCKERHUB_TOKEN:
+            return Response(
+                {'error': 'Docker Hub credentials not configured'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        if serve_from_mirror(request):
+            with Span('mirror query'):
+                tags = list(
+                    DockerTag.objects.filter(
+                        repo__namespace=settings.DOCKERHUB_USERNAME, repo__name=repo_name
+                    ).values(*MIRROR_TAG_FIELDS)
+                )
+            params = {'repo_name': repo_name, 'source': 'mirror'}
+        else:
+            manager = CachedDockerHubManager(DockerHubManager.shared())
+            tags, cache_status = manager.get_tags_by_repo(repo_name)
+            params = {'repo_name': repo_name, 'cache': cache_status}
+
+        log_params(request, **params)
+
+        with Span('serialize'):
+            data = DockerTagSerializer(tags, many=True).data
+        return Response(data)
 
+    except Exception as e:
+        logger.exception(f"Error fetching tags for repo {repo_name}")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@extend_schema(
+    summary="Get Docker catalog",
+    description="Fetches every repository together with its tags, fanning out the tag lookups concurrently",
+    parameters=[
+        OpenApiParameter(
+            name='concurrency',
+            description='Maximum number of repositories whose tags are fetched at once (capped at DOCKERHUB_CATALOG_MAX_CONCURRENCY)',
+            required=False,
+            type=int,
+        )
+    ],
+    responses={
+        200: OpenApiResponse(
+            response=DockerCatalogEntrySerializer(many=True),
+            description="Repositories with their tags; failed repositories carry an error"
+        ),
+        400: OpenApiResponse(description="Invalid concurrency"),
+        500: OpenApiResponse(description="Docker Hub API error")
+    },
+    tags=['Docker']
+)
+@api_view(['GET'])
+def docker_catalog(request):
+    """
+    Get all Docker Hub repositories with their tags in one call.
+
+    A repository whose tags cannot be fetched is returned with an error
+    message instead of failing the whole catalog.
+    """
     try:
         if not settings.DOCKERHUB_USERNAME or not settings.DOCKERHUB_TOKEN:
-            log_entry.status_code = 500
-            log_entry.error_message = "Docker Hub credentials not configured"
-            log_entry.save()
             return Response(
                 {'error': 'Docker Hub credentials not configured'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        manager = DockerHubManager()
-        tags = manager.get_tags_by_repo(repo_name)
+        query = DockerCatalogQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        concurrency = query.validated_data.get('concurrency')
+        manager = DockerHubManager.shared()
+        catalog = manager.get_catalog(concurrency=concurrency)
+
+        log_params(
+            request,
+            concurrency=concurrency,
+            repos=len(catalog),
+            failed=sum(1 for entry in catalog if entry['error']),
+        )
+
+        serializer = DockerCatalogEntrySerializer(catalog, many=True)
+        return Response(serializer.data)
+
+    except Exception as e:
+        logger.exception("Error fetching Docker catalog")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_GET
+@drf_policies
+async def docker_repos_async(request):
+    """
+    Async variant of docker_repos for ASGI deployments.
+
+    The upstream wait does not hold a worker; the event loop keeps serving
+    other requests while Docker Hub responds. Throttling, `?source=` and the
+    Docker Hub cache behave as in docker_repos.
+    """
+    try:
+        if not settings.DOCKERHUB_USERNAME or not settings.DOCKERHUB_TOKEN:
+            return JsonResponse(
+                {'error': 'Docker Hub credentials not configured'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
-        log_entry.response_time_ms = watch.see_seconds() * 1000
-        log_entry.status_code = 200
-        log_entry.request_params = {'repo_name': repo_name}
-        log_entry.save()
+        query = DockerReposQuerySerializer(data=request.GET)
+        if not query.is_valid():
+            return JsonResponse(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        page_size = query.validated_data['page_size']
+        if serve_from_mirror(request):
+            with Span('mirror query'):
+                repos = [
+                    repo async for repo in
+                    DockerRepo.objects.filter(namespace=settings.DOCKERHUB_USERNAME)
+                    .order_by(F('last_updated').desc(nulls_last=True), 'name')
+                    .values(*MIRROR_REPO_FIELDS)
+                ]
+            params = {'page_size': page_size, 'source': 'mirror'}
+        else:
+            manager = CachedDockerHubManager(AsyncDockerHubManager.shared())
+            repos, cache_status = await manager.aget_repos(page_size=page_size)
+            params = {'page_size': page_size, 'cache': cache_status}
+
+        log_params(request, **params)
+
+        serializer = DockerRepoSerializer(repos, many=True)
+        return JsonResponse(serializer.data, safe=False)
+
+    except Exception as e:
+        logger.exception("Error fetching Docker repos")
+        return JsonResponse(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_GET
+@drf_policies
+async def docker_tags_async(request, repo_name):
+    """
+    Async variant of docker_tags for ASGI deployments, with the same
+    throttling, `?source=` and cache handling as docker_tags.
+
+    Args:
+        repo_name: Name of the Docker repository
+    """
+    try:
+        if not settings.DOCKERHUB_USERNAME or not settings.DOCKERHUB_TOKEN:
+            return JsonResponse(
+                {'error': 'Docker Hub credentials not configured'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        if serve_from_mirror(request):
+            with Span('mirror query'):
+                tags = [
+                    tag async for tag in
+                    DockerTag.objects.filter(
+                        repo__namespace=settings.DOCKERHUB_USERNAME, repo__name=repo_name
+                    ).values(*MIRROR_TAG_FIELDS)
+                ]
+            params = {'repo_name': repo_name, 'source': 'mirror'}
+        else:
+            manager = CachedDockerHubManager(AsyncDockerHubManager.shared())
+            tags, cache_status = await manager.aget_tags_by_repo(repo_name)
+            params = {'repo_name': repo_name, 'cache': cache_status}
+
+        log_params(request, **params)
 
         serializer = DockerTagSerializer(tags, many=True)
-        return Response(serializer.data)
+        return JsonResponse(serializer.data, safe=False)
 
     except Exception as e:
         logger.exception(f"Error fetching tags for repo {repo_name}")
-        log_entry.response_time_ms = watch.see_seconds() * 1000
-        log_entry.status_code = 500
-        log_entry.error_message = str(e)
-        log_entry.save()
-        return Response(
+        return JsonResponse(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+def _complete(messages, model, stream, temperature, use_cache):
+    """
+    Call DeepSeek through the shared client, consulting the completion cache when asked.
+
+    Returns ``(content, cache_status)``; cache_status is None when the cache was not used.
+    """
+    if use_cache:
+        completion_cache = get_completion_cache()
+        key = make_key(messages, model, temperature)
+        content = completion_cache.get(key)
+        if content is not None:
+            return content, 'hit'
+
+    client = get_client(api_key=settings.DEEPSEEK_API_KEY)
+    content = call_deepseek(messages, model=model, stream=stream, client=client, temperature=temperature)
+    if not use_cache:
+        return content, None
+    if not is_error(content):
+        completion_cache.set(key, content)
+    return content, 'miss'
+
+
+def _complete_batch_item(index, item):
+    """Run one batch item and report its outcome instead of raising."""
+    started = time.perf_counter_ns()
+    model = item.get('model', 'deepseek-chat')
+    result = {'index': index, 'response': None, 'error': None, 'model': model, 'cached': False}
+    try:
+        messages = [{"role": "user", "content": item['message']}]
+        content, cache_status = _complete(
+            messages, model, False, item.get('temperature', 0.7), item.get('cache', False)
+        )
+        if is_error(content):
+            result['error'] = content
+        else:
+            result['response'] = content
+            result['cached'] = cache_status == 'hit'
+    except Exception as e:
+        logger.exception("Error in AI chat batch item %s", index)
+        result['error'] = str(e)
+    result['response_time_ms'] = round((time.perf_counter_ns() - started) / 1e6, 2)
+    return result
+
+
+def _run_batch(items, concurrency, deadline):
+    """
+    Run batch items on a thread pool and return their results in input order.
+
+    Items still queued or running after `deadline` seconds are reported as
+    timed out, so the response goes out before the worker timeout; running
+    ones finish in the background and are discarded.
+    """
+    started = time.perf_counter_ns()
+    pool = ThreadPoolExecutor(max_workers=min(concurrency, len(items)))
+    futures = [pool.submit(_complete_batch_item, index, item) for index, item in enumerate(items)]
+    done, _ = wait(futures, timeout=deadline)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    waited_ms = round((time.perf_counter_ns() - started) / 1e6, 2)
+    return [
+        future.result() if future in done else {
+            'index': index,
+            'response': None,
+            'error': f'Timed out: the batch deadline of {deadline:g}s passed',
+            'model': item.get('model', 'deepseek-chat'),
+            'cached': False,
+            'response_time_ms': waited_ms,
+        }
+        for index, (item, future) in enumerate(zip(items, futures))
+    ]
+
+
+def _sse(data, event=None):
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _chat_event_stream(chunks, model, pending, on_complete=None):
+    """
+    Forward upstream delta chunks as server-sent events as soon as they arrive.
+
+    Records the time-to-first-token, chunk count and outcome on the request's
+    pending log entry, which the middleware writes once the stream ends.
+    `on_complete` is called with the full reply if the stream finishes.
+    """
+    first_token_ms = None
+    chunk_count = 0
+    parts = []
+    # Stays 499 only if the client disconnects before the stream completes
+    pending.status_code = 499
+    try:
+        if isinstance(chunks, str):
+            # call_deepseek reports upstream errors as a plain string
+            raise RuntimeError(chunks)
+        for chunk in chunks:
+            if first_token_ms is None:
+                first_token_ms = pending.elapsed_ms()
+            chunk_count += 1
+            parts.append(chunk)
+            yield _sse({'delta': chunk})
+
+        if on_complete is not None:
+            on_complete(''.join(parts))
+        pending.status_code = 200
+        yield _sse({
+            'model': model,
+            'response_time_ms': round(pending.elapsed_ms(), 2),
+            'first_token_ms': round(first_token_ms, 2) if first_token_ms is not None else None,
+        }, event='done')
+    except Exception as e:
+        logger.exception("Error in AI chat stream")
+        pending.status_code = 500
+        pending.error = str(e)
+        yield _sse({'error': str(e)}, event='error')
+    finally:
+        pending.params.update(first_token_ms=first_token_ms, chunks=chunk_count)
+
+
 @extend_schema(
     summary="Chat with DeepSeek AI",
-    description="Send a message to DeepSeek AI and get a response",
+    description=(
+        "Send a message to DeepSeek AI and get a response. With stream=true the reply is sent as "
+        "server-sent events: one `data: {\"delta\": ...}` event per upstream chunk, then an `event: done` "
+        "event carrying the timings (or `event: error`)."
+    ),
     request=ChatRequestSerializer,
     responses={
         200: OpenApiResponse(
@@ -203,14 +629,8 @@ def ai_chat(request):
 
     Requires DEEPSEEK_API_KEY to be configured.
     """
-    watch = Watch()
-    log_entry = APICallLog(endpoint='ai_chat')
-
     try:
         if not settings.DEEPSEEK_API_KEY:
-            log_entry.status_code = 500
-            log_entry.error_message = "DeepSeek API key not configured"
-            log_entry.save()
             return Response(
                 {'error': 'DeepSeek API key not configured'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -218,36 +638,56 @@ def ai_chat(request):
 
         request_serializer = ChatRequestSerializer(data=request.data)
         if not request_serializer.is_valid():
-            log_entry.status_code = 400
-            log_entry.error_message = str(request_serializer.errors)
-            log_entry.save()
             return Response(request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         message = request_serializer.validated_data['message']
         model = request_serializer.validated_data.get('model', 'deepseek-chat')
         stream = request_serializer.validated_data.get('stream', False)
+        temperature = request_serializer.validated_data.get('temperature', 0.7)
+        use_cache = request_serializer.validated_data.get('cache', False) and not stream
+        session_id = request_serializer.validated_data.get('session_id')
+
+        session = None
+        if session_id:
+            session = ChatSession.objects.filter(pk=session_id).first()
+            if session is None:
+                return Response({'error': 'Chat session not found'}, status=status.HTTP_404_NOT_FOUND)
 
         # Create message format for DeepSeek API
-        messages = [{"role": "user", "content": message}]
+        if session:
+            messages = build_messages(session, message)
+        else:
+            messages = [{"role": "user", "content": message}]
 
         # Call DeepSeek API
-        response_content = call_deepseek(messages, model=model, stream=stream)
+        response_content, cache_status = _complete(messages, model, stream, temperature, use_cache)
 
-        response_time_ms = watch.see_seconds() * 1000
+        log_params(request, message_length=len(message), model=model, stream=stream)
+        if session:
+            log_params(request, history_messages=len(messages) - 1)
 
-        log_entry.response_time_ms = response_time_ms
-        log_entry.status_code = 200
-        log_entry.request_params = {
-            'message_length': len(message),
-            'model': model,
-            'stream': stream
-        }
-        log_entry.save()
+        if stream:
+            on_complete = partial(record_exchange, session, message) if session else None
+            response = StreamingHttpResponse(
+                _chat_event_stream(response_content, model, api_log(request), on_complete),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+            return response
+
+        response_time_ms = elapsed_ms(request)
+        if use_cache:
+            log_params(request, cache=cache_status)
+        if session and not is_error(response_content):
+            record_exchange(session, message, response_content)
 
         response_data = {
             'response': response_content,
             'model': model,
-            'response_time_ms': round(response_time_ms, 2)
+            'response_time_ms': round(response_time_ms, 2),
+            'cached': cache_status == 'hit',
+            'session_id': session_id,
         }
 
         response_serializer = ChatResponseSerializer(response_data)
@@ -255,16 +695,207 @@ def ai_chat(request):
 
     except Exception as e:
         logger.exception("Error in AI chat")
-        log_entry.response_time_ms = watch.see_seconds() * 1000
-        log_entry.status_code = 500
-        log_entry.error_message = str(e)
-        log_entry.save()
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@extend_schema(
+    summary="Batch chat with DeepSeek AI",
+    description=(
+        "Send many chat requests at once. Items are sent upstream concurrently, up to `concurrency` at a "
+        "time, and results come back in input order with a per-item error and timing. Items not finished "
+        "within DEEPSEEK_BATCH_DEADLINE seconds come back with a timeout error."
+    ),
+    request=ChatBatchRequestSerializer,
+    responses={
+        200: OpenApiResponse(
+            response=ChatBatchResponseSerializer,
+            description="Per-item AI responses in input order"
+        ),
+        400: OpenApiResponse(description="Invalid batch"),
+        500: OpenApiResponse(description="DeepSeek API not configured")
+    },
+    tags=['AI']
+)
+@api_view(['POST'])
+def ai_chat_batch(request):
+    """
+    Chat with DeepSeek AI for a batch of prompts.
+
+    Requires DEEPSEEK_API_KEY to be configured.
+    """
+    try:
+        if not settings.DEEPSEEK_API_KEY:
+            return Response(
+                {'error': 'DeepSeek API key not configured'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        request_serializer = ChatBatchRequestSerializer(data=request.data)
+        if not request_serializer.is_valid():
+            return Response(request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = request_serializer.validated_data['items']
+        concurrency = request_serializer.validated_data.get(
+            'concurrency', settings.DEEPSEEK_BATCH['DEFAULT_CONCURRENCY']
+        )
+
+        results = _run_batch(items, concurrency, settings.DEEPSEEK_BATCH['DEADLINE'])
+
+        failed = sum(1 for result in results if result['error'])
+        response_time_ms = elapsed_ms(request)
+        log_params(request, items=len(items), concurrency=concurrency, failed=failed)
+
+        response_serializer = ChatBatchResponseSerializer({
+            'results': results,
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'response_time_ms': round(response_time_ms, 2),
+        })
+        return Response(response_serializer.data)
+
+    except Exception as e:
+        logger.exception("Error in AI chat batch")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+async def _achat_event_stream(chunks, model, pending, on_complete=None):
+    """Async counterpart of _chat_event_stream for the ASGI chat view."""
+    first_token_ms = None
+    chunk_count = 0
+    parts = []
+    # Stays 499 only if the client disconnects before the stream completes
+    pending.status_code = 499
+    try:
+        if isinstance(chunks, str):
+            raise RuntimeError(chunks)
+        async for chunk in chunks:
+            if first_token_ms is None:
+                first_token_ms = pending.elapsed_ms()
+            chunk_count += 1
+            parts.append(chunk)
+            yield _sse({'delta': chunk})
+
+        if on_complete is not None:
+            await sync_to_async(on_complete)(''.join(parts))
+        pending.status_code = 200
+        yield _sse({
+            'model': model,
+            'response_time_ms': round(pending.elapsed_ms(), 2),
+            'first_token_ms': round(first_token_ms, 2) if first_token_ms is not None else None,
+        }, event='done')
+    except Exception as e:
+        logger.exception("Error in AI chat stream")
+        pending.status_code = 500
+        pending.error = str(e)
+        yield _sse({'error': str(e)}, event='error')
+    finally:
+        pending.params.update(first_token_ms=first_token_ms, chunks=chunk_count)
+
+
+async def _acomplete(messages, model, stream, temperature, use_cache):
+    """Async counterpart of _complete; cache lookups run off the event loop."""
+    if use_cache:
+        completion_cache = get_completion_cache()
+        key = make_key(messages, model, temperature)
+        content = await sync_to_async(completion_cache.get, thread_sensitive=False)(key)
+        if content is not None:
+            return content, 'hit'
+
+    client = get_async_client(api_key=settings.DEEPSEEK_API_KEY)
+    content = await call_deepseek_async(messages, model=model, stream=stream, client=client, temperature=temperature)
+    if not use_cache:
+        return content, None
+    if not is_error(content):
+        await sync_to_async(completion_cache.set, thread_sensitive=False)(key, content)
+    return content, 'miss'
+
+
+@csrf_exempt
+@require_POST
+@drf_policies
+async def ai_chat_async(request):
+    """
+    Async variant of ai_chat for ASGI deployments.
+
+    The upstream LLM wait does not hold a worker, so one ASGI worker can
+    serve many concurrent chats. Accepts the same payload as ai_chat.
+    """
+    try:
+        if not settings.DEEPSEEK_API_KEY:
+            return JsonResponse(
+                {'error': 'DeepSeek API key not configured'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            payload = None
+        request_serializer = ChatRequestSerializer(data=payload)
+        if not request_serializer.is_valid():
+            return JsonResponse(request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        message = request_serializer.validated_data['message']
+        model = request_serializer.validated_data.get('model', 'deepseek-chat')
+        stream = request_serializer.validated_data.get('stream', False)
+        temperature = request_serializer.validated_data.get('temperature', 0.7)
+        use_cache = request_serializer.validated_data.get('cache', False) and not stream
+        session_id = request_serializer.validated_data.get('session_id')
+
+        session = None
+        if session_id:
+            session = await ChatSession.objects.filter(pk=session_id).afirst()
+            if session is None:
+                return JsonResponse({'error': 'Chat session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if session:
+            messages = await sync_to_async(build_messages)(session, message)
+        else:
+            messages = [{"role": "user", "content": message}]
+        response_content, cache_status = await _acomplete(messages, model, stream, temperature, use_cache)
+
+        log_params(request, message_length=len(message), model=model, stream=stream)
+        if session:
+            log_params(request, history_messages=len(messages) - 1)
+        if stream:
+            on_complete = partial(record_exchange, session, message) if session else None
+            response = StreamingHttpResponse(
+                _achat_event_stream(response_content, model, api_log(request), on_complete),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        response_time_ms = elapsed_ms(request)
+        if use_cache:
+            log_params(request, cache=cache_status)
+        if session and not is_error(response_content):
+            await sync_to_async(record_exchange)(session, message, response_content)
+
+        response_serializer = ChatResponseSerializer({
+            'response': response_content,
+            'model': model,
+            'response_time_ms': round(response_time_ms, 2),
+            'cached': cache_status == 'hit',
+            'session_id': session_id,
+        })
+        return JsonResponse(response_serializer.data)
+
+    except Exception as e:
+        logger.exception("Error in AI chat")
+        return JsonResponse(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @extend_schema(
     summary="Health check",
     description="Check API health and configuration status",
@@ -283,9 +914,6 @@ def health_check(request):
 
     Returns system status and configuration information.
     """
-    watch = Watch()
-    log_entry = APICallLog(endpoint='health')
-
     try:
         from django.db import connection
         with connection.cursor() as cursor:
@@ -303,9 +931,37 @@ def health_check(request):
         'dockerhub_configured': bool(settings.DOCKERHUB_USERNAME and settings.DOCKERHUB_TOKEN),
     }
 
-    log_entry.response_time_ms = watch.see_seconds() * 1000
-    log_entry.status_code = 200
-    log_entry.save()
-
     serializer = HealthCheckSerializer(response_data)
     return Response(serializer.data)
+
+
+@extend_schema(
+    summary="Recent request traces",
+    description=(
+        "Span trees of the most recent requests handled by this worker, recorded when API_TRACING is on. "
+        "Use `?output=chrome` for Chrome trace-event JSON (chrome://tracing, Perfetto)."
+    ),
+    parameters=[TraceQuerySerializer],
+    responses={
+        200: OpenApiResponse(description="Recent traces"),
+        400: OpenApiResponse(description="Invalid output or limit"),
+        404: OpenApiResponse(description="Tracing is disabled")
+    },
+    tags=['System']
+)
+@api_view(['GET'])
+def traces(request):
+    """
+    Show where time went inside recent requests.
+    """
+    if not tracing_enabled():
+        return Response({'error': 'Tracing is disabled'}, status=status.HTTP_404_NOT_FOUND)
+
+    query = TraceQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+    recent = recent_traces()[-query.validated_data['limit']:]
+    if query.validated_data['output'] == 'chrome':
+        events = [event for finished in recent for event in finished.to_chrome()]
+        return Response({'traceEvents': events, 'displayTimeUnit': 'ms'})
+    return Response([finished.to_dict() for finished in reversed(recent)])
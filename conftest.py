@@ -21,3 +21,9 @@ def django_db_setup():
         'NAME': ':memory:',
         'ATOMIC_REQUESTS': False,
     }
+
+
+@pytest.fixture(autouse=True)
+def synchronous_api_logs(settings):
+    """Save APICallLog rows inline so tests can assert on them right away"""
+    settings.API_LOG_SINK = dict(settings.API_LOG_SINK, ASYNC=False)
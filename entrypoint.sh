@@ -14,8 +14,24 @@ python manage.py migrate --noinput
 echo "📦 Collecting static files..."
 python manage.py collectstatic --noinput
 
-echo "🚀 Starting Gunicorn server..."
-exec gunicorn DevOpsDemo.wsgi:application \
+# SERVER_MODE=asgi runs the async views on uvicorn workers; the default keeps sync WSGI workers
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    APP_MODULE="DevOpsDemo.asgi:application"
+    WORKER_CLASS="uvicorn.workers.UvicornWorker"
+else
+    APP_MODULE="DevOpsDemo.wsgi:application"
+    WORKER_CLASS="sync"
+fi
+
+# Prometheus multiprocess mode: every worker writes its samples here, /metrics sums them
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/devopsdemo-metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+echo "🚀 Starting Gunicorn server (${WORKER_CLASS})..."
+exec gunicorn "$APP_MODULE" \
+    --config gunicorn.conf.py \
+    --worker-class "$WORKER_CLASS" \
     --bind 0.0.0.0:8000 \
     --workers 4 \
     --timeout 120 \
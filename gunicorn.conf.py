@@ -0,0 +1,10 @@
+"""Gunicorn settings shared by every worker class (command-line flags live in entrypoint.sh)."""
+import os
+
+
+def child_exit(server, worker):
+    # Drop the live-gauge files of the exited worker so /metrics stops counting it
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
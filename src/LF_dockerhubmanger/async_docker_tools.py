@@ -0,0 +1,141 @@
+import asyncio
+import os
+import weakref
+
+import httpx
+
+from src.LF_dockerhubmanger.docker_tools import (
+    BACKOFF_FACTOR,
+    MAX_RETRIES,
+    PAGE_WORKERS,
+    PARALLEL_PAGES,
+    POOL_SIZE,
+    REQUEST_TIMEOUT,
+    remaining_page_urls,
+)
+from utility.watch import Span, watch_time
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# One AsyncClient per event loop: httpx pools are bound to the loop they were created on
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the keep-alive AsyncClient shared by everything running on the current loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+            timeout=REQUEST_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES),
+        )
+        _clients[loop] = client
+    return client
+
+
+class AsyncDockerHubManager:
+    """Asyncio counterpart of DockerHubManager built on a pooled httpx.AsyncClient."""
+
+    _shared = None
+
+    def __init__(self, username: str | None = None, token: str | None = None,
+                 client: httpx.AsyncClient | None = None):
+        self.username = username or os.getenv("DOCKERHUB_USERNAME")
+        self.token = token or os.getenv("DOCKERHUB_TOKEN")
+        self.jwt = None
+        self.base_url = "https://hub.docker.com/v2"
+        self.client = client
+        if not self.username:
+            raise ValueError("❌ DockerHub username is required.")
+
+    @classmethod
+    def shared(cls):
+        """Return a manager reused by every request served by this process."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    # ----------------------------------------
+    # Repository operations
+    # ----------------------------------------
+    @watch_time
+    async def get_repos(self, page_size: int = 100, parallel: bool | None = None):
+        """Return a list of all repositories under the user."""
+        url = f"{self.base_url}/repositories/{self.username}/?page_size={page_size}"
+        return await self._collect(url, "❌ Failed to fetch repositories", parallel)
+
+    @watch_time
+    async def get_tags_by_repo(self, repo_name: str, page_size: int = 100, parallel: bool | None = None):
+        """Return a list of tags (versions) for the given repository."""
+        url = f"{self.base_url}/repositories/{self.username}/{repo_name}/tags?page_size={page_size}"
+        return await self._collect(url, f"❌ Failed to fetch tags for {repo_name}", parallel)
+
+    # ----------------------------------------
+    # Pagination
+    # ----------------------------------------
+    async def _collect(self, url, error, parallel=None):
+        """Return the `name` of every result across all pages starting at `url`."""
+        if parallel is None:
+            parallel = PARALLEL_PAGES
+        headers = self._headers()
+        names = []
+
+        with Span("upstream page", page=1):
+            data = await self._get_page(url, headers, error)
+        names.extend([r["name"] for r in data.get("results", [])])
+        page_urls = remaining_page_urls(url, data) if parallel else None
+        if page_urls is None:
+            url = data.get("next")
+            page = 1
+            while url:
+                page += 1
+                with Span("upstream page", page=page):
+                    data = await self._get_page(url, headers, error)
+                names.extend([r["name"] for r in data.get("results", [])])
+                url = data.get("next")
+            return names
+
+        semaphore = asyncio.Semaphore(PAGE_WORKERS)
+
+        async def fetch(page, page_url):
+            async with semaphore:
+                with Span("upstream page", page=page):
+                    return await self._get_page(page_url, headers, error)
+
+        # gather() returns results in argument order, so pages stay in order
+        pages = await asyncio.gather(
+            *(fetch(page, u) for page, u in enumerate(page_urls, start=2))
+        )
+        for page in pages:
+            names.extend([r["name"] for r in page.get("results", [])])
+        return names
+
+    # ----------------------------------------
+    # Helper
+    # ----------------------------------------
+    @watch_time
+    async def _get(self, url, headers=None):
+        """GET with exponential backoff on throttling and transient server errors."""
+        client = self.client or get_async_client()
+        for attempt in range(MAX_RETRIES + 1):
+            res = await client.get(url, headers=headers)
+            if res.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return res
+            retry_after = res.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else BACKOFF_FACTOR * (2 ** attempt)
+            await asyncio.sleep(delay)
+        return res
+
+    async def _get_page(self, url, headers, error):
+        res = await self._get(url, headers=headers)
+        if res.status_code != 200:
+            raise RuntimeError(f"{error}: {res.text}")
+        return res.json()
+
+    def _headers(self):
+        headers = {}
+        if self.jwt:
+            headers["Authorization"] = f"JWT {self.jwt}"
+        return headers
@@ -1,58 +1,265 @@
+import math
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utility.watch import Span, carry_context, watch_time
+
+# Connection pool / retry tuning (per process, i.e. per gunicorn worker)
+POOL_SIZE = int(os.getenv("DOCKERHUB_POOL_SIZE", "10"))
+MAX_RETRIES = int(os.getenv("DOCKERHUB_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("DOCKERHUB_BACKOFF_FACTOR", "0.5"))
+REQUEST_TIMEOUT = float(os.getenv("DOCKERHUB_TIMEOUT", "10"))
+
+# Page fan-out: fetch pages 2..N concurrently once the first page reports `count`
+PARALLEL_PAGES = os.getenv("DOCKERHUB_PARALLEL_PAGES", "true").lower() in ("1", "true", "yes")
+PAGE_WORKERS = int(os.getenv("DOCKERHUB_PAGE_WORKERS", "8"))
+
+# Repo fan-out for get_catalog; callers may ask for more, up to the max
+CATALOG_CONCURRENCY = int(os.getenv("DOCKERHUB_CATALOG_CONCURRENCY", "8"))
+CATALOG_MAX_CONCURRENCY = int(os.getenv("DOCKERHUB_CATALOG_MAX_CONCURRENCY", "32"))
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide keep-alive session used for Docker Hub calls.
+
+    The session is created lazily so that each forked gunicorn worker builds
+    its own connection pool instead of sharing sockets with the master.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def remaining_page_urls(first_url, first_page):
+    """
+    Build the URLs of pages 2..N from the `count` reported by page 1.
+
+    The page size is taken from page 1 itself, since Docker Hub caps it below
+    what may have been requested. Returns None when the pages cannot be
+    derived, in which case the caller should follow `next` instead.
+    """
+    if not first_page.get("next"):
+        return []
+    page_size = len(first_page.get("results", []))
+    if "count" not in first_page or not page_size:
+        return None
+    parts = urlsplit(first_url)
+    query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    query["page_size"] = str(page_size)
+    pages = math.ceil(first_page["count"] / page_size)
+    urls = []
+    for page in range(2, pages + 1):
+        query["page"] = str(page)
+        urls.append(urlunsplit(parts._replace(query=urlencode(query))))
+    return urls
+
+
+class PageList(list):
+    """A list of result names that remembers the ETag of the first page it was built from."""
+    etag = None
+
+
+# Returned instead of a PageList when `if_none_match` still matches the first page
+NOT_MODIFIED = object()
 
 
 class DockerHubManager:
     """A simple wrapper for the Docker Hub REST API."""
 
-    def __init__(self, username: str | None = None, token: str | None = None):
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, username: str | None = None, token: str | None = None,
+                 session: requests.Session | None = None):
         self.username = username or os.getenv("DOCKERHUB_USERNAME")
         self.token = token or os.getenv("DOCKERHUB_TOKEN")
         self.jwt = None
         self.base_url = "https://hub.docker.com/v2"
+        self.session = session or get_session()
         if not self.username:
             raise ValueError("❌ DockerHub username is required.")
 
+    @classmethod
+    def shared(cls):
+        """Return a manager reused by every request served by this process."""
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
     # ----------------------------------------
     # Repository operations
     # ----------------------------------------
-    def get_repos(self, page_size: int = 100):
-        """Return a list of all repositories under the user."""
+    @watch_time
+    def get_repos(self, page_size: int = 100, parallel: bool | None = None, if_none_match: str | None = None):
+        """
+        Return a list of all repositories under the user.
+
+        With `if_none_match`, returns NOT_MODIFIED if the first page still carries that ETag.
+        """
         url = f"{self.base_url}/repositories/{self.username}/?page_size={page_size}"
-        headers = self._headers()
-        repos = []
         print(f"📦 Fetching repositories for {self.username}...")
 
-        while url:
-            res = requests.get(url, headers=headers)
-            if res.status_code != 200:
-                raise RuntimeError(f"❌ Failed to fetch repositories: {res.text}")
-            data = res.json()
-            repos.extend([r["name"] for r in data.get("results", [])])
-            url = data.get("next")
+        repos = self._collect(url, "❌ Failed to fetch repositories", parallel, if_none_match)
+        if repos is NOT_MODIFIED:
+            return repos
         print(f"✅ Found {len(repos)} repositories.")
         return repos
 
-    def get_tags_by_repo(self, repo_name: str, page_size: int = 100):
-        """Return a list of tags (versions) for the given repository."""
+    @watch_time
+    def get_tags_by_repo(self, repo_name: str, page_size: int = 100, parallel: bool | None = None,
+                         if_none_match: str | None = None):
+        """
+        Return a list of tags (versions) for the given repository.
+
+        With `if_none_match`, returns NOT_MODIFIED if the first page still carries that ETag.
+        """
         url = f"{self.base_url}/repositories/{self.username}/{repo_name}/tags?page_size={page_size}"
-        headers = self._headers()
-        tags = []
         print(f"🏷️ Fetching tags for repository: {repo_name}")
 
-        while url:
-            res = requests.get(url, headers=headers)
-            if res.status_code != 200:
-                raise RuntimeError(f"❌ Failed to fetch tags for {repo_name}: {res.text}")
-            data = res.json()
-            tags.extend([t["name"] for t in data.get("results", [])])
-            url = data.get("next")
+        tags = self._collect(url, f"❌ Failed to fetch tags for {repo_name}", parallel, if_none_match)
+        if tags is NOT_MODIFIED:
+            return tags
         print(f"✅ Found {len(tags)} tags in {repo_name}.")
         return tags
 
+    @watch_time
+    def get_catalog(self, page_size: int = 100, concurrency: int | None = None):
+        """
+        Return every repository together with its tags.
+
+        Tags are fetched for up to `concurrency` repositories at once (never
+        more than CATALOG_MAX_CONCURRENCY). A failing repository is reported
+        with its `error` instead of failing the catalog.
+        """
+        repos = self.get_repos(page_size=page_size)
+        workers = max(1, min(concurrency or CATALOG_CONCURRENCY, CATALOG_MAX_CONCURRENCY, len(repos) or 1))
+
+        def fetch(repo):
+            try:
+                # Pages are read serially here so `concurrency` bounds the total fan-out
+                return {"name": repo, "tags": self.get_tags_by_repo(repo, page_size, parallel=False), "error": None}
+            except (requests.RequestException, RuntimeError) as e:
+                return {"name": repo, "tags": [], "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(carry_context(fetch), repos))
+
+    def iter_repo_records(self, page_size: int = 100, ordering: str = "last_updated"):
+        """Yield full repository records, most recently updated first, one page at a time."""
+        url = f"{self.base_url}/repositories/{self.username}/?page_size={page_size}&ordering={ordering}"
+        yield from self._iter_results(url, "❌ Failed to fetch repositories")
+
+    def iter_tag_records(self, repo_name: str, page_size: int = 100, ordering: str = "last_updated"):
+        """Yield full tag records of a repository, most recently updated first, one page at a time."""
+        url = f"{self.base_url}/repositories/{self.username}/{repo_name}/tags?page_size={page_size}&ordering={ordering}"
+        yield from self._iter_results(url, f"❌ Failed to fetch tags for {repo_name}")
+
+    # ----------------------------------------
+    # Pagination
+    # ----------------------------------------
+    def _iter_results(self, url, error):
+        """Yield results lazily so callers can stop paging as soon as they have enough."""
+        headers = self._headers()
+        while url:
+            data = self._get_page(url, headers, error)
+            yield from data.get("results", [])
+            url = data.get("next")
+
+    def _collect(self, url, error, parallel=None, if_none_match=None):
+        """
+        Return the `name` of every result across all pages starting at `url`.
+
+        Docker Hub lists the most recently updated entries first, so the first
+        page's ETag is used as the validator for the whole collection.
+        """
+        if parallel is None:
+            parallel = PARALLEL_PAGES
+        headers = self._headers()
+        names = PageList()
+
+        first_headers = dict(headers, **({"If-None-Match": if_none_match} if if_none_match else {}))
+        with Span("upstream page", page=1):
+            res = self._get(url, headers=first_headers)
+        if if_none_match and res.status_code == 304:
+            return NOT_MODIFIED
+        if res.status_code != 200:
+            raise RuntimeError(f"{error}: {res.text}")
+        names.etag = res.headers.get("ETag")
+        data = res.json()
+        names.extend([r["name"] for r in data.get("results", [])])
+        page_urls = remaining_page_urls(url, data) if parallel else None
+        if page_urls is None:
+            url = data.get("next")
+            page = 1
+            while url:
+                page += 1
+                with Span("upstream page", page=page):
+                    data = self._get_page(url, headers, error)
+                names.extend([r["name"] for r in data.get("results", [])])
+                url = data.get("next")
+            return names
+
+        if page_urls:
+            workers = min(PAGE_WORKERS, len(page_urls))
+
+            def fetch(page, page_url):
+                with Span("upstream page", page=page):
+                    return self._get_page(page_url, headers, error)
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # map() yields in submission order, so pages stay in order
+                for page in pool.map(carry_context(fetch), range(2, len(page_urls) + 2), page_urls):
+                    names.extend([r["name"] for r in page.get("results", [])])
+        return names
+
     # ----------------------------------------
     # Helper
     # ----------------------------------------
+    @watch_time
+    def _get(self, url, headers=None):
+        return self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    def _get_page(self, url, headers, error):
+        res = self._get(url, headers=headers)
+        if res.status_code != 200:
+            raise RuntimeError(f"{error}: {res.text}")
+        return res.json()
+
     def _headers(self):
         headers = {}
         if self.jwt:
@@ -63,7 +270,5 @@ class DockerHubManager:
 if __name__ == "__main__":
 
     manager = DockerHubManager()
-    repos = manager.get_repos()
-    for repo in repos:
-        tags = manager.get_tags_by_repo(repo)
-        print(f"{repo}: {tags}")
+    for entry in manager.get_catalog():
+        print(f"{entry['name']}: {entry['tags'] or entry['error']}")
@@ -0,0 +1,184 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 默认配置（每个进程一份内存缓存；DEEPSEEK_CACHE_PATH 指向 sqlite 文件时由所有 worker 共享磁盘层）
+MAX_BYTES = int(os.getenv("DEEPSEEK_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+MAX_ENTRIES = int(os.getenv("DEEPSEEK_CACHE_MAX_ENTRIES", "1024"))
+DISK_PATH = os.getenv("DEEPSEEK_CACHE_PATH", "")
+DISK_TTL = float(os.getenv("DEEPSEEK_CACHE_TTL", "86400"))  # 内存层和磁盘层共用
+DISK_MAX_ROWS = int(os.getenv("DEEPSEEK_CACHE_MAX_ROWS", "100000"))
+PURGE_EVERY = 100  # 每写入这么多次清理一次磁盘层
+
+
+def normalize_messages(msgs: list[dict]) -> list[dict]:
+    """统一角色大小写、换行符和首尾空白，使等价的 prompt 得到相同的 key。"""
+    return [
+        {"role": msg["role"].strip().lower(), "content": msg["content"].replace("\r\n", "\n").strip()}
+        for msg in msgs
+    ]
+
+
+def make_key(msgs: list[dict], model: str, temperature: float) -> str:
+    payload = json.dumps(
+        {"messages": normalize_messages(msgs), "model": model, "temperature": temperature},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    LRU cache of completions bounded by entry count and total bytes,
+    optionally backed by a sqlite file shared between worker processes.
+
+    Entries expire `disk_ttl` seconds after they were first stored, in memory
+    as well as on disk. Every PURGE_EVERY writes the disk layer deletes
+    expired rows and trims itself to the newest `disk_max_rows`.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES, max_entries: int = MAX_ENTRIES,
+                 disk_path: str = DISK_PATH, disk_ttl: float = DISK_TTL, disk_max_rows: int = DISK_MAX_ROWS):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.disk_ttl = disk_ttl
+        self.disk_max_rows = disk_max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._bytes = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT, created REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS completions_created ON completions (created)")
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._forget(key)
+
+        row = self._disk_get(key)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            value, created = row
+            self._remember(key, value, created + self.disk_ttl)
+        return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now + self.disk_ttl)
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+        self._disk_set(key, value, now)
+        if purge:
+            self.purge()
+
+    def purge(self):
+        """删除磁盘层中过期的行，并只保留最新的 disk_max_rows 行。"""
+        if not self.disk_path:
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.disk_ttl,))
+            conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_rows,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM completions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    # ----------------------------------------
+    # Helper
+    # ----------------------------------------
+    @staticmethod
+    def _size(key, value):
+        return len(key) + len(value.encode("utf-8"))
+
+    def _remember(self, key, value, expires_at):
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        self._forget(key)
+        self._entries[key] = (value, expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            old_key, (old_value, _) = self._entries.popitem(last=False)
+            self._bytes -= self._size(old_key, old_value)
+
+    def _forget(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= self._size(key, old[0])
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        try:
+            with conn:  # commits on success
+                yield conn
+        finally:
+            conn.close()
+
+    def _disk_get(self, key):
+        if not self.disk_path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created FROM completions WHERE key = ? AND created >= ?",
+                (key, time.time() - self.disk_ttl),
+            ).fetchone()
+        return row
+
+    def _disk_set(self, key, value, created):
+        if not self.disk_path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created) VALUES (?, ?, ?)",
+                (key, value, created),
+            )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> CompletionCache:
+    """返回进程内共享的 CompletionCache（按环境变量配置）。"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache()
+    return _cache
@@ -1,10 +1,79 @@
+import asyncio
 import os
+import threading
+import time
+import weakref
 from typing import List, Dict
-from openai import OpenAI
 
-from utility.watch import Watch
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from src.fctn_tools.governor import AsyncHeldIterator, HeldIterator, get_governor, retry_after_from
+from utility.watch import Watch, record_latency
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+
+# 连接池 / 超时配置（每个进程一份）
+MAX_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("DEEPSEEK_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("DEEPSEEK_MAX_RETRIES", "2"))
+
+API_ERROR_PREFIX = "调用 API 出错"
+
+_clients = {}
+_clients_lock = threading.Lock()
+# AsyncOpenAI 的连接池绑定在创建它的事件循环上，因此按事件循环缓存
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_client(api_key: str | None = None, base_url: str = DEEPSEEK_BASE_URL) -> OpenAI:
+    """
+    返回当前进程内按 (base_url, api_key) 缓存的 OpenAI 客户端，复用其 keep-alive 连接池。
+    fork 出的 gunicorn worker 会各自新建客户端。
+    """
+    api_key = api_key or os.getenv("DEEPSEEK_API_KEY") or DEEPSEEK_API_KEY
+    key = (os.getpid(), base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                http_client = httpx.Client(
+                    limits=_limits(),
+                    timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                )
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                                max_retries=MAX_RETRIES)
+                _clients[key] = client
+    return client
+
+
+def get_async_client(api_key: str | None = None, base_url: str = DEEPSEEK_BASE_URL) -> AsyncOpenAI:
+    """返回当前事件循环内按 (base_url, api_key) 缓存的 AsyncOpenAI 客户端。"""
+    api_key = api_key or os.getenv("DEEPSEEK_API_KEY") or DEEPSEEK_API_KEY
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get((base_url, api_key))
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=_limits(),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                             max_retries=MAX_RETRIES)
+        clients[(base_url, api_key)] = client
+    return client
 
 
 def get_response_once(response):
@@ -12,33 +81,106 @@ def get_response_once(response):
 
 
 def get_response_stream(response):
+    """逐个转发上游的 delta 片段（不再拆成单个字符）。"""
     for chunk in response:
-        if chunk.choices[0].delta.content:  # 过滤掉空的 delta
-            for char in chunk.choices[0].delta.content:
-                yield char
+        if chunk.choices and chunk.choices[0].delta.content:  # 过滤掉空的 delta
+            yield chunk.choices[0].delta.content
+
+
+async def aget_response_stream(response):
+    """get_response_stream 的异步版本。"""
+    async for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 
-def call_deepseek(msgs: List[Dict], model="deepseek-chat", stream=True):
+def is_error(result) -> bool:
+    """call_deepseek 以字符串形式返回错误，这里用于识别。"""
+    return isinstance(result, str) and result.startswith(API_ERROR_PREFIX)
+
+
+def _upstream_timer(name):
+    """
+    从 Governor 放行后开始计时，返回 done(failed=False)，调用时记录到 utility.watch。
+    排队等待不计入（见 Governor.stats）；流式回答在流结束时才调用 done。
+    """
+    start = time.perf_counter_ns()
+
+    def done(failed=False):
+        record_latency(f"{__name__}.{name}", time.perf_counter_ns() - start, failed)
+
+    return done
+
+
+def call_deepseek(msgs: List[Dict], model="deepseek-chat", stream=True, client: OpenAI | None = None,
+                  temperature: float = 0.7):
     """
     调用 OpenAI API 进行对话，返回模型回答。
+    默认使用进程内共享的客户端（见 get_client）；上游调用经过 Governor 限速限流，
+    流式回答在读完（或被关闭）后才释放并发名额。
     """
-    client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")  # 从环境变量获取 API 密钥
+    client = client or get_client()
 
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=msgs,
-            temperature=0.7,
-            stream=stream
-        )
+        lease = get_governor().acquire()
+        done = _upstream_timer("call_deepseek")
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=msgs,
+                temperature=temperature,
+                stream=stream
+            )
+        except Exception as e:
+            done(failed=True)
+            lease.release(retry_after=retry_after_from(e))
+            raise
+
+        if stream:
+            return HeldIterator(get_response_stream(response), lease, on_done=done)
+        else:
+            lease.release()
+            result = get_response_once(response)
+            done()
+            return result
+
+    except Exception as e:
+        return f"{API_ERROR_PREFIX}: {e}"
+
+
+async def call_deepseek_async(msgs: List[Dict], model="deepseek-chat", stream=True,
+                              client: AsyncOpenAI | None = None, temperature: float = 0.7):
+    """
+    call_deepseek 的异步版本：等待上游期间不占用事件循环。
+    默认使用当前事件循环共享的客户端（见 get_async_client）。
+    """
+    client = client or get_async_client()
+
+    try:
+        lease = await get_governor().aacquire()
+        done = _upstream_timer("call_deepseek_async")
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=msgs,
+                temperature=temperature,
+                stream=stream
+            )
+        except Exception as e:
+            done(failed=True)
+            await lease.arelease(retry_after=retry_after_from(e))
+            raise
 
         if stream:
-            return get_response_stream(response)
+            return AsyncHeldIterator(aget_response_stream(response), lease, on_done=done)
         else:
-            return get_response_once(response)
+            await lease.arelease()
+            result = get_response_once(response)
+            done()
+            return result
 
     except Exception as e:
-        return f"调用 API 出错: {e}"
+        return f"{API_ERROR_PREFIX}: {e}"
 
 
 # 示例调用
@@ -62,11 +204,9 @@ if __name__ == "__main__":
     else:
         gen_answer = call_deepseek(msgs, model=model, stream=stream)
 
-        buffer = []
         for chunk in gen_answer:
-            buffer.append(chunk)
+            length += len(chunk)
             print(chunk, end="", flush=True)
-        length = len(buffer)
 
     cost = w.see_seconds()
     print()
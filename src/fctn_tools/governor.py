@@ -0,0 +1,370 @@
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+
+from utility.singleflight import LOCK_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: 状态只在进程内共享
+    fcntl = None
+
+# 默认配置：令牌桶 + 并发上限，状态文件由同一主机上的所有 worker 共享（设为空则只在进程内生效）
+ENABLED = os.getenv("DEEPSEEK_GOVERNOR_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE = float(os.getenv("DEEPSEEK_RATE_LIMIT", "5"))
+BURST = float(os.getenv("DEEPSEEK_RATE_BURST", "10"))
+MAX_IN_FLIGHT = int(os.getenv("DEEPSEEK_MAX_IN_FLIGHT", "8"))
+QUEUE_TIMEOUT = float(os.getenv("DEEPSEEK_QUEUE_TIMEOUT", "30"))
+STATE_PATH = os.getenv("DEEPSEEK_GOVERNOR_STATE", os.path.join(LOCK_DIR, "deepseek-governor.json"))
+
+MIN_RATE_RATIO = 0.1    # 连续 429 时速率最低降到 RATE 的 10%
+RECOVERY_RATIO = 0.05   # 每次成功调用恢复 RATE 的 5%
+DEFAULT_RETRY_AFTER = 1.0
+POLL_INTERVAL = 0.02
+
+
+class GovernorTimeout(RuntimeError):
+    """Raised when a caller's deadline passes before it gets a slot."""
+
+
+def retry_after_from(exc) -> float | None:
+    """429 异常返回应暂停的秒数（优先使用 Retry-After 头），其他异常返回 None。"""
+    if getattr(exc, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class Lease:
+    """One acquired slot; releasing it more than once is a no-op."""
+
+    __slots__ = ("_governor", "_released")
+
+    def __init__(self, governor):
+        self._governor = governor
+        self._released = governor is None
+
+    @property
+    def released(self):
+        return self._released
+
+    def release(self, retry_after: float | None = None):
+        if self._released:
+            return
+        self._released = True
+        self._governor._release(retry_after)
+
+    async def arelease(self, retry_after: float | None = None):
+        """release() in a worker thread, since it may wait on the state file lock."""
+        if not self._released:
+            await asyncio.to_thread(self.release, retry_after)
+
+
+class HeldIterator:
+    """
+    Iterates a stream and releases its lease when the stream ends, fails or is closed.
+
+    `on_done(failed)`, if given, is called once at that point, so callers can
+    time the whole stream rather than just the call that opened it.
+    """
+
+    def __init__(self, iterator, lease, on_done=None):
+        self._iterator = iter(iterator)
+        self._lease = lease
+        self._on_done = on_done
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+        except BaseException:
+            self._done(failed=True)
+            self.close()
+            raise
+
+    def close(self):
+        self._lease.release()
+        self._done(failed=False)
+        close = getattr(self._iterator, "close", None)
+        if close is not None:
+            close()
+
+    def _done(self, failed):
+        on_done, self._on_done = self._on_done, None
+        if on_done is not None:
+            on_done(failed)
+
+    def __del__(self):
+        self._lease.release()
+
+
+class AsyncHeldIterator:
+    """Async counterpart of HeldIterator."""
+
+    def __init__(self, iterator, lease, on_done=None):
+        self._iterator = iterator.__aiter__()
+        self._lease = lease
+        self._on_done = on_done
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            await self.aclose()
+            raise
+        except BaseException:
+            self._done(failed=True)
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        await self._lease.arelease()
+        self._done(failed=False)
+        aclose = getattr(self._iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    _done = HeldIterator._done
+
+    def __del__(self):
+        if self._lease.released:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._lease.release()
+            return
+        # 在事件循环上被回收时，不在循环线程里做加锁和文件 I/O，改到线程池中释放
+        loop.call_soon_threadsafe(loop.run_in_executor, None, self._lease.release)
+
+
+class Governor:
+    """
+    Admission control for upstream calls: a token bucket limits the request
+    rate and a cap limits how many calls are in flight at once.
+
+    Callers wait until both allow them through or their deadline passes.
+    Admission is not FIFO: every waiter polls the shared state (every
+    POLL_INTERVAL while the cap is reached, or when the bucket's next token
+    is due), and whichever polls first after a slot frees takes it. The
+    deadline bounds how long a caller can be passed over. A 429 halves the
+    rate and pauses admissions for Retry-After; each successful call then
+    restores a little of it.
+    """
+
+    def __init__(self, rate: float = RATE, burst: float = BURST, max_in_flight: int = MAX_IN_FLIGHT,
+                 timeout: float = QUEUE_TIMEOUT, state_path: str = STATE_PATH, enabled: bool = ENABLED):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.state_path = state_path if fcntl is not None else ""
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local_state = None
+        self._metrics_lock = threading.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.throttled = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+
+    def acquire(self, timeout: float | None = None) -> Lease:
+        """Block until a slot is free; raises GovernorTimeout after `timeout` seconds."""
+        if not self.enabled:
+            return Lease(None)
+        deadline = self._enqueue(timeout)
+        try:
+            while True:
+                delay = self._try_acquire()
+                if not delay:
+                    return self._admitted(deadline)
+                time.sleep(self._sleep_for(delay, deadline))
+        finally:
+            self._dequeue()
+
+    async def aacquire(self, timeout: float | None = None) -> Lease:
+        """
+        Async counterpart of acquire: waits without blocking the event loop.
+
+        Each attempt runs in a worker thread, as it takes the state file lock.
+        """
+        if not self.enabled:
+            return Lease(None)
+        deadline = self._enqueue(timeout)
+        try:
+            while True:
+                delay = await asyncio.to_thread(self._try_acquire)
+                if not delay:
+                    return self._admitted(deadline)
+                await asyncio.sleep(self._sleep_for(delay, deadline))
+        finally:
+            self._dequeue()
+
+    def stats(self) -> dict:
+        """Shared limiter state plus this process's queue and wait-time metrics."""
+        with self._state() as state:
+            self._refill(state, time.time())
+            shared = {
+                "rate": round(state["rate"], 3),
+                "tokens": round(state["tokens"], 3),
+                "in_flight": self._prune(state["in_flight"]),
+                "paused_for": round(max(0.0, state["paused_until"] - time.time()), 3),
+            }
+        with self._metrics_lock:
+            return dict(
+                shared,
+                queue_depth=self.waiting,
+                acquired=self.acquired,
+                timeouts=self.timeouts,
+                throttled=self.throttled,
+                wait_ms_avg=round(self.wait_seconds_total * 1000 / self.acquired, 2) if self.acquired else 0.0,
+                wait_ms_max=round(self.wait_seconds_max * 1000, 2),
+            )
+
+    # ----------------------------------------
+    # Queue bookkeeping
+    # ----------------------------------------
+    def _enqueue(self, timeout):
+        with self._metrics_lock:
+            self.waiting += 1
+        now = time.monotonic()
+        return now, now + (self.timeout if timeout is None else timeout)
+
+    def _dequeue(self):
+        with self._metrics_lock:
+            self.waiting -= 1
+
+    def _admitted(self, deadline):
+        waited = time.monotonic() - deadline[0]
+        with self._metrics_lock:
+            self.acquired += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return Lease(self)
+
+    def _sleep_for(self, delay, deadline):
+        remaining = deadline[1] - time.monotonic()
+        if remaining <= 0:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise GovernorTimeout(f"No DeepSeek slot became free within {deadline[1] - deadline[0]:.1f}s")
+        return min(delay, remaining)
+
+    # ----------------------------------------
+    # Shared state
+    # ----------------------------------------
+    def _initial_state(self):
+        return {"tokens": self.burst, "updated": time.time(), "rate": self.rate,
+                "paused_until": 0.0, "in_flight": {}}
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Yield the limiter state under an exclusive lock and persist changes made to it."""
+        with self._lock:
+            if not self.state_path:
+                if self._local_state is None:
+                    self._local_state = self._initial_state()
+                yield self._local_state
+                return
+            with open(self.state_path, "a+") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    fh.seek(0)
+                    try:
+                        state = json.loads(fh.read())
+                    except ValueError:
+                        state = self._initial_state()
+                    yield state
+                    fh.seek(0)
+                    fh.truncate()
+                    fh.write(json.dumps(state))
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state["updated"])
+        state["tokens"] = min(self.burst, state["tokens"] + elapsed * state["rate"])
+        state["updated"] = now
+
+    @staticmethod
+    def _prune(in_flight):
+        """Drop slots held by workers that have exited and return the number still held."""
+        own = str(os.getpid())
+        for pid in list(in_flight):
+            if pid == own:
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                del in_flight[pid]
+            except (PermissionError, ValueError):
+                pass
+        return sum(in_flight.values())
+
+    def _try_acquire(self):
+        """Take a slot if one is free; otherwise return how long to wait before trying again."""
+        now = time.time()
+        with self._state() as state:
+            self._refill(state, now)
+            if now < state["paused_until"]:
+                return state["paused_until"] - now
+            if self._prune(state["in_flight"]) >= self.max_in_flight:
+                return POLL_INTERVAL
+            if state["tokens"] < 1:
+                return max((1 - state["tokens"]) / state["rate"], POLL_INTERVAL)
+            state["tokens"] -= 1
+            pid = str(os.getpid())
+            state["in_flight"][pid] = state["in_flight"].get(pid, 0) + 1
+            return 0
+
+    def _release(self, retry_after):
+        now = time.time()
+        with self._state() as state:
+            pid = str(os.getpid())
+            held = state["in_flight"].get(pid, 0) - 1
+            if held > 0:
+                state["in_flight"][pid] = held
+            else:
+                state["in_flight"].pop(pid, None)
+
+            self._refill(state, now)
+            if retry_after is None:
+                state["rate"] = min(self.rate, state["rate"] + self.rate * RECOVERY_RATIO)
+                return
+            state["rate"] = max(self.rate * MIN_RATE_RATIO, state["rate"] / 2)
+            state["tokens"] = min(state["tokens"], 0.0)
+            state["paused_until"] = max(state["paused_until"], now + retry_after)
+        with self._metrics_lock:
+            self.throttled += 1
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> Governor:
+    """返回进程内共享的 Governor（按环境变量配置）。"""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = Governor()
+    return _governor
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+from src.LF_dockerhubmanger.async_docker_tools import (
+    AsyncDockerHubManager,
+    get_async_client,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestAsyncDockerHubManager(unittest.TestCase):
+    def make_manager(self, handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return AsyncDockerHubManager(username="testuser", client=client)
+
+    def test_get_repos_serial(self):
+        def handler(request):
+            if "page=2" in str(request.url):
+                return httpx.Response(200, json={"next": None, "results": [{"name": "b"}]})
+            return httpx.Response(200, json={"next": "https://hub.docker.com/v2/x?page=2",
+                                             "results": [{"name": "a"}]})
+
+        manager = self.make_manager(handler)
+        self.assertEqual(run(manager.get_repos(parallel=False)), ["a", "b"])
+
+    def test_get_tags_parallel_keeps_page_order(self):
+        def handler(request):
+            page = int(parse_qs(urlsplit(str(request.url)).query).get("page", ["1"])[0])
+            return httpx.Response(200, json={"count": 5, "next": "more" if page < 3 else None,
+                                             "results": [{"name": f"t{page}a"}, {"name": f"t{page}b"}]})
+
+        manager = self.make_manager(handler)
+        tags = run(manager.get_tags_by_repo("repo", page_size=2, parallel=True))
+        self.assertEqual(tags, ["t1a", "t1b", "t2a", "t2b", "t3a", "t3b"])
+
+    def test_retries_then_raises(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503, text="unavailable", headers={"Retry-After": "0"})
+
+        manager = self.make_manager(handler)
+        with self.assertRaises(RuntimeError):
+            run(manager.get_tags_by_repo("repo"))
+        self.assertGreater(len(calls), 1)
+
+    def test_client_is_shared_per_loop(self):
+        async def both():
+            return get_async_client(), get_async_client()
+
+        first, second = run(both())
+        self.assertIs(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
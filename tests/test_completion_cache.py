@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from src.fctn_tools import completion_cache
+from src.fctn_tools.completion_cache import CompletionCache, make_key
+
+
+class TestMakeKey(unittest.TestCase):
+    def test_equivalent_prompts_share_a_key(self):
+        a = make_key([{"role": "user", "content": "Hello\r\n"}], "deepseek-chat", 0.7)
+        b = make_key([{"role": "User", "content": " Hello"}], "deepseek-chat", 0.7)
+        self.assertEqual(a, b)
+
+    def test_model_and_temperature_are_part_of_the_key(self):
+        msgs = [{"role": "user", "content": "Hello"}]
+        self.assertNotEqual(make_key(msgs, "deepseek-chat", 0.7), make_key(msgs, "deepseek-reasoner", 0.7))
+        self.assertNotEqual(make_key(msgs, "deepseek-chat", 0.7), make_key(msgs, "deepseek-chat", 0.0))
+
+
+class TestCompletionCache(unittest.TestCase):
+    def test_hit_and_miss_are_counted(self):
+        cache = CompletionCache(disk_path="")
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", "v")
+        self.assertEqual(cache.get("k"), "v")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction_by_bytes(self):
+        cache = CompletionCache(max_bytes=30, max_entries=10, disk_path="")
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", "x" * 10)
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(cache.stats()["bytes"], 30)
+
+    def test_oversized_values_are_not_kept_in_memory(self):
+        cache = CompletionCache(max_bytes=5, disk_path="")
+        cache.set("k", "too large")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_disk_store_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "completions.sqlite3")
+            CompletionCache(disk_path=path).set("k", "v")
+            other = CompletionCache(disk_path=path)
+            self.assertEqual(other.get("k"), "v")
+            other.clear()
+            self.assertIsNone(CompletionCache(disk_path=path).get("k"))
+
+    def test_memory_entries_expire(self):
+        cache = CompletionCache(disk_path="", disk_ttl=60)
+        with mock.patch("src.fctn_tools.completion_cache.time.time", return_value=1000.0):
+            cache.set("k", "v")
+        with mock.patch("src.fctn_tools.completion_cache.time.time", return_value=1059.0):
+            self.assertEqual(cache.get("k"), "v")
+        with mock.patch("src.fctn_tools.completion_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_disk_is_purged_and_capped_every_few_writes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "completions.sqlite3")
+            cache = CompletionCache(disk_path=path, disk_ttl=60, disk_max_rows=3)
+            with mock.patch("src.fctn_tools.completion_cache.time.time", return_value=1000.0):
+                cache.set("old", "v")
+            with mock.patch.object(completion_cache, "PURGE_EVERY", 5):
+                for i in range(4):
+                    with mock.patch("src.fctn_tools.completion_cache.time.time", return_value=2000.0 + i):
+                        cache.set(f"k{i}", "v")
+
+            conn = sqlite3.connect(path)
+            keys = {row[0] for row in conn.execute("SELECT key FROM completions")}
+            conn.close()
+            self.assertEqual(keys, {"k1", "k2", "k3"})
+
+
+if __name__ == '__main__':
+    unittest.main()
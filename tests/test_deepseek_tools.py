@@ -0,0 +1,92 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from src.fctn_tools import deepseek_tools
+from src.fctn_tools.deepseek_tools import (
+    call_deepseek,
+    get_async_client,
+    get_client,
+    get_response_stream,
+    is_error,
+)
+from src.fctn_tools.governor import Governor
+from utility.watch import get_stats, reset_stats
+
+CALL_NAME = "src.fctn_tools.deepseek_tools.call_deepseek"
+
+
+def make_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class TestResponseStream(unittest.TestCase):
+    def test_forwards_whole_deltas(self):
+        chunks = [make_chunk("Hello"), make_chunk(None), make_chunk(", world")]
+        self.assertEqual(list(get_response_stream(chunks)), ["Hello", ", world"])
+
+    def test_skips_chunks_without_choices(self):
+        chunks = [SimpleNamespace(choices=[]), make_chunk("ok")]
+        self.assertEqual(list(get_response_stream(chunks)), ["ok"])
+
+
+
+class TestClient(unittest.TestCase):
+    def test_client_is_cached_per_key_and_base_url(self):
+        client = get_client(api_key="key-a")
+        self.assertIs(client, get_client(api_key="key-a"))
+        self.assertIsNot(client, get_client(api_key="key-b"))
+        self.assertIsNot(client, get_client(api_key="key-a", base_url="https://example.invalid"))
+
+    def test_client_uses_configured_pool(self):
+        client = get_client(api_key="key-a")
+        self.assertEqual(client.max_retries, deepseek_tools.MAX_RETRIES)
+        self.assertEqual(client.timeout.connect, deepseek_tools.CONNECT_TIMEOUT)
+
+
+    def test_async_client_is_cached_per_loop(self):
+        async def pair():
+            return get_async_client(api_key="key-a"), get_async_client(api_key="key-a")
+
+        first, second = asyncio.run(pair())
+        self.assertIs(first, second)
+        third, _ = asyncio.run(pair())
+        self.assertIsNot(first, third)
+
+
+class TestUpstreamLatency(unittest.TestCase):
+    def setUp(self):
+        reset_stats()
+        governor = Governor(rate=1000, burst=10, max_in_flight=2, state_path="")
+        patcher = patch.object(deepseek_tools, "get_governor", return_value=governor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_calls_are_recorded_as_errors(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = RuntimeError("boom")
+
+        self.assertTrue(is_error(call_deepseek([{"role": "user", "content": "hi"}], stream=False, client=client)))
+        self.assertEqual(get_stats(CALL_NAME)["errors"], 1)
+
+    def test_streams_are_timed_until_they_end(self):
+        def chunks():
+            yield make_chunk("a")
+            time.sleep(0.05)
+            yield make_chunk("b")
+
+        client = MagicMock()
+        client.chat.completions.create.return_value = chunks()
+        stream = call_deepseek([{"role": "user", "content": "hi"}], client=client)
+        self.assertIsNone(get_stats(CALL_NAME))
+
+        self.assertEqual(list(stream), ["a", "b"])
+        stats = get_stats(CALL_NAME)
+        self.assertEqual((stats["count"], stats["errors"]), (1, 0))
+        self.assertGreaterEqual(stats["max_ms"], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
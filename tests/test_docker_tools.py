@@ -0,0 +1,116 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlsplit
+
+from src.LF_dockerhubmanger import docker_tools
+from src.LF_dockerhubmanger.docker_tools import DockerHubManager, get_session
+
+
+def make_response(results, next_url=None, status_code=200, count=None):
+    res = MagicMock()
+    res.status_code = status_code
+    res.json.return_value = {"count": len(results) if count is None else count,
+                             "next": next_url, "results": results}
+    return res
+
+
+class TestSession(unittest.TestCase):
+    def test_session_is_reused(self):
+        self.assertIs(get_session(), get_session())
+
+    def test_session_has_retrying_pool(self):
+        adapter = get_session().get_adapter("https://hub.docker.com/v2")
+        self.assertEqual(adapter._pool_maxsize, docker_tools.POOL_SIZE)
+        self.assertEqual(adapter.max_retries.total, docker_tools.MAX_RETRIES)
+        self.assertIn("GET", adapter.max_retries.allowed_methods)
+
+
+class TestDockerHubManager(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+        self.manager = DockerHubManager(username="testuser", session=self.session)
+
+    def test_requires_username(self):
+        with self.assertRaises(ValueError):
+            DockerHubManager(username="", session=self.session)
+
+    def test_get_repos_follows_pages_on_shared_session(self):
+        self.session.get.side_effect = [
+            make_response([{"name": "a"}], next_url="https://hub.docker.com/page2"),
+            make_response([{"name": "b"}]),
+        ]
+        self.assertEqual(self.manager.get_repos(parallel=False), ["a", "b"])
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_get_tags_parallel_keeps_page_order(self):
+        def fake_get(url, headers=None, timeout=None):
+            page = int(parse_qs(urlsplit(url).query).get("page", ["1"])[0])
+            next_url = "https://hub.docker.com/next" if page < 4 else None
+            return make_response([{"name": f"t{page}a"}, {"name": f"t{page}b"}], next_url, count=7)
+
+        self.session.get.side_effect = fake_get
+        tags = self.manager.get_tags_by_repo("repo", page_size=2, parallel=True)
+        self.assertEqual(tags, ["t1a", "t1b", "t2a", "t2b", "t3a", "t3b", "t4a", "t4b"])
+        self.assertEqual(self.session.get.call_count, 4)
+        requested = [c.args[0] for c in self.session.get.call_args_list[1:]]
+        self.assertTrue(all("page_size=2" in u for u in requested))
+
+    def test_get_tags_parallel_uses_upstream_page_cap(self):
+        def fake_get(url, headers=None, timeout=None):
+            query = parse_qs(urlsplit(url).query)
+            page, size = int(query.get("page", ["1"])[0]), min(int(query["page_size"][0]), 100)
+            names = [{"name": f"t{i}"} for i in range((page - 1) * size, min(page * size, 250))]
+            next_url = "https://hub.docker.com/next" if page * size < 250 else None
+            return make_response(names, next_url, count=250)
+
+        self.session.get.side_effect = fake_get
+        tags = self.manager.get_tags_by_repo("repo", page_size=500, parallel=True)
+        self.assertEqual(tags, [f"t{i}" for i in range(250)])
+        self.assertEqual(self.session.get.call_count, 3)
+
+    def test_get_tags_parallel_follows_next_without_count(self):
+        first = make_response([{"name": "a"}], next_url="https://hub.docker.com/page2")
+        del first.json.return_value["count"]
+        self.session.get.side_effect = [first, make_response([{"name": "b"}])]
+        self.assertEqual(self.manager.get_tags_by_repo("repo", parallel=True), ["a", "b"])
+
+    def test_get_tags_error(self):
+        self.session.get.return_value = make_response([], status_code=404)
+        with self.assertRaises(RuntimeError):
+            self.manager.get_tags_by_repo("missing")
+
+    def test_get_catalog_isolates_failing_repos(self):
+        self.manager.get_repos = MagicMock(return_value=["good", "bad"])
+
+        def fake_tags(repo, page_size=100, parallel=None):
+            if repo == "bad":
+                raise RuntimeError("boom")
+            return ["latest"]
+
+        self.manager.get_tags_by_repo = MagicMock(side_effect=fake_tags)
+        catalog = self.manager.get_catalog(concurrency=2)
+        self.assertEqual(catalog, [
+            {"name": "good", "tags": ["latest"], "error": None},
+            {"name": "bad", "tags": [], "error": "boom"},
+        ])
+
+    def test_get_catalog_caps_requested_concurrency(self):
+        self.manager.get_repos = MagicMock(return_value=[f"repo{i}" for i in range(50)])
+        self.manager.get_tags_by_repo = MagicMock(return_value=["latest"])
+
+        with patch.object(docker_tools, "CATALOG_MAX_CONCURRENCY", 3), \
+                patch.object(docker_tools, "ThreadPoolExecutor", wraps=docker_tools.ThreadPoolExecutor) as pool:
+            self.manager.get_catalog(concurrency=10000)
+        self.assertEqual(pool.call_args.kwargs["max_workers"], 3)
+
+    def test_shared_manager_is_singleton(self):
+        DockerHubManager._shared = None
+        try:
+            with patch.dict(os.environ, {"DOCKERHUB_USERNAME": "testuser"}):
+                self.assertIs(DockerHubManager.shared(), DockerHubManager.shared())
+        finally:
+            DockerHubManager._shared = None
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from src.fctn_tools import deepseek_tools
+from src.fctn_tools.governor import (
+    AsyncHeldIterator,
+    Governor,
+    GovernorTimeout,
+    HeldIterator,
+    retry_after_from,
+)
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    error = RuntimeError("429 Too Many Requests")
+    error.status_code = 429
+    error.response = SimpleNamespace(headers=headers)
+    return error
+
+
+class TestGovernor(unittest.TestCase):
+    def test_burst_then_rate_limited(self):
+        governor = Governor(rate=1000, burst=2, max_in_flight=10, state_path="")
+        governor.acquire().release()
+        governor.acquire().release()
+        start = time.monotonic()
+        governor.acquire().release()
+        self.assertGreater(time.monotonic() - start, 0)
+        self.assertEqual(governor.stats()["acquired"], 3)
+
+    def test_in_flight_cap_times_out(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=1, state_path="")
+        lease = governor.acquire()
+        with self.assertRaises(GovernorTimeout):
+            governor.acquire(timeout=0.05)
+        lease.release()
+        governor.acquire(timeout=0.05).release()
+        stats = governor.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_waiters_are_admitted_when_a_slot_frees(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=1, state_path="")
+        lease = governor.acquire()
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(governor.acquire(timeout=2)))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(governor.stats()["queue_depth"], 1)
+        lease.release()
+        waiter.join()
+        admitted[0].release()
+        self.assertGreater(governor.stats()["wait_ms_max"], 0)
+
+    def test_release_is_idempotent(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=2, state_path="")
+        lease = governor.acquire()
+        governor.acquire()
+        lease.release()
+        lease.release()
+        self.assertEqual(governor.stats()["in_flight"], 1)
+
+    def test_throttle_halves_rate_and_pauses(self):
+        governor = Governor(rate=10, burst=10, max_in_flight=10, state_path="")
+        governor.acquire().release(retry_after=0.2)
+        stats = governor.stats()
+        self.assertEqual(stats["rate"], 5)
+        self.assertGreater(stats["paused_for"], 0)
+        self.assertEqual(stats["throttled"], 1)
+        with self.assertRaises(GovernorTimeout):
+            governor.acquire(timeout=0.05)
+
+    def test_state_is_shared_through_the_state_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "governor.json")
+            first = Governor(rate=1000, burst=10, max_in_flight=1, state_path=path)
+            second = Governor(rate=1000, burst=10, max_in_flight=1, state_path=path)
+            lease = first.acquire()
+            with self.assertRaises(GovernorTimeout):
+                second.acquire(timeout=0.05)
+            lease.release()
+            second.acquire(timeout=0.05).release()
+
+    def test_disabled_governor_admits_everything(self):
+        governor = Governor(max_in_flight=0, state_path="", enabled=False)
+        governor.acquire(timeout=0).release()
+
+    def test_async_acquire(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=1, state_path="")
+
+        async def run():
+            lease = await governor.aacquire()
+            with self.assertRaises(GovernorTimeout):
+                await governor.aacquire(timeout=0.05)
+            lease.release()
+
+        asyncio.run(run())
+
+    def test_async_path_takes_the_state_lock_off_the_event_loop(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=1, state_path="")
+        threads = []
+        for method in ("_try_acquire", "_release"):
+            original = getattr(governor, method)
+
+            def spy(*args, _original=original, **kwargs):
+                threads.append(threading.get_ident())
+                return _original(*args, **kwargs)
+
+            setattr(governor, method, spy)
+
+        async def run():
+            stream = AsyncHeldIterator(empty(), await governor.aacquire())
+            async for _ in stream:
+                pass
+            return threading.get_ident()
+
+        async def empty():
+            return
+            yield
+
+        loop_thread = asyncio.run(run())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+        self.assertEqual(governor.stats()["in_flight"], 0)
+
+    def test_abandoned_async_stream_is_released_off_the_event_loop(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=1, state_path="")
+        threads = []
+        original = governor._release
+
+        def spy(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return original(*args, **kwargs)
+
+        governor._release = spy
+
+        async def run():
+            stream = AsyncHeldIterator(empty(), await governor.aacquire())
+            del stream
+            while not threads:
+                await asyncio.sleep(0.001)
+            return threading.get_ident()
+
+        async def empty():
+            return
+            yield
+
+        loop_thread = asyncio.run(run())
+        self.assertNotIn(loop_thread, threads)
+        self.assertEqual(governor.stats()["in_flight"], 0)
+
+
+class TestHeldIterator(unittest.TestCase):
+    def test_releases_when_exhausted_or_closed(self):
+        governor = Governor(rate=1000, burst=10, max_in_flight=2, state_path="")
+        self.assertEqual(list(HeldIterator(iter("ab"), governor.acquire())), ["a", "b"])
+        stream = HeldIterator(iter("ab"), governor.acquire())
+        next(stream)
+        stream.close()
+        self.assertEqual(governor.stats()["in_flight"], 0)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_reads_retry_after_header(self):
+        self.assertEqual(retry_after_from(rate_limit_error("3")), 3.0)
+
+    def test_defaults_without_header(self):
+        self.assertEqual(retry_after_from(rate_limit_error()), 1.0)
+
+    def test_ignores_other_errors(self):
+        self.assertIsNone(retry_after_from(ValueError("boom")))
+
+
+class TestCallDeepseekGoverned(unittest.TestCase):
+    def test_rate_limit_feeds_back_into_governor(self):
+        governor = Governor(rate=10, burst=10, max_in_flight=2, state_path="")
+        client = MagicMock()
+        client.chat.completions.create.side_effect = rate_limit_error("0")
+
+        with patch.object(deepseek_tools, "get_governor", return_value=governor):
+            result = deepseek_tools.call_deepseek([{"role": "user", "content": "hi"}], stream=False, client=client)
+
+        self.assertTrue(deepseek_tools.is_error(result))
+        stats = governor.stats()
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+
+from utility.singleflight import SingleFlight, fcntl, file_lease
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "value"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(3)]
+        for t in followers:
+            t.start()
+        while flight.in_flight() != 1:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        release.set()
+        for t in [leader, *followers]:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("value", False)] + [("value", True)] * 3)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_errors_propagate_and_key_is_released(self):
+        flight = SingleFlight()
+
+        def boom():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            flight.do("k", boom)
+        self.assertEqual(flight.do("k", lambda: 1), (1, False))
+
+
+@unittest.skipIf(fcntl is None, "flock is not available on this platform")
+class TestFileLease(unittest.TestCase):
+    def test_lease_is_exclusive(self):
+        with file_lease("test-lease") as outer:
+            self.assertTrue(outer)
+            with file_lease("test-lease", timeout=0.1) as inner:
+                self.assertFalse(inner)
+        with file_lease("test-lease", timeout=0.1) as again:
+            self.assertTrue(again)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.watch import (
+    LatencyStats,
+    Span,
+    add_listener,
+    carry_context,
+    current_trace,
+    get_stats,
+    recent_traces,
+    reset_stats,
+    trace,
+    watch_time,
+)
+
+
+class TestSpans(unittest.TestCase):
+    def test_nested_spans_form_a_tree(self):
+        with trace("request") as current:
+            with Span("outer"), Span("inner", page=3):
+                pass
+            with Span("sibling"):
+                pass
+
+        tree = current.to_dict()
+        self.assertEqual([node["name"] for node in tree["spans"]], ["outer", "sibling"])
+        inner = tree["spans"][0]["children"][0]
+        self.assertEqual(inner["name"], "inner")
+        self.assertEqual(inner["attrs"], {"page": 3})
+        self.assertGreaterEqual(tree["spans"][0]["duration_ms"], inner["duration_ms"])
+        self.assertIs(recent_traces()[-1], current)
+
+    def test_spans_outside_a_trace_record_nothing(self):
+        self.assertIsNone(current_trace())
+        with Span("ignored") as record:
+            self.assertIsNone(record)
+
+    def test_decorator_supports_sync_and_async(self):
+        @Span("sync work")
+        def work():
+            return 1
+
+        @Span("async work")
+        async def awork():
+            return 2
+
+        with trace("request") as current:
+            self.assertEqual(work(), 1)
+            self.assertEqual(asyncio.run(awork()), 2)
+        self.assertEqual([record.name for record in current.spans], ["sync work", "async work"])
+
+    def test_errors_are_marked(self):
+        with trace("request") as current, self.assertRaises(ValueError), Span("failing"):
+            raise ValueError("boom")
+        self.assertEqual(current.spans[0].attrs, {"error": "ValueError"})
+
+    def test_ring_buffer_bounds_spans(self):
+        with trace("request", max_spans=2) as current:
+            for i in range(5):
+                with Span("step", i=i):
+                    pass
+        self.assertEqual([record.attrs["i"] for record in current.spans], [3, 4])
+        self.assertEqual(current.to_dict()["dropped_spans"], 3)
+
+    def test_carry_context_into_thread_pool(self):
+        def fetch(page):
+            with Span("upstream page", page=page):
+                return page
+
+        with trace("request") as current, Span("collect"), ThreadPoolExecutor(max_workers=2) as pool:
+            self.assertEqual(list(pool.map(carry_context(fetch), [2, 3])), [2, 3])
+
+        collect = current.to_dict()["spans"][0]
+        self.assertEqual(sorted(child["attrs"]["page"] for child in collect["children"]), [2, 3])
+
+    def test_chrome_export(self):
+        with trace("request") as current, Span("serialize"):
+            pass
+        events = current.to_chrome()
+        self.assertEqual([event["name"] for event in events], ["request", "serialize"])
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+
+
+class TestWatchTime(unittest.TestCase):
+    def setUp(self):
+        reset_stats()
+
+    def test_aggregates_calls(self):
+        @watch_time(name="work")
+        def work(fail=False):
+            if fail:
+                raise ValueError("boom")
+            return "done"
+
+        for _ in range(9):
+            self.assertEqual(work(), "done")
+        with self.assertRaises(ValueError):
+            work(fail=True)
+
+        stats = get_stats("work")
+        self.assertEqual(stats["count"], 10)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(sum(stats["buckets"].values()), 10)
+        self.assertLessEqual(stats["min_ms"], stats["p50_ms"])
+        self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+        self.assertLessEqual(stats["p99_ms"], stats["max_ms"])
+
+    def test_default_name_and_async(self):
+        @watch_time
+        async def awork():
+            return 2
+
+        self.assertEqual(asyncio.run(awork()), 2)
+        name = f"{__name__}.TestWatchTime.test_default_name_and_async.<locals>.awork"
+        self.assertEqual(get_stats()[name]["count"], 1)
+
+    def test_sampling_skips_calls(self):
+        @watch_time(name="never", sample_rate=0)
+        def work():
+            return 1
+
+        work()
+        self.assertIsNone(get_stats("never"))
+
+    def test_listeners_and_reset(self):
+        seen = []
+        add_listener(lambda name, seconds, failed: seen.append((name, failed)))
+
+        @watch_time(name="listened")
+        def work():
+            return 1
+
+        work()
+        self.assertIn(("listened", False), seen)
+        reset_stats()
+        self.assertEqual(get_stats(), {})
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_percentiles_follow_the_distribution(self):
+        stats = LatencyStats()
+        for _ in range(90):
+            stats.observe(2_000_000)      # 2 ms
+        for _ in range(10):
+            stats.observe(400_000_000)    # 400 ms
+        self.assertLessEqual(stats.percentile(50), 2.5)
+        self.assertGreater(stats.percentile(95), 250)
+        self.assertLessEqual(stats.percentile(99), 400)
+
+    def test_histograms_merge(self):
+        first, second = LatencyStats(), LatencyStats()
+        first.observe(1_000_000)
+        second.observe(3_000_000, failed=True)
+        rebuilt = LatencyStats.from_histogram(second.buckets, total_ns=3_000_000, min_ns=3_000_000,
+                                              max_ns=3_000_000, errors=1)
+        first.merge(rebuilt)
+        snapshot = first.snapshot()
+        self.assertEqual((snapshot["count"], snapshot["errors"]), (2, 1))
+        self.assertEqual((snapshot["min_ms"], snapshot["max_ms"], snapshot["mean_ms"]), (1.0, 3.0, 2.0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, leases degrade to no-ops
+    fcntl = None
+
+LOCK_DIR = os.path.join(tempfile.gettempdir(), "devopsdemo-locks")
+
+
+class _Call:
+    __slots__ = ("done", "error", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution within this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run `fn` once for all concurrent callers of `key`.
+
+        Returns ``(result, shared)`` where `shared` is True for callers that
+        waited on another caller's execution. Exceptions are re-raised in every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """Return the number of keys currently being executed."""
+        with self._lock:
+            return len(self._calls)
+
+
+@contextlib.contextmanager
+def file_lease(name, timeout=30.0, poll_interval=0.05):
+    """
+    Hold an exclusive cross-process lease on `name` while the block runs.
+
+    Yields True if the lease was acquired, or False after `timeout` seconds
+    (or where flock is unavailable), so callers can proceed without it rather
+    than stall behind a stuck holder.
+    """
+    if fcntl is None:
+        yield False
+        return
+
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    path = os.path.join(LOCK_DIR, hashlib.sha1(name.encode()).hexdigest() + ".lock")
+    with open(path, "a") as fh:
+        deadline = time.monotonic() + timeout
+        acquired = False
+        while True:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(poll_interval)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(fh, fcntl.LOCK_UN)
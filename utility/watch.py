@@ -1,6 +1,18 @@
-import functools
+import bisect
+import contextlib
+import contextvars
 import datetime
+import functools
+import inspect
+import itertools
+import os
+import random
+import threading
 import time
+from collections import deque
+
+SPAN_LIMIT = int(os.getenv("TRACE_SPAN_LIMIT", "1000"))         # spans kept per trace (oldest dropped)
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "100"))  # finished traces kept for inspection
 
 
 class Watch:
@@ -33,16 +45,337 @@ class Watch:
         return round(self.total_timedelta().total_seconds(), 6)
 
 
-def watch_time(func):
-    """A decorator to measure and print the execution time of a function."""
+# ----------------------------------------
+# Spans
+# ----------------------------------------
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+_finished_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+class SpanRecord:
+    """A timed section of a trace; times are perf_counter_ns readings."""
+    __slots__ = ("attrs", "end_ns", "name", "parent_id", "span_id", "start_ns", "thread_id")
+
+    def __init__(self, name, parent_id, attrs):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.thread_id = threading.get_ident()
+        self.end_ns = None
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def duration_ns(self):
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+
+class Trace:
+    """The spans recorded under one root, e.g. one request, kept in a bounded ring buffer."""
+
+    def __init__(self, name, max_spans=SPAN_LIMIT, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.spans = deque(maxlen=max_spans)
+        self.span_count = 0
+        self.end_ns = None
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def dropped(self):
+        """Number of spans pushed out of the ring buffer."""
+        return self.span_count - len(self.spans)
+
+    def add(self, record):
+        self.spans.append(record)
+        self.span_count += 1
+
+    def to_dict(self):
+        """Return the trace as a nested tree; times are milliseconds relative to the trace start."""
+        nodes = {}
+        roots = []
+        for record in list(self.spans):
+            nodes[record.span_id] = {
+                "name": record.name,
+                "start_ms": round((record.start_ns - self.start_ns) / 1e6, 3),
+                "duration_ms": round(record.duration_ns / 1e6, 3),
+                "attrs": record.attrs,
+                "children": [],
+            }
+        for record in list(self.spans):
+            parent = nodes.get(record.parent_id)
+            (parent["children"] if parent else roots).append(nodes[record.span_id])
+        return {
+            "name": self.name,
+            "duration_ms": round(((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e6, 3),
+            "attrs": self.attrs,
+            "dropped_spans": self.dropped,
+            "spans": roots,
+        }
+
+    def to_chrome(self):
+        """Return the spans as Chrome trace events (load in chrome://tracing or Perfetto)."""
+        pid = os.getpid()
+        events = [{
+            "name": self.name, "ph": "X", "pid": pid, "tid": 0,
+            "ts": self.start_ns / 1e3,
+            "dur": ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e3,
+            "args": self.attrs,
+        }]
+        events.extend({
+            "name": record.name, "ph": "X", "pid": pid, "tid": record.thread_id,
+            "ts": record.start_ns / 1e3, "dur": record.duration_ns / 1e3,
+            "args": record.attrs,
+        } for record in list(self.spans))
+        return events
+
+
+class Span:
+    """
+    Times a block (``with Span("serialize"):``) or every call of a function
+    (``@Span("upstream page")``) as a child of the current span.
+
+    Outside a trace a span records nothing and costs one context-variable lookup.
+    """
+    __slots__ = ("_record", "_token", "attrs", "name")
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._record = None
+        self._token = None
+
+    def __enter__(self):
+        trace = _current_trace.get()
+        if trace is None:
+            return None
+        parent = _current_span.get()
+        self._record = SpanRecord(self.name, parent.span_id if parent else None, self.attrs)
+        trace.add(self._record)
+        self._token = _current_span.set(self._record)
+        return self._record
+
+    def __exit__(self, exc_type, exc, tb):
+        record = self._record
+        if record is None:
+            return False
+        record.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            record.attrs = dict(record.attrs, error=exc_type.__name__)
+        _current_span.reset(self._token)
+        return False
+
+    def __call__(self, func):
+        name, attrs = self.name, self.attrs
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrap(*args, **kwargs):
+                with Span(name, **attrs):
+                    return await func(*args, **kwargs)
+            return async_wrap
+
+        @functools.wraps(func)
+        def wrap(*args, **kwargs):
+            with Span(name, **attrs):
+                return func(*args, **kwargs)
+        return wrap
+
+
+@contextlib.contextmanager
+def trace(name, **attrs):
+    """Record the spans opened inside the block into a new Trace, kept in the ring buffer afterwards."""
+    current = Trace(name, **attrs)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(None)
+    try:
+        yield current
+    finally:
+        current.end_ns = time.perf_counter_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        _finished_traces.append(current)
+
+
+def current_trace():
+    """Return the trace being recorded in this context, if any."""
+    return _current_trace.get()
+
+
+def recent_traces():
+    """Return the most recently finished traces, oldest first."""
+    return list(_finished_traces)
+
+
+def carry_context(func):
+    """Wrap `func` so calls made from worker threads still record into the caller's current span."""
+    context = contextvars.copy_context()
+
     @functools.wraps(func)
     def wrap(*args, **kwargs):
-        w = Watch()
-        res = func(*args, **kwargs)
+        # Each call gets its own copy: one Context cannot be entered by two threads at once
+        return context.copy().run(func, *args, **kwargs)
+    return wrap
 
-        # The first and only call to see_seconds() measures the total duration
-        print(f"Time Cost : '{func.__name__}' took {w.see_seconds()} seconds")
-        return res
+
+# ----------------------------------------
+# Latency statistics
+# ----------------------------------------
+# Histogram bucket upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                      1000, 2500, 5000, 10000, 30000, 60000, float("inf"))
+_BUCKET_BOUNDS_NS = [bound * 1e6 for bound in LATENCY_BUCKETS_MS]
+
+
+class LatencyStats:
+    """Count, total, min/max and a fixed-bucket histogram of one function's call durations."""
+    __slots__ = ("buckets", "count", "errors", "max_ns", "min_ns", "total_ns")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+    @classmethod
+    def from_histogram(cls, buckets, total_ns, min_ns, max_ns, errors=0):
+        """Rebuild stats from per-bucket counts aggregated elsewhere (e.g. in SQL)."""
+        stats = cls()
+        stats.buckets = list(buckets)
+        stats.count = sum(stats.buckets)
+        stats.errors = errors
+        stats.total_ns = total_ns
+        stats.min_ns = min_ns
+        stats.max_ns = max_ns
+        return stats
+
+    def merge(self, other):
+        """Fold the observations of `other` into these stats."""
+        if not other.count:
+            return
+        self.count += other.count
+        self.errors += other.errors
+        self.total_ns += other.total_ns
+        self.min_ns = other.min_ns if self.min_ns is None else min(self.min_ns, other.min_ns)
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def observe(self, duration_ns, failed=False):
+        self.count += 1
+        self.errors += failed
+        self.total_ns += duration_ns
+        self.min_ns = duration_ns if self.min_ns is None else min(self.min_ns, duration_ns)
+        self.max_ns = max(self.max_ns, duration_ns)
+        self.buckets[bisect.bisect_left(_BUCKET_BOUNDS_NS, duration_ns)] += 1
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) in ms by interpolating inside its histogram bucket."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = _BUCKET_BOUNDS_NS[i - 1] if i else 0
+                upper = min(_BUCKET_BOUNDS_NS[i], self.max_ns)
+                lower = max(lower, self.min_ns)
+                estimate = lower + (upper - lower) * (rank - seen) / n
+                return round(estimate / 1e6, 3)
+            seen += n
+        return round(self.max_ns / 1e6, 3)
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "mean_ms": round(self.total_ns / self.count / 1e6, 3) if self.count else 0.0,
+            "min_ms": round((self.min_ns or 0) / 1e6, 3),
+            "max_ms": round(self.max_ns / 1e6, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS_MS], self.buckets)),
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+_listeners = []
+
+
+def record_latency(name, duration_ns, failed=False):
+    """Add one observation to the aggregates of `name` and notify the listeners."""
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = LatencyStats()
+        stats.observe(duration_ns, failed)
+    for listener in _listeners:
+        listener(name, duration_ns / 1e9, failed)
+
+
+def add_listener(listener):
+    """Call ``listener(name, seconds, failed)`` for every recorded call, e.g. to feed a metrics exporter."""
+    _listeners.append(listener)
+
+
+def get_stats(name=None):
+    """Return the aggregates of every watched function, or of just `name`."""
+    with _stats_lock:
+        if name is not None:
+            stats = _stats.get(name)
+            return stats.snapshot() if stats else None
+        return {key: stats.snapshot() for key, stats in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def watch_time(func=None, *, name=None, sample_rate=1.0):
+    """
+    A decorator that aggregates the execution time of a function (sync or async).
+
+    Durations go to per-function counts, totals and histograms readable with
+    get_stats(). With `sample_rate` below 1 only that fraction of calls is
+    timed; unsampled calls cost one random() draw.
+    """
+    if func is None:
+        return functools.partial(watch_time, name=name, sample_rate=sample_rate)
+    key = name or f"{func.__module__}.{func.__qualname__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrap(*args, **kwargs):
+            if sample_rate < 1 and random.random() >= sample_rate:
+                return await func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            failed = True
+            try:
+                res = await func(*args, **kwargs)
+                failed = False
+                return res
+            finally:
+                record_latency(key, time.perf_counter_ns() - start, failed)
+        return async_wrap
+
+    @functools.wraps(func)
+    def wrap(*args, **kwargs):
+        if sample_rate < 1 and random.random() >= sample_rate:
+            return func(*args, **kwargs)
+        start = time.perf_counter_ns()
+        failed = True
+        try:
+            res = func(*args, **kwargs)
+            failed = False
+            return res
+        finally:
+            record_latency(key, time.perf_counter_ns() - start, failed)
 
     return wrap
 
@@ -65,7 +398,8 @@ if __name__ == '__main__':
 
 
     result = decorated_function(1.2)
-    print(f"Function return value: {result}\n")
+    print(f"Function return value: {result}")
+    print(f"Aggregated stats: {get_stats(f'{__name__}.decorated_function')}\n")
 
     # ======================================================================
     # Demo 2: Manually using all methods of the Watch class